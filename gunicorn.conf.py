@@ -0,0 +1,55 @@
+"""
+Gunicorn settings for production. Every value can be overridden with
+the environment variable next to it.
+"""
+import glob
+import multiprocessing
+import os
+
+
+wsgi_app = "theatre_api_service.wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Worker processes and threads per process; threads > 1 selects gthread
+workers = int(
+    os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# Import Django once in the master so workers fork with it loaded
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+
+
+def on_starting(server):
+    # Metric snapshots of workers from a previous run are stale
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # Database connections opened while preloading must not be shared
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from theatre.metrics import REGISTRY
+
+    REGISTRY.start_flushing()
+
+
+def worker_exit(server, worker):
+    # Keep the counters of requests since the last snapshot
+    from theatre.metrics import REGISTRY
+
+    REGISTRY.flush()
@@ -1,29 +1,193 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from django.utils.text import Truncator
 
 from theatre.models import (
+    CheckIn,
     Ticket,
     Performance,
     Play,
     Genre,
     Actor,
     Reservation,
-    TheatreHall
+    RequestProfile,
+    TheatreHall,
+    WaitingRoom,
 )
+from theatre.pagination import EstimatedCountPaginator
+
+
+class PreloadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Raw id widget labelling preloaded objects without a query each"""
+
+    objects = {}
+
+    def label_and_url_for_value(self, value):
+        obj = self.objects.get(str(value))
+        if obj is None:
+            return super().label_and_url_for_value(value)
+        url = reverse(
+            f"{self.admin_site.name}:{obj._meta.app_label}_"
+            f"{obj._meta.model_name}_change",
+            args=(obj.pk,),
+        )
+        return Truncator(obj).words(14), url
 
 
 class TicketInline(admin.TabularInline):
     model = Ticket
     extra = 1
+    raw_id_fields = ("performance", )
+
+    def get_queryset(self, request):
+        # Ticket.__str__ shows the play of every inline row
+        return super().get_queryset(request).select_related(
+            "performance__play"
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "performance":
+            kwargs["widget"] = PreloadedRawIdWidget(
+                db_field.remote_field,
+                self.admin_site,
+                using=kwargs.get("using"),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        if obj is not None:
+            # One query labels the performances of all rows
+            formset.form.base_fields["performance"].widget.objects = {
+                str(performance.pk): performance
+                for performance in Performance.objects.filter(
+                    tickets__reservation=obj
+                ).select_related("play").distinct()
+            }
+        return formset
 
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     inlines = (TicketInline, )
+    list_display = ("id", "user", "created_at")
+    list_select_related = ("user", )
+    list_filter = ("created_at", )
+    raw_id_fields = ("user", )
+    search_fields = ("user__email", )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Ticket)
+class TicketAdmin(admin.ModelAdmin):
+    list_display = ("id", "performance", "row", "seat", "reservation")
+    list_select_related = (
+        "performance__play",
+        "reservation__user",
+    )
+    list_filter = ("performance__theatre_hall", )
+    raw_id_fields = ("performance", "reservation")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Performance)
+class PerformanceAdmin(admin.ModelAdmin):
+    list_display = ("id", "play", "theatre_hall", "show_time")
+    list_select_related = ("play", "theatre_hall")
+    list_filter = ("theatre_hall", )
+    raw_id_fields = ("play", )
+    search_fields = ("play__title", )
+
+
+@admin.register(CheckIn)
+class CheckInAdmin(admin.ModelAdmin):
+    list_display = ("ticket_id", "performance", "row", "seat",
+                    "checked_in_at")
+    list_filter = ("checked_in_at", )
+    raw_id_fields = ("performance", )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(WaitingRoom)
+class WaitingRoomAdmin(admin.ModelAdmin):
+    list_display = ("performance", "admit_per_minute", "is_active")
+    list_filter = ("is_active", )
+    raw_id_fields = ("performance", )
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "sql_time_ms",
+        "sampled",
+        "user",
+    )
+    list_select_related = ("user", )
+    list_filter = ("sampled", "method")
+    search_fields = ("path", )
+    exclude = ("stats", )
+    readonly_fields = (
+        "created_at",
+        "user",
+        "method",
+        "path",
+        "status_code",
+        "sampled",
+        "duration_ms",
+        "query_count",
+        "sql_time_ms",
+        "download",
+        "report",
+        "queries",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:profile_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="theatre_requestprofile_download",
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description="cProfile stats")
+    def download(self, obj):
+        url = reverse(
+            "admin:theatre_requestprofile_download", args=[obj.id]
+        )
+        return format_html('<a href="{}">request-{}.prof</a>', url, obj.id)
+
+    def download_view(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, id=profile_id)
+        if not self.has_view_permission(request, profile):
+            return HttpResponse(status=403)
+
+        response = HttpResponse(
+            bytes(profile.stats), content_type="application/octet-stream"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="request-{profile.id}.prof"'
+        )
+        return response
 
 
 admin.site.register(TheatreHall)
 admin.site.register(Actor)
 admin.site.register(Genre)
 admin.site.register(Play)
-admin.site.register(Performance)
-admin.site.register(Ticket)
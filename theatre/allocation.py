@@ -0,0 +1,255 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from theatre.availability import (
+    free_runs,
+    refresh_availability,
+    schedule_refresh,
+)
+from theatre.catalog_cache import SEATS, invalidate
+from theatre.layouts import performance_layout
+from theatre.models import (
+    Performance,
+    PerformanceAvailability,
+    Reservation,
+    Ticket,
+)
+from theatre.seat_map import (
+    claim_seats,
+    is_taken,
+    lock_seat_maps,
+    map_size,
+    sync_seat_maps,
+)
+
+
+TAKEN_MESSAGE = "This seat is already taken."
+
+
+class SeatAllocator:
+    """Pick the most central free seats of a hall from per-row free runs"""
+
+    def __init__(self, rows, seats_in_row, taken):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        self.runs = {
+            row: free_runs(seats_in_row, taken.get(row, ()))
+            for row in range(1, rows + 1)
+        }
+        self.max_run = {
+            row: max((length for _, length in runs), default=0)
+            for row, runs in self.runs.items()
+        }
+        self._row_center = (rows + 1) / 2
+        self._seat_center = (seats_in_row + 1) / 2
+
+    def _score(self, row, start, count):
+        block_center = start + (count - 1) / 2
+        return (
+            abs(block_center - self._seat_center) / self.seats_in_row
+            + abs(row - self._row_center) / self.rows
+        )
+
+    def best_block(self, count):
+        """Return (row, first_seat) of the best block of adjacent seats"""
+        best = None
+        best_score = None
+        ideal_start = self._seat_center - (count - 1) / 2
+        for row, runs in self.runs.items():
+            if self.max_run[row] < count:
+                continue
+            for run_start, length in runs:
+                if length < count:
+                    continue
+                last_start = run_start + length - count
+                start = min(max(round(ideal_start), run_start), last_start)
+                score = self._score(row, start, count)
+                if best_score is None or score < best_score:
+                    best, best_score = (row, start), score
+        return best
+
+    def claim(self, row, start, count):
+        """Mark a block as taken and update the free-run index of the row"""
+        runs = []
+        for run_start, length in self.runs[row]:
+            run_end = run_start + length
+            if run_start <= start < run_end:
+                if start > run_start:
+                    runs.append((run_start, start - run_start))
+                if start + count < run_end:
+                    runs.append((start + count, run_end - start - count))
+            else:
+                runs.append((run_start, length))
+        self.runs[row] = runs
+        self.max_run[row] = max((length for _, length in runs), default=0)
+        return [(row, seat) for seat in range(start, start + count)]
+
+    def allocate(self, count, allow_split=True):
+        """Return the seats to book, or None if the request can't be met"""
+        if count > self.free_seats:
+            return None
+
+        block = self.best_block(count)
+        if block:
+            return self.claim(*block, count)
+        if not allow_split:
+            return None
+
+        seats = []
+        remaining = count
+        while remaining:
+            size = min(remaining, max(self.max_run.values(), default=0))
+            if not size:
+                return None
+            seats.extend(self.claim(*self.best_block(size), size))
+            remaining -= size
+        return seats
+
+    @property
+    def free_seats(self):
+        return sum(
+            length for runs in self.runs.values() for _, length in runs
+        )
+
+
+def allocate_seats(performance_id, user, count, allow_split=True):
+    """
+    Book the best available seats of a performance for the user.
+    Returns the created reservation or None when there are not enough seats.
+    """
+    with transaction.atomic():
+        performance = Performance.objects.select_for_update().get(
+            id=performance_id
+        )
+        lock_seat_maps([performance.id])
+        taken = defaultdict(set)
+        for row, seat in performance.tickets.values_list("row", "seat"):
+            taken[row].add(seat)
+
+        layout = performance_layout(
+            performance.id, performance.theatre_hall_id
+        )
+        allocator = SeatAllocator(layout.rows, layout.seats_in_row, taken)
+        seats = allocator.allocate(count, allow_split=allow_split)
+        if seats is None:
+            return None
+
+        reservation = Reservation.objects.create(user=user)
+        Ticket.objects.bulk_create(
+            Ticket(
+                row=row,
+                seat=seat,
+                performance=performance,
+                reservation=reservation,
+            )
+            for row, seat in seats
+        )
+        sync_seat_maps([performance.id])
+        schedule_refresh([performance.id])
+        invalidate(SEATS)
+
+    return reservation
+
+
+class SeatMapBusy(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The seat map kept changing, please try again."
+    default_code = "seat_map_busy"
+
+
+class _NotClaimed(Exception):
+    pass
+
+
+def _load_seat_maps(performance_ids):
+    """
+    {performance_id: seat_map}, building missing maps and rebuilding
+    those of halls resized since
+    """
+    seat_maps = {}
+    for attempt in range(2):
+        seat_maps = {
+            performance_id: bytes(seat_map)
+            for performance_id, seat_map in (
+                PerformanceAvailability.objects.filter(
+                    performance_id__in=performance_ids
+                ).values_list("performance_id", "seat_map")
+            )
+        }
+        missing = set(performance_ids) - set(seat_maps)
+        outdated = {
+            performance_id
+            for performance_id, seat_map in seat_maps.items()
+            if len(seat_map) != map_size(*performance_layout(performance_id))
+        }
+        if attempt or not (missing or outdated):
+            break
+        refresh_availability(missing)
+        sync_seat_maps(outdated)
+    return seat_maps
+
+
+def book_seats(tickets_data, **reservation_data):
+    """
+    Book tickets without locking their performances. The seats are
+    claimed by one conditional update of each seat map, which only
+    applies while all the requested seats are still free there, so
+    bookings of other seats never conflict with it. When a claim fails
+    the maps are read to tell which seats were taken, or rebuilt and
+    the claim retried if they turn out to be stale.
+    """
+    requested = defaultdict(list)
+    for ticket in tickets_data:
+        requested[ticket["performance"].id].append(
+            (ticket["row"], ticket["seat"])
+        )
+
+    for _ in range(settings.SEAT_CLAIM_RETRIES):
+        try:
+            with transaction.atomic():
+                # Claim first: the row locks taken by the updates keep
+                # locking bookers of the same performances out until
+                # the tickets are in
+                for performance_id in sorted(requested):
+                    if not claim_seats(
+                        performance_id,
+                        performance_layout(performance_id),
+                        requested[performance_id],
+                    ):
+                        raise _NotClaimed
+                reservation = Reservation.objects.create(**reservation_data)
+                Ticket.objects.bulk_create(
+                    Ticket(reservation=reservation, **ticket_data)
+                    for ticket_data in tickets_data
+                )
+        except _NotClaimed:
+            seat_maps = _load_seat_maps(requested)
+            errors = [
+                {"seat": [TAKEN_MESSAGE]}
+                if is_taken(
+                    seat_maps.get(ticket["performance"].id, b""),
+                    performance_layout(
+                        ticket["performance"].id
+                    ).seats_in_row,
+                    ticket["row"],
+                    ticket["seat"],
+                ) else {}
+                for ticket in tickets_data
+            ]
+            if any(errors):
+                raise serializers.ValidationError({"tickets": errors})
+            continue
+        except IntegrityError:
+            # A map missed a sold seat; rebuild it and look again
+            sync_seat_maps(requested)
+            continue
+
+        schedule_refresh(requested)
+        invalidate(SEATS)
+        return reservation
+
+    raise SeatMapBusy()
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from theatre.models import ArchivedTicket, Performance, Ticket
+
+
+def archive_cutoff():
+    """Tickets of performances before this moment may be archived"""
+    return timezone.now() - settings.TICKET_ARCHIVE_AFTER
+
+
+def is_historical(performance):
+    return performance.show_time < archive_cutoff()
+
+
+def taken_seats(performance_ids):
+    """
+    (performance_id, row, seat) of the tickets of performances, those
+    moved to the archive included
+    """
+    tickets = Ticket.objects.filter(
+        performance_id__in=performance_ids
+    ).order_by().values_list("performance_id", "row", "seat")
+    archived = ArchivedTicket.objects.filter(
+        performance_id__in=performance_ids,
+        show_time__lt=archive_cutoff(),
+    ).order_by().values_list("performance_id", "row", "seat")
+    return tickets.union(archived, all=True)
+
+
+def archived_ticket_count():
+    """
+    Number of archived tickets of each performance. The archive is only
+    looked up for performances old enough to have any.
+    """
+    archived = (
+        ArchivedTicket.objects.filter(performance=OuterRef("pk"))
+        .values("performance")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Case(
+        When(
+            show_time__lt=archive_cutoff(),
+            then=Coalesce(Subquery(archived), 0),
+        ),
+        default=Value(0),
+    )
+
+
+def archive_tickets(before, batch_size=10000):
+    """
+    Move tickets of performances that started before the given moment
+    to the archive, one batch per transaction. Returns the number of
+    moved tickets. The moment may not be later than archive_cutoff(),
+    since only performances before it are looked up in the archive.
+    """
+    # Imported here, as these modules import this one
+    from theatre.availability import schedule_refresh
+    from theatre.catalog_cache import SEATS, invalidate
+    from theatre.seat_map import sync_seat_maps
+
+    if before > archive_cutoff():
+        raise ValueError(
+            "Tickets can only be archived for performances older than "
+            "TICKET_ARCHIVE_AFTER."
+        )
+
+    ticket = connection.ops.quote_name(Ticket._meta.db_table)
+    archived = connection.ops.quote_name(ArchivedTicket._meta.db_table)
+    performance = connection.ops.quote_name(Performance._meta.db_table)
+    # Tickets are deleted and inserted in one statement, so a ticket is
+    # never in both tables or in neither. SKIP LOCKED leaves tickets
+    # that a running request holds to the next run.
+    sql = f"""
+        WITH batch AS (
+            SELECT t.id FROM {ticket} t
+            JOIN {performance} p ON p.id = t.performance_id
+            WHERE p.show_time < %s
+            ORDER BY t.id
+            LIMIT %s
+            FOR UPDATE OF t SKIP LOCKED
+        ), moved AS (
+            DELETE FROM {ticket} t USING batch WHERE t.id = batch.id
+            RETURNING t.id, t."row", t.seat, t.performance_id,
+                t.reservation_id
+        )
+        INSERT INTO {archived} (
+            id, "row", seat, performance_id, reservation_id, show_time,
+            archived_at
+        )
+        SELECT moved.id, moved."row", moved.seat, moved.performance_id,
+            moved.reservation_id, p.show_time, %s
+        FROM moved JOIN {performance} p ON p.id = moved.performance_id
+        RETURNING performance_id
+    """
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [before, batch_size, timezone.now()])
+                performance_ids = {row[0] for row in cursor.fetchall()}
+                moved = cursor.rowcount
+            if moved:
+                sync_seat_maps(performance_ids)
+                schedule_refresh(performance_ids)
+                invalidate(SEATS)
+        total += moved
+        if moved < batch_size:
+            return total
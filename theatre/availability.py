@@ -0,0 +1,105 @@
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+from theatre.archive import taken_seats
+from theatre.layouts import hall_layout
+from theatre.models import Performance, PerformanceAvailability
+from theatre.seat_map import encode
+
+
+_pending = threading.local()
+
+
+def free_runs(seats_in_row, taken_seats):
+    """Return (first_seat, length) of every run of free seats in a row"""
+    runs = []
+    start = 1
+    for seat in sorted(taken_seats):
+        if seat > start:
+            runs.append((start, seat - start))
+        start = max(start, seat + 1)
+    if start <= seats_in_row:
+        runs.append((start, seats_in_row - start + 1))
+    return runs
+
+
+def summarize(rows, seats_in_row, taken):
+    """Build availability figures from a {row: {seat, ...}} mapping"""
+    row_free_runs = []
+    free_seats = 0
+    for row in range(1, rows + 1):
+        runs = free_runs(seats_in_row, taken.get(row, ()))
+        row_free_runs.append(max((length for _, length in runs), default=0))
+        free_seats += sum(length for _, length in runs)
+
+    return {
+        "free_seats": free_seats,
+        "max_free_run": max(row_free_runs, default=0),
+        "row_free_runs": row_free_runs,
+    }
+
+
+def refresh_availability(performance_ids):
+    """Recompute availability rows for the given performances"""
+    performance_ids = set(performance_ids)
+    if not performance_ids:
+        return 0
+
+    performances = list(Performance.objects.filter(id__in=performance_ids))
+
+    taken = defaultdict(lambda: defaultdict(set))
+    # The same seats as the seat maps, see sync_seat_maps()
+    for performance_id, row, seat in taken_seats(performance_ids):
+        taken[performance_id][row].add(seat)
+
+    summaries = []
+    for performance in performances:
+        layout = hall_layout(performance.theatre_hall_id)
+        seats = taken[performance.id]
+        summaries.append(
+            PerformanceAvailability(
+                performance=performance,
+                show_time=performance.show_time,
+                # Only used for new rows; existing seat maps are kept up
+                # to date by the transactions that book seats
+                seat_map=encode(
+                    *layout,
+                    ((row, seat) for row in seats for seat in seats[row]),
+                ),
+                **summarize(*layout, seats),
+            )
+        )
+    PerformanceAvailability.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["performance"],
+        update_fields=[
+            "show_time",
+            "free_seats",
+            "max_free_run",
+            "row_free_runs",
+            "updated_at",
+        ],
+    )
+    return len(summaries)
+
+
+def _flush_pending():
+    performance_ids = getattr(_pending, "ids", None)
+    _pending.ids = set()
+    if performance_ids:
+        refresh_availability(performance_ids)
+
+
+def schedule_refresh(performance_ids):
+    """Refresh availability once the current transaction commits"""
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    _pending.ids.update(
+        performance_id
+        for performance_id in performance_ids
+        if performance_id is not None
+    )
+    transaction.on_commit(_flush_pending)
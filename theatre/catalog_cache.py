@@ -0,0 +1,124 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from theatre.compression import compress_all
+from theatre.metrics import record_cache
+
+
+# Plays, actors, genres, halls and the performance schedule
+CATALOG = "catalog"
+# Tickets, which change the seats a performance reports as taken
+SEATS = "seats"
+# Hall dimensions and the hall of each performance, see theatre.layouts
+HALL_LAYOUTS = "hall_layouts"
+# Performances sold through a waiting room, see theatre.waiting_room
+WAITING_ROOMS = "waiting_rooms"
+
+CACHEABLE_FORMATS = ("json", "compact")
+
+
+def _version_key(scope):
+    return f"theatre:version:{scope}"
+
+
+def get_versions(scopes):
+    """Current version token of every scope, creating missing ones"""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    cache.set_many(
+        {_version_key(scope): uuid.uuid4().hex for scope in scopes},
+        timeout=None,
+    )
+
+
+def invalidate(*scopes):
+    """
+    Move the scopes to a new version now and again on commit, so a
+    response rendered from data read before the commit is never reused
+    """
+    bump_versions(*scopes)
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+class CatalogCacheMixin:
+    """
+    Cache rendered list and retrieve responses, together with their
+    compressed bodies, under the versions of cache_scopes. Writes to the
+    underlying models move the versions on, so entries are never
+    invalidated one by one.
+    """
+
+    cache_scopes = (CATALOG,)
+    catalog_cache_key = None
+
+    def get_catalog_cache_key(self, request):
+        if not settings.CATALOG_CACHE_TIMEOUT:
+            return None
+        if request.accepted_renderer.format not in CACHEABLE_FORMATS:
+            return None
+        parts = [
+            *get_versions(self.cache_scopes),
+            request.accepted_media_type,
+            request.build_absolute_uri(),
+        ]
+        digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+        return f"theatre:response:{digest}"
+
+    def cached(self, handler, request, *args, **kwargs):
+        key = self.get_catalog_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+
+        entry = cache.get(key)
+        record_cache("catalog", entry is not None)
+        if entry is not None:
+            response = HttpResponse(
+                entry["content"], content_type=entry["content_type"]
+            )
+            response.precompressed = entry["compressed"]
+            return response
+
+        self.catalog_cache_key = key
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            self.catalog_cache_key
+            and isinstance(response, Response)
+            and response.status_code == 200
+        ):
+            response.render()
+            response.precompressed = compress_all(response.content)
+            cache.set(
+                self.catalog_cache_key,
+                {
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                    "compressed": response.precompressed,
+                },
+                settings.CATALOG_CACHE_TIMEOUT,
+            )
+        return response
@@ -0,0 +1,210 @@
+import atexit
+import base64
+import logging
+import threading
+
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    DataError,
+    IntegrityError,
+    connection,
+    transaction,
+)
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from theatre.models import CheckIn
+from theatre.object_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "theatre.check_in"
+
+ADMITTED = "admitted"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+WRONG_PERFORMANCE = "wrong_performance"
+
+
+def _signature(message):
+    digest = salted_hmac(TOKEN_SALT, message, algorithm="sha256").digest()
+    # 96 bits keep the token short enough for a small QR code
+    return base64.urlsafe_b64encode(digest[:12]).decode()
+
+
+def ticket_token(ticket):
+    """Signed "id.performance.row.seat.signature" of a ticket"""
+    message = (
+        f"{ticket.id}.{ticket.performance_id}.{ticket.row}.{ticket.seat}"
+    )
+    return f"{message}.{_signature(message)}"
+
+
+def read_ticket_token(token):
+    """(ticket_id, performance_id, row, seat) of a valid token, or None"""
+    message, _, signature = str(token).rpartition(".")
+    if not constant_time_compare(signature, _signature(message)):
+        return None
+    try:
+        ticket_id, performance_id, row, seat = map(int, message.split("."))
+    except ValueError:
+        return None
+    return ticket_id, performance_id, row, seat
+
+
+class CheckInLog:
+    """
+    Scanned tickets of the performances checked in by this process. A
+    performance's entries are loaded once, later scans are answered
+    from memory and recorded in batches of CHECK_IN_BATCH_SIZE, or by a
+    timer CHECK_IN_FLUSH_INTERVAL seconds after the first unwritten
+    scan.
+
+    Duplicates are only caught within one process, so the scanners of
+    a performance should be routed to the same worker; entries of
+    other processes are seen once the performance is loaded again.
+    """
+
+    def __init__(self, maxsize):
+        self.performances = LRUCache(maxsize)
+        self.pending = []
+        self.timer = None
+        self.failures = 0
+        self.lock = threading.Lock()
+        # Held while a batch is written, so loads wait for it
+        self.flush_lock = threading.Lock()
+
+    def _seen(self, performance_id):
+        seen = self.performances.get(performance_id)
+        if seen is not None:
+            return seen
+        # Entries of a performance evicted earlier may still be pending
+        self._try_flush()
+        with self.lock:
+            # Another thread may have loaded it meanwhile
+            seen = self.performances.get(performance_id)
+            if seen is None:
+                seen = set(
+                    CheckIn.objects.filter(
+                        performance_id=performance_id
+                    ).values_list("ticket_id", flat=True)
+                )
+                seen.update(
+                    entry.ticket_id
+                    for entry in self.pending
+                    if entry.performance_id == performance_id
+                )
+                self.performances.set(performance_id, seen)
+        return seen
+
+    def _start_timer(self):
+        if self.timer is None and self.pending:
+            self.timer = threading.Timer(
+                settings.CHECK_IN_FLUSH_INTERVAL, self._flush_on_timer
+            )
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _flush_on_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self._try_flush()
+        finally:
+            connection.close()
+
+    def _try_flush(self):
+        try:
+            self.flush()
+        except DatabaseError:
+            # The entries are pending again and the timer restarted
+            logger.exception("Writing check-ins failed")
+
+    def check_in(self, performance_id, tokens):
+        """Return (token, status, claims) for every scanned token"""
+        seen = self._seen(performance_id)
+        now = timezone.now()
+        results = []
+        with self.lock:
+            for token in tokens:
+                claims = read_ticket_token(token)
+                if claims is None:
+                    status = INVALID
+                elif claims[1] != performance_id:
+                    status = WRONG_PERFORMANCE
+                elif claims[0] in seen:
+                    status = DUPLICATE
+                else:
+                    status = ADMITTED
+                    seen.add(claims[0])
+                    ticket_id, _, row, seat = claims
+                    self.pending.append(
+                        CheckIn(
+                            ticket_id=ticket_id,
+                            performance_id=performance_id,
+                            row=row,
+                            seat=seat,
+                            checked_in_at=now,
+                        )
+                    )
+                results.append((token, status, claims))
+            due = len(self.pending) >= settings.CHECK_IN_BATCH_SIZE
+            self._start_timer()
+        if due:
+            self._try_flush()
+        return results
+
+    def flush(self):
+        """
+        Write pending entries. A batch that fails stays pending; after
+        CHECK_IN_FLUSH_RETRIES failures in a row its entries are written
+        one by one, and those that can never be written are dropped.
+        """
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+            if not pending:
+                return 0
+            try:
+                if self.failures < settings.CHECK_IN_FLUSH_RETRIES:
+                    self._write(pending)
+                    written = len(pending)
+                else:
+                    written = self._write_one_by_one(pending)
+            except DatabaseError:
+                self.failures += 1
+                with self.lock:
+                    self.pending[:0] = pending
+                    self._start_timer()
+                raise
+            self.failures = 0
+        return written
+
+    @staticmethod
+    def _write(entries):
+        with transaction.atomic():
+            CheckIn.objects.bulk_create(entries, ignore_conflicts=True)
+
+    def _write_one_by_one(self, entries):
+        # Entries are taken off the list as they are done with, so what
+        # is left goes back to pending if the database fails meanwhile
+        written = 0
+        while entries:
+            try:
+                self._write(entries[:1])
+                written += 1
+            except (DataError, IntegrityError):
+                logger.exception(
+                    "Dropped the check-in of ticket %s", entries[0].ticket_id
+                )
+            entries.pop(0)
+        return written
+
+
+CHECK_INS = CheckInLog(settings.CHECK_IN_CACHE_SIZE)
+atexit.register(CHECK_INS.flush)
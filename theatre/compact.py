@@ -0,0 +1,111 @@
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from theatre.models import Play, TheatreHall
+from theatre.serializers import (
+    ActorCompactSerializer,
+    GenreSerializer,
+    PlayCompactSerializer,
+    TheatreHallSerializer,
+)
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """Plain JSON, selected with ?format=compact to get normalized lists"""
+
+    format = "compact"
+
+
+COMPACT_FORMAT_PARAMETER = OpenApiParameter(
+    name="format",
+    type=str,
+    enum=["json", "compact"],
+    description="compact returns rows with ids plus lookup tables of the "
+    "referenced objects",
+)
+
+
+def _by_id(data):
+    return {item["id"]: item for item in data}
+
+
+def play_tables(plays, context):
+    """Actor and genre lookup tables of plays with prefetched relations"""
+    actors = {}
+    genres = {}
+    for play in plays:
+        actors.update((actor.id, actor) for actor in play.actor.all())
+        genres.update((genre.id, genre) for genre in play.genre.all())
+    return {
+        "actors": _by_id(
+            ActorCompactSerializer(
+                actors.values(), many=True, context=context
+            ).data
+        ),
+        "genres": _by_id(
+            GenreSerializer(genres.values(), many=True, context=context).data
+        ),
+    }
+
+
+def performance_tables(performances, context):
+    """Play, hall, actor and genre lookup tables of performances"""
+    plays = list(
+        Play.objects.filter(
+            id__in={performance.play_id for performance in performances}
+        ).prefetch_related("actor", "genre")
+    )
+    halls = TheatreHall.objects.filter(
+        id__in={performance.theatre_hall_id for performance in performances}
+    )
+    return {
+        "plays": _by_id(
+            PlayCompactSerializer(plays, many=True, context=context).data
+        ),
+        "theatre_halls": _by_id(
+            TheatreHallSerializer(halls, many=True, context=context).data
+        ),
+        **play_tables(plays, context),
+    }
+
+
+class CompactListMixin:
+    """
+    With ?format=compact, list() returns flat rows that reference other
+    objects by id, and every referenced object once in lookup tables
+    next to them
+    """
+
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES,
+        CompactJSONRenderer,
+    ]
+    # Builds the lookup tables of a page: (objects, context) -> dict
+    lookup_tables = None
+
+    def is_compact(self):
+        renderer = getattr(self.request, "accepted_renderer", None)
+        return (
+            self.action == "list"
+            and getattr(renderer, "format", None) == CompactJSONRenderer.format
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_compact():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        objects = list(queryset) if page is None else page
+        rows = self.get_serializer(objects, many=True).data
+        tables = {}
+        if self.lookup_tables is not None:
+            tables = self.lookup_tables(objects, {"request": request})
+
+        if page is None:
+            return Response({"results": rows, **tables})
+        response = self.get_paginated_response(rows)
+        response.data.update(tables)
+        return response
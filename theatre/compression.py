@@ -0,0 +1,112 @@
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# Preferred first when the client accepts several with the same weight
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/|application/([\w.+-]+\+)?(json|xml|javascript))"
+)
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(
+            content, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+    return gzip.compress(
+        content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+    )
+
+
+def compress_all(content):
+    """Every supported encoding of content that actually makes it smaller"""
+    if len(content) < settings.COMPRESSION_MIN_SIZE:
+        return {}
+    encoded = {}
+    for encoding in ENCODINGS:
+        body = compress(content, encoding)
+        if len(body) < len(content):
+            encoded[encoding] = body
+    return encoded
+
+
+def choose_encoding(accept_encoding):
+    """Best supported encoding of an Accept-Encoding header, if any"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                weight = float(match.group(1))
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best = None
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (encoding, weight)
+    return best[0] if best else None
+
+
+def is_compressible(response):
+    return (
+        not response.streaming
+        and not response.has_header("Content-Encoding")
+        and COMPRESSIBLE_TYPES.match(response.get("Content-Type", ""))
+        and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+    )
+
+
+class CompressionMiddleware:
+    """
+    Compress responses above COMPRESSION_MIN_SIZE with brotli or gzip,
+    whichever the client prefers. Bodies already compressed by the view,
+    such as cached catalog responses, are sent as they are.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if encoding is None:
+            return response
+
+        precompressed = getattr(response, "precompressed", None) or {}
+        body = precompressed.get(encoding)
+        if body is None:
+            body = compress(response.content, encoding)
+            if len(body) >= len(response.content):
+                return response
+
+        response.content = body
+        response["Content-Length"] = str(len(body))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
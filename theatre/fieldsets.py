@@ -0,0 +1,165 @@
+from functools import cached_property
+
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    extend_schema,
+    extend_schema_view,
+)
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+FIELD_SELECTION_PARAMETERS = [
+    OpenApiParameter(
+        name=FIELDS_PARAM,
+        type=str,
+        description="Comma separated fields to return, nested fields "
+        "with dots (play.title)",
+    ),
+    OpenApiParameter(
+        name=EXPAND_PARAM,
+        type=str,
+        description="Comma separated nested objects to embed, the others "
+        "are returned as ids. Everything is embedded when omitted",
+    ),
+]
+
+# Documents ?fields= and ?expand= on the list and retrieve endpoints
+field_selection_schema = extend_schema_view(
+    list=extend_schema(parameters=FIELD_SELECTION_PARAMETERS),
+    retrieve=extend_schema(parameters=FIELD_SELECTION_PARAMETERS),
+)
+
+
+def _parse(value):
+    if value is None:
+        return None
+    return {path.strip() for path in value.split(",") if path.strip()}
+
+
+def field_path(serializer):
+    """Dotted path of a nested serializer from the root serializer"""
+    parts = []
+    node = serializer
+    while getattr(node, "parent", None) is not None:
+        if node.field_name:
+            parts.append(node.field_name)
+        node = node.parent
+    return ".".join(reversed(parts))
+
+
+class FieldSelection:
+    """Fields picked with ?fields= and nested objects picked with ?expand="""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        return cls(
+            _parse(params.get(FIELDS_PARAM)), _parse(params.get(EXPAND_PARAM))
+        )
+
+    def includes(self, path):
+        if self.fields is None:
+            return True
+        return any(
+            path == field
+            or path.startswith(field + ".")
+            or field.startswith(path + ".")
+            for field in self.fields
+        )
+
+    def expands(self, path):
+        if self.expand is None:
+            return True
+        prefix = path + "."
+        # Asking for fields inside a nested object expands it as well
+        return any(
+            name == path or name.startswith(prefix)
+            for name in self.expand | (self.fields or set())
+        )
+
+
+class DynamicFieldsMixin:
+    """
+    Drop the fields left out by the field selection in the context and
+    render nested serializers that are not expanded as primary keys
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.context.get("field_selection")
+        if selection is None:
+            return fields
+
+        path = field_path(self)
+        for name, field in list(fields.items()):
+            full_path = f"{path}.{name}" if path else name
+            if not selection.includes(full_path):
+                del fields[name]
+            elif isinstance(
+                getattr(field, "child", field), serializers.BaseSerializer
+            ) and not selection.expands(full_path):
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=isinstance(field, serializers.ListSerializer),
+                    read_only=True,
+                    source=field.source,
+                )
+        return fields
+
+
+class DynamicFieldsModelSerializer(
+    DynamicFieldsMixin, serializers.ModelSerializer
+):
+    pass
+
+
+def _rendered_paths(serializer, prefix=""):
+    for name, field in serializer.fields.items():
+        path = prefix + name
+        yield path
+        nested = getattr(field, "child", field)
+        if isinstance(nested, serializers.BaseSerializer):
+            yield from _rendered_paths(nested, path + ".")
+
+
+class SparseFieldsViewMixin:
+    """
+    Pass the ?fields= / ?expand= selection to serializers and tell
+    get_queryset() which relations the response actually renders
+    """
+
+    @cached_property
+    def field_selection(self):
+        return FieldSelection.from_request(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["field_selection"] = self.field_selection
+        return context
+
+    @cached_property
+    def rendered_fields(self):
+        return set(_rendered_paths(self.get_serializer()))
+
+    def renders(self, path):
+        return path in self.rendered_fields
+
+    def expands(self, path):
+        prefix = path + "."
+        return any(field.startswith(prefix) for field in self.rendered_fields)
+
+    def prefetch_rendered(self, queryset, lookups):
+        """Prefetch every lookup whose field path is rendered"""
+        needed = dict.fromkeys(
+            lookup for path, lookup in lookups if self.renders(path)
+        )
+        return queryset.prefetch_related(*needed)
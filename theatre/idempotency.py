@@ -0,0 +1,141 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from theatre.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def request_hash(request):
+    payload = json.dumps(
+        [request.method, request.path, request.data],
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def purge_expired_keys():
+    """Delete stored keys older than IDEMPOTENCY_KEY_TTL in one query"""
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+    ).delete()
+    return deleted
+
+
+def _abandoned(record):
+    """In-progress record whose worker has held it past the lease"""
+    leased_until = record.created_at + timedelta(
+        seconds=settings.IDEMPOTENCY_LEASE_SECONDS
+    )
+    return not record.is_complete and leased_until < timezone.now()
+
+
+def _claim(request, key, fingerprint):
+    """
+    Return (record, claimed): a new in-progress record, or the one
+    already stored for the key
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user, key=key, request_hash=fingerprint
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(
+                user=request.user, key=key
+            ).first()
+            if record is None:
+                continue
+            stale = IdempotencyKey.objects.filter(pk=record.pk)
+            expired_at = timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+            if record.created_at >= expired_at:
+                if not _abandoned(record):
+                    return record, False
+                # The worker died mid-request; never drop a response it
+                # managed to store meanwhile
+                stale = stale.filter(status_code__isnull=True)
+            stale.delete()
+
+
+def _wait_for_completion(record):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while not record.is_complete:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # Back off so waiting duplicates do not hammer the database
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+        if record is None:
+            return None
+    return record
+
+
+def idempotent(request, handler):
+    """
+    Run handler once per (user, Idempotency-Key) and replay its stored
+    status and body for retries of the same request
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    max_length = IdempotencyKey._meta.get_field("key").max_length
+    if len(key) > max_length:
+        return Response(
+            {"detail": f"Idempotency-Key may have at most {max_length} "
+                       f"characters."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fingerprint = request_hash(request)
+    record, claimed = _claim(request, key, fingerprint)
+
+    if not claimed:
+        if record.request_hash != fingerprint:
+            return Response(
+                {"detail": "Idempotency-Key was used for another request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        record = _wait_for_completion(record)
+        if record is None or not record.is_complete:
+            return Response(
+                {"detail": "A request with this Idempotency-Key "
+                           "is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        response = Response(record.response_body, status=record.status_code)
+        response[REPLAYED_HEADER] = "true"
+        return response
+
+    # A record reclaimed after the lease belongs to another request now
+    claim = IdempotencyKey.objects.filter(pk=record.pk)
+    try:
+        response = handler()
+    except Exception:
+        claim.delete()
+        raise
+
+    if response.status_code >= 500:
+        claim.delete()
+    else:
+        claim.update(
+            status_code=response.status_code,
+            response_body=response.data,
+        )
+    return response
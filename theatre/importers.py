@@ -0,0 +1,423 @@
+import csv
+import itertools
+import json
+import os
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from theatre.availability import schedule_refresh
+from theatre.catalog_cache import CATALOG, invalidate
+from theatre.models import Actor, Genre, Performance, Play, TheatreHall
+
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def guess_format(filename):
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+class InvalidRow(dict):
+    """Stands in for a line that could not be read as a row"""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+
+def _decode_lines(stream, invalid):
+    """Decode lines of a stream, blanking and noting undecodable ones"""
+    for number, line in enumerate(stream):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8-sig" if number == 0 else "utf-8")
+            except UnicodeDecodeError:
+                invalid.append(InvalidRow("Not valid UTF-8."))
+                line = "\n"
+        # PostgreSQL text cannot hold NUL characters
+        if "\x00" in line or "\\u0000" in line:
+            invalid.append(InvalidRow("Contains a NUL character."))
+            line = "\n"
+        yield line
+
+
+def _read_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield InvalidRow("Invalid JSON.")
+            continue
+        if isinstance(row, dict):
+            yield row
+        else:
+            yield InvalidRow("Expected a JSON object.")
+
+
+def _read_csv(lines):
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            yield next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield InvalidRow(f"Invalid CSV: {error}.")
+
+
+def read_rows(stream, fmt):
+    """
+    Yield rows of a CSV or NDJSON stream as dicts, with an InvalidRow in
+    place of every line that cannot be decoded or parsed
+    """
+    invalid = []
+    lines = _decode_lines(stream, invalid)
+    rows = _read_ndjson(lines) if fmt == "ndjson" else _read_csv(lines)
+    for row in rows:
+        # Undecodable lines are blanked, so they come before the next row
+        while invalid:
+            yield invalid.pop(0)
+        yield row
+    yield from invalid
+
+
+def _split_references(values):
+    """Split references into numeric ids and names"""
+    ids, names = set(), set()
+    for value in values:
+        value = str(value or "").strip()
+        if value.isdigit():
+            ids.add(int(value))
+        if value:
+            names.add(value)
+    return ids, names
+
+
+def _resolve(model, name_field, values):
+    """
+    Map every reference in values to a primary key, or to None when it
+    matches several rows. Numeric references match ids and names alike.
+    """
+    ids, names = _split_references(values)
+    matches = {}
+    rows = model.objects.filter(
+        Q(id__in=ids) | Q(**{f"{name_field}__in": names})
+    ).values_list("id", name_field)
+    for pk, name in rows:
+        if pk in ids:
+            matches.setdefault(str(pk), set()).add(pk)
+        if name in names:
+            matches.setdefault(name, set()).add(pk)
+    return {
+        reference: pks.pop() if len(pks) == 1 else None
+        for reference, pks in matches.items()
+    }
+
+
+def _parse_show_time(value):
+    show_time = parse_datetime(str(value or "").strip())
+    if show_time and timezone.is_naive(show_time):
+        show_time = timezone.make_aware(show_time)
+    return show_time
+
+
+def import_performances(rows, partial=False, batch_size=1000):
+    """
+    Validate and insert performances from (play, theatre_hall, show_time)
+    rows. Plays and halls may be referenced by id, title or name.
+    Unless partial is set, any invalid row aborts the whole import.
+    """
+    rows = list(rows)
+    plays = _resolve(Play, "title", (row.get("play") for row in rows))
+    halls = _resolve(
+        TheatreHall, "name", (row.get("theatre_hall") for row in rows)
+    )
+
+    performances = []
+    errors = []
+    for line, row in enumerate(rows, start=1):
+        if isinstance(row, InvalidRow):
+            errors.append({"row": line, "errors": {"line": row.error}})
+            continue
+
+        row_errors = {}
+        play = str(row.get("play") or "").strip()
+        theatre_hall = str(row.get("theatre_hall") or "").strip()
+        show_time = _parse_show_time(row.get("show_time"))
+
+        if plays.get(play) is None:
+            row_errors["play"] = (
+                "Ambiguous play title." if play in plays
+                else f"Unknown play: {play!r}."
+            )
+        if halls.get(theatre_hall) is None:
+            row_errors["theatre_hall"] = (
+                "Ambiguous theatre hall name." if theatre_hall in halls
+                else f"Unknown theatre hall: {theatre_hall!r}."
+            )
+        if show_time is None:
+            row_errors["show_time"] = "Invalid datetime."
+
+        if row_errors:
+            errors.append({"row": line, "errors": row_errors})
+            continue
+
+        performances.append(
+            Performance(
+                play_id=plays[play],
+                theatre_hall_id=halls[theatre_hall],
+                show_time=show_time,
+            )
+        )
+
+    if errors and not partial:
+        return {"created": 0, "errors": errors}
+
+    with transaction.atomic():
+        created = Performance.objects.bulk_create(
+            performances, batch_size=batch_size
+        )
+        schedule_refresh(performance.id for performance in created)
+        invalidate(CATALOG)
+
+    return {"created": len(created), "errors": errors}
+
+
+def _split_list(value):
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value or "").split(";")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def _split_name(full_name):
+    first_name, _, last_name = full_name.partition(" ")
+    return first_name.strip(), last_name.strip()
+
+
+def _upsert_genres(names, known):
+    """Return how many genres were created, filling known with their ids"""
+    names = {name for name in names if name not in known}
+    known.update(
+        Genre.objects.filter(name__in=names).values_list("name", "id")
+    )
+    missing = [Genre(name=name) for name in names if name not in known]
+    Genre.objects.bulk_create(missing, ignore_conflicts=True)
+    if missing:
+        known.update(
+            Genre.objects.filter(
+                name__in=[genre.name for genre in missing]
+            ).values_list("name", "id")
+        )
+    return len(missing)
+
+
+def _upsert_actors(full_names, known):
+    """Return how many actors were created, filling known with their ids"""
+    pairs = {_split_name(full_name) for full_name in full_names} - set(known)
+    actors = Actor.objects.filter(
+        first_name__in={first for first, _ in pairs},
+        last_name__in={last for _, last in pairs},
+    ).order_by("-id").values_list("first_name", "last_name", "id")
+    for first_name, last_name, pk in actors:
+        if (first_name, last_name) in pairs:
+            known[first_name, last_name] = pk
+
+    created = Actor.objects.bulk_create(
+        Actor(first_name=first, last_name=last)
+        for first, last in pairs
+        if (first, last) not in known
+    )
+    for actor in created:
+        known[actor.first_name, actor.last_name] = actor.id
+    return len(created)
+
+
+def _link(through, field_name, pairs, existing_play_ids):
+    """Insert missing (play_id, related_id) rows into an m2m through table"""
+    if existing_play_ids:
+        pairs -= set(
+            through.objects.filter(
+                play_id__in=existing_play_ids
+            ).values_list("play_id", field_name)
+        )
+    if not pairs:
+        return
+
+    if connection.vendor == "postgresql":
+        # Building model instances dominates bulk_create for millions of
+        # link rows, so let PostgreSQL unpack two id arrays instead
+        play_ids, related_ids = zip(*pairs)
+        table = connection.ops.quote_name(through._meta.db_table)
+        column = connection.ops.quote_name(field_name)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (play_id, {column}) "
+                "SELECT * FROM unnest(%s::bigint[], %s::bigint[]) "
+                "ON CONFLICT DO NOTHING",
+                [list(play_ids), list(related_ids)],
+            )
+        return
+
+    through.objects.bulk_create(
+        [
+            through(play_id=play_id, **{field_name: related_id})
+            for play_id, related_id in pairs
+        ],
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+
+
+def _too_long(model, field_name, values):
+    """Error of the first value longer than the field allows, if any"""
+    max_length = model._meta.get_field(field_name).max_length
+    if any(len(value) > max_length for value in values):
+        return f"Ensure each value has at most {max_length} characters."
+    return None
+
+
+def _catalog_row_errors(row, title):
+    names = [_split_name(name) for name in _split_list(row.get("actors"))]
+    errors = {
+        "title": (
+            _too_long(Play, "title", [title]) if title else "Required."
+        ),
+        "genres": _too_long(Genre, "name", _split_list(row.get("genres"))),
+        "actors": (
+            _too_long(Actor, "first_name", [first for first, _ in names])
+            or _too_long(Actor, "last_name", [last for _, last in names])
+        ),
+    }
+    return {field: error for field, error in errors.items() if error}
+
+
+def _import_catalog_batch(rows, result, known):
+    plays = {}
+    for row in rows:
+        play = plays.setdefault(
+            row["title"], {"actors": set(), "genres": set()}
+        )
+        # Blank cells leave the current description alone
+        description = row.get("description")
+        if str(description or "").strip():
+            play["description"] = description
+        play["actors"].update(_split_list(row.get("actors")))
+        play["genres"].update(_split_list(row.get("genres")))
+
+    genre_ids = known["genres"]
+    result["genres_created"] += _upsert_genres(
+        set().union(*(play["genres"] for play in plays.values())), genre_ids
+    )
+    actor_ids = known["actors"]
+    result["actors_created"] += _upsert_actors(
+        set().union(*(play["actors"] for play in plays.values())), actor_ids
+    )
+
+    existing = {}
+    descriptions = {}
+    for pk, title, description in Play.objects.filter(
+        title__in=plays
+    ).order_by("-id").values_list("id", "title", "description"):
+        existing[title] = pk
+        descriptions[title] = description
+
+    to_update = [
+        Play(id=existing[title], description=play["description"])
+        for title, play in plays.items()
+        if title in existing
+        and play.get("description", descriptions[title])
+        != descriptions[title]
+    ]
+    Play.objects.bulk_update(to_update, ["description"], batch_size=1000)
+    existing_play_ids = list(existing.values())
+    created = Play.objects.bulk_create(
+        Play(title=title, description=play.get("description"))
+        for title, play in plays.items()
+        if title not in existing
+    )
+    for play in created:
+        existing[play.title] = play.id
+
+    _link(
+        Play.actor.through,
+        "actor_id",
+        {
+            (existing[title], actor_ids[_split_name(full_name)])
+            for title, play in plays.items()
+            for full_name in play["actors"]
+        },
+        existing_play_ids,
+    )
+    _link(
+        Play.genre.through,
+        "genre_id",
+        {
+            (existing[title], genre_ids[name])
+            for title, play in plays.items()
+            for name in play["genres"]
+        },
+        existing_play_ids,
+    )
+
+    result["created"] += len(created)
+    result["updated"] += len(to_update)
+
+
+def import_catalog(rows, partial=False, batch_size=10000):
+    """
+    Upsert plays with their actors and genres from
+    (title, description, actors, genres) rows, in batches.
+    Plays are matched by title, actors by full name and genres by name.
+    Unless partial is set, any invalid row rolls back the whole import.
+    """
+    result = {
+        "created": 0,
+        "updated": 0,
+        "actors_created": 0,
+        "genres_created": 0,
+        "errors": [],
+    }
+    known = {"actors": {}, "genres": {}}
+    numbered = enumerate(rows, start=1)
+    chunks = iter(lambda: list(itertools.islice(numbered, batch_size)), [])
+
+    with transaction.atomic():
+        for chunk in chunks:
+            batch = []
+            for line, row in chunk:
+                if isinstance(row, InvalidRow):
+                    result["errors"].append(
+                        {"row": line, "errors": {"line": row.error}}
+                    )
+                    continue
+                title = str(row.get("title") or "").strip()
+                row_errors = _catalog_row_errors(row, title)
+                if row_errors:
+                    result["errors"].append(
+                        {"row": line, "errors": row_errors}
+                    )
+                    continue
+                batch.append(dict(row, title=title))
+
+            if batch and (partial or not result["errors"]):
+                _import_catalog_batch(batch, result, known)
+
+        if result["errors"] and not partial:
+            transaction.set_rollback(True)
+            result.update(
+                created=0, updated=0, actors_created=0, genres_created=0
+            )
+        else:
+            invalidate(CATALOG)
+
+    return result
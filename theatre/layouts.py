@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from theatre.catalog_cache import HALL_LAYOUTS, get_versions, invalidate
+from theatre.metrics import record_cache
+from theatre.models import Performance, TheatreHall
+from theatre.object_cache import LRUCache
+
+
+HallLayout = namedtuple("HallLayout", ("rows", "seats_in_row"))
+
+
+class LayoutCache:
+    """
+    Hall dimensions and the hall of every performance, kept in process.
+    Local writes drop entries through signals; writes of other processes
+    are noticed within HALL_LAYOUT_VERSION_CHECK_INTERVAL seconds
+    through the shared hall layout version.
+    """
+
+    def __init__(self, maxsize):
+        self.halls = LRUCache(maxsize)
+        self.performances = LRUCache(maxsize)
+        self.version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def check_version(self):
+        now = time.monotonic()
+        interval = settings.HALL_LAYOUT_VERSION_CHECK_INTERVAL
+        if self.checked_at is not None and now - self.checked_at < interval:
+            return
+        with self.lock:
+            self.checked_at = now
+            (version,) = get_versions([HALL_LAYOUTS])
+            if version != self.version:
+                self.halls.clear()
+                self.performances.clear()
+                self.version = version
+
+    def hall(self, hall_id):
+        self.check_version()
+        layout = self.halls.get(hall_id)
+        record_cache("hall_layout", layout is not None)
+        if layout is None:
+            layout = HallLayout(
+                *TheatreHall.objects.values_list(
+                    "rows", "seats_in_row"
+                ).get(id=hall_id)
+            )
+            self.halls.set(hall_id, layout)
+        return layout
+
+    def preload_halls(self, hall_ids):
+        """Load every missing hall of hall_ids with a single query"""
+        self.check_version()
+        missing = {
+            hall_id for hall_id in hall_ids if self.halls.get(hall_id) is None
+        }
+        if not missing:
+            return
+        for hall_id, rows, seats_in_row in TheatreHall.objects.filter(
+            id__in=missing
+        ).values_list("id", "rows", "seats_in_row"):
+            self.halls.set(hall_id, HallLayout(rows, seats_in_row))
+
+    def for_performance(self, performance_id, hall_id=None):
+        """Layout of the hall a performance takes place in"""
+        self.check_version()
+        if hall_id is None:
+            hall_id = self.performances.get(performance_id)
+        if hall_id is not None:
+            return self.hall(hall_id)
+
+        record_cache("hall_layout", False)
+        hall_id, rows, seats_in_row = Performance.objects.values_list(
+            "theatre_hall_id",
+            "theatre_hall__rows",
+            "theatre_hall__seats_in_row",
+        ).get(id=performance_id)
+        layout = HallLayout(rows, seats_in_row)
+        self.performances.set(performance_id, hall_id)
+        self.halls.set(hall_id, layout)
+        return layout
+
+    def clear(self):
+        self.halls.clear()
+        self.performances.clear()
+
+
+LAYOUTS = LayoutCache(settings.HALL_LAYOUT_CACHE_SIZE)
+
+
+def hall_layout(hall_id):
+    return LAYOUTS.hall(hall_id)
+
+
+def preload_hall_layouts(hall_ids):
+    LAYOUTS.preload_halls(hall_ids)
+
+
+def performance_layout(performance_id, hall_id=None):
+    return LAYOUTS.for_performance(performance_id, hall_id)
+
+
+def _discard(cache, key):
+    cache.discard(key)
+    # Another request may cache the old row until this transaction commits
+    transaction.on_commit(lambda: cache.discard(key))
+    invalidate(HALL_LAYOUTS)
+
+
+def invalidate_hall(hall_id):
+    _discard(LAYOUTS.halls, hall_id)
+
+
+def invalidate_performance(performance_id):
+    _discard(LAYOUTS.performances, performance_id)
+
+
+def invalidate_layouts():
+    """Drop every cached layout, for writes that don't name their rows"""
+    LAYOUTS.clear()
+    transaction.on_commit(LAYOUTS.clear)
+    invalidate(HALL_LAYOUTS)
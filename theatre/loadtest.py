@@ -0,0 +1,111 @@
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, 0.0 for no values"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = math.ceil(fraction * len(values))
+    return values[min(len(values), max(rank, 1)) - 1]
+
+
+class LatencyRecorder:
+    """Thread-safe collector of per-endpoint latencies and status codes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, endpoint, status_code, seconds):
+        with self._lock:
+            self.latencies[endpoint].append(seconds * 1000)
+            self.statuses[endpoint][status_code] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def total_requests(self):
+        return sum(len(values) for values in self.latencies.values())
+
+    def summary(self):
+        """Yield (endpoint, count, p50, p95, p99, statuses) rows"""
+        for endpoint in sorted(self.latencies):
+            values = self.latencies[endpoint]
+            yield (
+                endpoint,
+                len(values),
+                percentile(values, 0.50),
+                percentile(values, 0.95),
+                percentile(values, 0.99),
+                dict(self.statuses[endpoint]),
+            )
+
+
+class ApiClient:
+    """Minimal JSON HTTP client that reports every call to a recorder"""
+
+    def __init__(self, base_url, recorder, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, method, path, endpoint, payload=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        request = urllib.request.Request(
+            self.base_url + path, data=data, headers=headers, method=method
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as r:
+                status_code, body = r.status, r.read()
+        except urllib.error.HTTPError as error:
+            status_code, body = error.code, error.read()
+        except (urllib.error.URLError, OSError):
+            status_code, body = 0, b""
+        self.recorder.record(
+            endpoint, status_code, time.perf_counter() - started
+        )
+
+        try:
+            return status_code, json.loads(body) if body else None
+        except ValueError:
+            return status_code, None
+
+    def get(self, path, endpoint):
+        return self.request("GET", path, endpoint)
+
+    def post(self, path, endpoint, payload):
+        return self.request("POST", path, endpoint, payload)
+
+    def authenticate(self, email, password):
+        status_code, body = self.post(
+            "/api/user/token/",
+            "token",
+            {"email": email, "password": password},
+        )
+        if status_code == 200:
+            self.token = body["access"]
+        return status_code == 200
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from theatre.archive import archive_cutoff, archive_tickets
+
+
+class Command(BaseCommand):
+    help = (
+        "Move tickets of performances older than TICKET_ARCHIVE_AFTER "
+        "to the archive table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help=(
+                "Archive performances older than this many days instead, "
+                "at least TICKET_ARCHIVE_AFTER"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options["days"] is None:
+            before = archive_cutoff()
+        else:
+            before = timezone.now() - timedelta(days=options["days"])
+
+        try:
+            moved = archive_tickets(before, batch_size=options["batch_size"])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {moved} tickets of performances before {before}"
+            )
+        )
@@ -0,0 +1,53 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from theatre.allocation import SeatAllocator
+
+
+class Command(BaseCommand):
+    help = "Benchmark best-available seat allocation on a synthetic hall"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=40)
+        parser.add_argument("--seats-in-row", type=int, default=50)
+        parser.add_argument("--occupancy", type=float, default=0.6)
+        parser.add_argument("--count", type=int, default=4)
+        parser.add_argument("--iterations", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        seats_in_row = options["seats_in_row"]
+        rng = random.Random(options["seed"])
+
+        timings = []
+        for _ in range(options["iterations"]):
+            taken = {
+                row: {
+                    seat
+                    for seat in range(1, seats_in_row + 1)
+                    if rng.random() < options["occupancy"]
+                }
+                for row in range(1, rows + 1)
+            }
+            started = time.perf_counter()
+            SeatAllocator(rows, seats_in_row, taken).allocate(
+                options["count"]
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            f"{rows * seats_in_row} seats, "
+            f"{options['occupancy']:.0%} occupied, "
+            f"{options['count']} seats per request, "
+            f"{len(timings)} iterations"
+        )
+        self.stdout.write(
+            f"mean {statistics.mean(timings):.3f} ms, "
+            f"p50 {timings[len(timings) // 2]:.3f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:.3f} ms"
+        )
@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from theatre.models import Actor, Genre, Performance, Play, TheatreHall
+from theatre.views import PerformanceViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare payload size, queries and latency of the nested and the "
+        "compact performance list. Seeded data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--performances", type=int, default=500)
+        parser.add_argument("--plays", type=int, default=50)
+        parser.add_argument("--actors", type=int, default=200)
+        parser.add_argument("--actors-per-play", type=int, default=6)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        tag = uuid.uuid4().hex[:8]
+        halls = TheatreHall.objects.bulk_create(
+            TheatreHall(name=f"Bench {tag} {i}", rows=20, seats_in_row=30)
+            for i in range(5)
+        )
+        genres = Genre.objects.bulk_create(
+            Genre(name=f"Bench {tag} {i}") for i in range(10)
+        )
+        actors = Actor.objects.bulk_create(
+            Actor(first_name=f"Bench{i}", last_name=tag)
+            for i in range(options["actors"])
+        )
+        plays = Play.objects.bulk_create(
+            Play(title=f"Bench {tag} {i}", description="x" * 200)
+            for i in range(options["plays"])
+        )
+        for play in plays:
+            play.actor.set(rng.sample(actors, options["actors_per_play"]))
+            play.genre.set(rng.sample(genres, 2))
+        now = timezone.now()
+        Performance.objects.bulk_create(
+            Performance(
+                play=rng.choice(plays),
+                theatre_hall=rng.choice(halls),
+                show_time=now + timedelta(hours=i),
+            )
+            for i in range(options["performances"])
+        )
+        user = get_user_model().objects.create_user(
+            email=f"bench-{tag}@example.com", password=uuid.uuid4().hex
+        )
+        return ",".join(str(play.id) for play in plays), user
+
+    def measure(self, view, play_ids, user, fmt, iterations):
+        factory = APIRequestFactory()
+        timings = []
+        for _ in range(iterations):
+            request = factory.get(
+                "/api/theatre/performance/", {"play": play_ids, "format": fmt}
+            )
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+        return len(response.content), len(queries), timings
+
+    def handle(self, *args, **options):
+        view = PerformanceViewSet.as_view({"get": "list"})
+        # Measure rendering, not the catalog response cache
+        with override_settings(CATALOG_CACHE_TIMEOUT=0), transaction.atomic():
+            play_ids, user = self.seed(options)
+            results = [
+                (fmt, *self.measure(
+                    view, play_ids, user, fmt, options["iterations"]
+                ))
+                for fmt in ("json", "compact")
+            ]
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{options['performances']} performances of "
+            f"{options['plays']} plays, {options['iterations']} iterations"
+        )
+        self.stdout.write(
+            f"{'format':<10}{'bytes':>10}{'queries':>9}"
+            f"{'mean ms':>10}{'p50 ms':>10}"
+        )
+        for fmt, size, queries, timings in results:
+            self.stdout.write(
+                f"{fmt:<10}{size:>10}{queries:>9}"
+                f"{statistics.mean(timings):>10.1f}"
+                f"{statistics.median(timings):>10.1f}"
+            )
@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.exceptions import APIException, ValidationError
+
+from theatre.availability import refresh_availability
+from theatre.loadtest import LatencyRecorder
+from theatre.models import (
+    Performance,
+    PerformanceAvailability,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+from theatre.seat_map import decode
+from theatre.serializers import ReservationSerializer
+
+
+MODES = ("locking", "optimistic")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare locking and optimistic (seat map compare-and-swap) "
+        "reservations of a single hot performance, in process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument("--bookings", type=int, default=10,
+                            help="Reservations each worker tries to make")
+        parser.add_argument("--rows", type=int, default=20)
+        parser.add_argument("--seats-in-row", type=int, default=30)
+        parser.add_argument(
+            "--hot-rows",
+            type=int,
+            default=4,
+            help="Workers only want seats in the first N rows",
+        )
+        parser.add_argument("--tickets", type=int, default=2)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def seed(self, options):
+        tag = uuid.uuid4().hex[:8]
+        performance = Performance.objects.create(
+            play=Play.objects.create(title=f"Benchmark {tag}"),
+            theatre_hall=TheatreHall.objects.create(
+                name=f"Benchmark {tag}",
+                rows=options["rows"],
+                seats_in_row=options["seats_in_row"],
+            ),
+            show_time=timezone.now() + timedelta(days=30),
+        )
+        refresh_availability([performance.id])
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"bench-{tag}-{i}@example.com")
+            for i in range(options["workers"])
+        )
+        return performance, users
+
+    def book(self, mode, performance, user, options, outcome):
+        rng = random.Random(f"{options['seed']}-{user.email}")
+        hot_seats = [
+            (row, seat)
+            for row in range(1, options["hot_rows"] + 1)
+            for seat in range(1, options["seats_in_row"] + 1)
+        ]
+        try:
+            for _ in range(options["bookings"]):
+                seat_map = PerformanceAvailability.objects.filter(
+                    performance=performance
+                ).values_list("seat_map", flat=True).get()
+                taken = set(decode(
+                    options["rows"], options["seats_in_row"], bytes(seat_map)
+                ))
+                free = [seat for seat in hot_seats if seat not in taken]
+                if len(free) < options["tickets"]:
+                    return
+
+                data = {
+                    "tickets": [
+                        {"performance": performance.id, "row": row,
+                         "seat": seat}
+                        for row, seat in rng.sample(free, options["tickets"])
+                    ],
+                    "optimistic": mode == "optimistic",
+                }
+
+                started = time.perf_counter()
+                serializer = ReservationSerializer(data=data)
+                try:
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save(user=user)
+                    status_code = 201
+                except ValidationError:
+                    status_code = 400
+                except APIException as error:
+                    status_code = error.status_code
+                self.recorder.record(
+                    mode, status_code, time.perf_counter() - started
+                )
+                if status_code == 201:
+                    with self.lock:
+                        outcome["booked"] += options["tickets"]
+        finally:
+            connection.close()
+
+    def run(self, mode, options):
+        performance, users = self.seed(options)
+        outcome = {"booked": 0}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            futures = [
+                executor.submit(
+                    self.book, mode, performance, user, options, outcome
+                )
+                for user in users
+            ]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+
+        tickets = Ticket.objects.filter(performance=performance)
+        duplicates = (
+            tickets.values("row", "seat")
+            .annotate(copies=Count("id"))
+            .filter(copies__gt=1)
+            .exists()
+        )
+        consistent = not duplicates and tickets.count() == outcome["booked"]
+
+        Reservation.objects.filter(user__in=users).delete()
+        tickets.delete()
+        hall = performance.theatre_hall
+        play = performance.play
+        performance.delete()
+        hall.delete()
+        play.delete()
+        get_user_model().objects.filter(
+            id__in=[user.id for user in users]
+        ).delete()
+        return elapsed, consistent
+
+    def handle(self, *args, **options):
+        self.recorder = LatencyRecorder()
+        self.lock = threading.Lock()
+
+        results = {mode: self.run(mode, options) for mode in MODES}
+        self.recorder.stop()
+
+        self.stdout.write(
+            f"{options['workers']} workers x {options['bookings']} "
+            f"bookings of {options['tickets']} seats in "
+            f"{options['hot_rows']} rows of {options['seats_in_row']}"
+        )
+        self.stdout.write(
+            f"{'mode':<12}{'count':>7}{'per s':>9}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}  statuses"
+        )
+        for mode, count, p50, p95, p99, statuses in self.recorder.summary():
+            elapsed, _ = results[mode]
+            self.stdout.write(
+                f"{mode:<12}{count:>7}{count / elapsed:>9.1f}{p50:>10.1f}"
+                f"{p95:>10.1f}{p99:>10.1f}  {statuses}"
+            )
+
+        inconsistent = [
+            mode for mode, (_, consistent) in results.items()
+            if not consistent
+        ]
+        if inconsistent:
+            raise CommandError(
+                f"Seats were sold twice or lost in: {', '.join(inconsistent)}"
+            )
@@ -0,0 +1,142 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from theatre.loadtest import ApiClient, LatencyRecorder
+
+
+MEDIA_SAMPLE = "bench/sample.bin"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            urllib.request.urlopen(base_url + "/admin/login/", timeout=1)
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare runserver with the production gunicorn setup on a "
+        "rendered page, precompressed static and media (full and range) "
+        "requests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--threads", type=int, default=4)
+
+    def prepare(self):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        media_path = os.path.join(settings.MEDIA_ROOT, MEDIA_SAMPLE)
+        os.makedirs(os.path.dirname(media_path), exist_ok=True)
+        with open(media_path, "wb") as media_file:
+            media_file.write(os.urandom(1024 * 1024))
+
+        media_url = settings.MEDIA_URL + MEDIA_SAMPLE
+        return [
+            ("admin login", "/admin/login/", {}),
+            (
+                "static",
+                staticfiles_storage.url("admin/css/base.css"),
+                {"Accept-Encoding": "br, gzip"},
+            ),
+            ("media", media_url, {}),
+            ("media range", media_url, {"Range": "bytes=0-65535"}),
+        ]
+
+    def servers(self, options):
+        manage = str(settings.BASE_DIR / "manage.py")
+        config = str(settings.BASE_DIR / "gunicorn.conf.py")
+        yield "runserver", lambda port: [
+            sys.executable, manage, "runserver", "--noreload", str(port)
+        ]
+        yield "gunicorn", lambda port: [
+            sys.executable, "-m", "gunicorn",
+            "--config", config,
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(options["workers"]),
+            "--threads", str(options["threads"]),
+            "--access-logfile", "/dev/null",
+        ]
+
+    def run_load(self, base_url, targets, options):
+        recorder = LatencyRecorder()
+        client = ApiClient(base_url, recorder)
+
+        def fetch(index):
+            endpoint, path, headers = targets[index % len(targets)]
+            client.request("GET", path, endpoint, headers=headers)
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(fetch, range(options["requests"])))
+        recorder.stop()
+        return recorder
+
+    def handle(self, *args, **options):
+        targets = self.prepare()
+        env = dict(
+            os.environ,
+            DJANGO_DEBUG="0",
+            DJANGO_ALLOWED_HOSTS="127.0.0.1,localhost",
+        )
+
+        for name, command in self.servers(options):
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = subprocess.Popen(
+                command(port),
+                cwd=settings.BASE_DIR,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                if not wait_until_up(base_url, process):
+                    raise CommandError(f"{name} did not start.")
+                # Let every worker load code and caches before measuring
+                self.run_load(base_url, targets, options)
+                recorder = self.run_load(base_url, targets, options)
+            finally:
+                process.terminate()
+                process.wait()
+
+            self.stdout.write(
+                f"\n{name}: {recorder.total_requests} requests in "
+                f"{recorder.elapsed:.2f} s "
+                f"({recorder.total_requests / recorder.elapsed:.1f} req/s)"
+            )
+            self.stdout.write(
+                f"{'endpoint':<14}{'count':>7}{'p50 ms':>10}"
+                f"{'p95 ms':>10}{'p99 ms':>10}  statuses"
+            )
+            for endpoint, count, p50, p95, p99, statuses in (
+                recorder.summary()
+            ):
+                self.stdout.write(
+                    f"{endpoint:<14}{count:>7}{p50:>10.1f}{p95:>10.1f}"
+                    f"{p99:>10.1f}  {statuses}"
+                )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from theatre_api_service.schema import build_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema into SCHEMA_CACHE_PATH so the "
+        "schema views do not have to introspect the API at runtime"
+    )
+
+    def handle(self, *args, **options):
+        fingerprint = build_schema()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote schema {fingerprint[:12]} to "
+                f"{settings.SCHEMA_CACHE_PATH}"
+            )
+        )
@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from theatre.query_plans import check_routes, finding_key, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a realistic data volume, EXPLAIN ANALYZE the queries of "
+        "every list and detail route and fail on sequential scans, sorts "
+        "on disk or bad row estimates. Seeded data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--performances", type=int, default=3000)
+        parser.add_argument("--tickets", type=int, default=60,
+                            help="Sold seats per performance")
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=5000,
+            help="Ignore plan nodes handling fewer rows",
+        )
+        parser.add_argument(
+            "--misestimate",
+            type=float,
+            default=10,
+            help="Flag row estimates off by more than this factor",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="JSON list of accepted findings; only others fail",
+        )
+        parser.add_argument(
+            "--write-baseline",
+            help="Store the current findings as the accepted ones",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                "Query plans can only be checked on PostgreSQL."
+            )
+
+        accepted = set()
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline:
+                accepted = set(json.load(baseline))
+
+        findings = []
+        with transaction.atomic():
+            self.stdout.write("Seeding...")
+            user, placeholders = seed(
+                performances=options["performances"],
+                tickets=options["tickets"],
+                users=options["users"],
+                seed=options["seed"],
+            )
+            for route, status_code, queries, problems in check_routes(
+                user,
+                placeholders,
+                min_rows=options["min_rows"],
+                misestimate=options["misestimate"],
+            ):
+                self.stdout.write(
+                    f"{route:<40}{status_code:>5}{queries:>4} queries"
+                )
+                if status_code != 200:
+                    problems.append(None)
+                    self.stdout.write(
+                        self.style.ERROR(f"  responded {status_code}")
+                    )
+                for finding in filter(None, problems):
+                    known = finding_key(finding) in accepted
+                    style = self.style.WARNING if known else self.style.ERROR
+                    self.stdout.write(
+                        style(
+                            f"  {finding.kind} on {finding.relation}: "
+                            f"{finding.detail}"
+                            + (" (accepted)" if known else "")
+                        )
+                    )
+                findings.extend(problems)
+            transaction.set_rollback(True)
+
+        if options["write_baseline"]:
+            with open(options["write_baseline"], "w") as baseline:
+                json.dump(
+                    sorted({finding_key(f) for f in findings if f}),
+                    baseline,
+                    indent=2,
+                )
+            return
+
+        regressions = [
+            finding for finding in findings
+            if finding is None or finding_key(finding) not in accepted
+        ]
+        if regressions:
+            raise CommandError(f"{len(regressions)} query plan regressions.")
+        self.stdout.write(self.style.SUCCESS("No query plan regressions."))
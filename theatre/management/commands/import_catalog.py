@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from theatre.importers import (
+    IMPORT_FORMATS,
+    guess_format,
+    import_catalog,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Import plays with their actors and genres from CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=IMPORT_FORMATS)
+        parser.add_argument(
+            "--partial",
+            action="store_true",
+            help="Import valid rows even if some rows are invalid",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["path"])
+        with open(options["path"], encoding="utf-8-sig") as stream:
+            result = import_catalog(
+                read_rows(stream, fmt),
+                partial=options["partial"],
+                batch_size=options["batch_size"],
+            )
+
+        for error in result["errors"]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+
+        if result["errors"] and not options["partial"]:
+            raise CommandError("Nothing imported, fix the rows above.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Plays: {result['created']} created, "
+                f"{result['updated']} updated; "
+                f"actors: {result['actors_created']} created; "
+                f"genres: {result['genres_created']} created"
+            )
+        )
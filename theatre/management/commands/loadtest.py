@@ -0,0 +1,255 @@
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from theatre.availability import refresh_availability
+from theatre.loadtest import ApiClient, LatencyRecorder
+from theatre.models import (
+    Performance,
+    PerformanceAvailability,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate an on-sale storm against a running server: concurrent "
+        "users log in, browse and race to reserve overlapping seats"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--rows", type=int, default=10)
+        parser.add_argument("--seats-in-row", type=int, default=20)
+        parser.add_argument(
+            "--hot-rows",
+            type=int,
+            default=2,
+            help="Users only want seats in the first N rows",
+        )
+        parser.add_argument("--tickets", type=int, default=2)
+        parser.add_argument("--attempts", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Leave the seeded performance, users and tickets in place",
+        )
+
+    def seed(self, options):
+        tag = uuid.uuid4().hex[:8]
+        hall = TheatreHall.objects.create(
+            name=f"Load test {tag}",
+            rows=options["rows"],
+            seats_in_row=options["seats_in_row"],
+        )
+        performance = Performance.objects.create(
+            play=Play.objects.create(title=f"Load test {tag}"),
+            theatre_hall=hall,
+            show_time=timezone.now() + timedelta(days=30),
+        )
+        refresh_availability([performance.id])
+
+        password = uuid.uuid4().hex
+        hashed = make_password(password)
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"loadtest-{tag}-{i}@example.com",
+                             password=hashed)
+            for i in range(options["users"])
+        )
+        return performance, [user.email for user in users], password
+
+    def simulate_user(self, email, password, performance, options, outcome):
+        rng = random.Random(f"{options['seed']}-{email}")
+        client = ApiClient(options["base_url"], self.recorder)
+        if not client.authenticate(email, password):
+            with self.lock:
+                outcome["failed_logins"] += 1
+            return
+
+        client.get("/api/theatre/plays/", "plays")
+        detail_path = f"/api/theatre/performance/{performance.id}/"
+        hot_seats = [
+            (row, seat)
+            for row in range(1, options["hot_rows"] + 1)
+            for seat in range(1, options["seats_in_row"] + 1)
+        ]
+
+        for _ in range(options["attempts"]):
+            status_code, detail = client.get(detail_path, "performance")
+            if status_code != 200:
+                with self.lock:
+                    outcome["errors"] += 1
+            taken = {
+                (place["row"], place["seat"])
+                for place in (detail or {}).get("taken_places", [])
+            }
+            free = [seat for seat in hot_seats if seat not in taken]
+            if len(free) < options["tickets"]:
+                return
+
+            seats = rng.sample(free, options["tickets"])
+            status_code, body = client.post(
+                "/api/theatre/reservation/",
+                "reservation",
+                {
+                    "tickets": [
+                        {"performance": performance.id, "row": row,
+                         "seat": seat}
+                        for row, seat in seats
+                    ]
+                },
+            )
+            with self.lock:
+                if status_code == 201:
+                    outcome["booked"] += len(seats)
+                    return
+                # Someone else got a seat first
+                if status_code == 400:
+                    outcome["conflicts"] += 1
+                else:
+                    outcome["errors"] += 1
+
+    def clean_up(self, performance, emails):
+        Ticket.objects.filter(performance=performance).delete()
+        Reservation.objects.filter(user__email__in=emails).delete()
+        hall = performance.theatre_hall
+        play = performance.play
+        performance.delete()
+        hall.delete()
+        play.delete()
+        get_user_model().objects.filter(email__in=emails).delete()
+
+    def check_consistency(self, performance, booked):
+        tickets = Ticket.objects.filter(performance=performance)
+        duplicates = (
+            tickets.values("row", "seat")
+            .annotate(copies=Count("id"))
+            .filter(copies__gt=1)
+            .count()
+        )
+        sold = tickets.count()
+        hall = performance.theatre_hall
+        availability = PerformanceAvailability.objects.filter(
+            performance=performance
+        ).first()
+        free_seats = availability.free_seats if availability else None
+
+        checks = [
+            ("no seat sold twice", duplicates == 0),
+            ("sold tickets match 201 responses", sold == booked),
+            (
+                "availability summary matches tickets",
+                free_seats == hall.rows * hall.seats_in_row - sold,
+            ),
+        ]
+        return sold, checks
+
+    def handle(self, *args, **options):
+        self.recorder = LatencyRecorder()
+        self.lock = threading.Lock()
+        outcome = {"booked": 0, "conflicts": 0, "failed_logins": 0,
+                   "errors": 0}
+
+        performance, emails, password = self.seed(options)
+        self.stdout.write(
+            f"Seeded performance {performance.id} with "
+            f"{len(emails)} users, running against {options['base_url']}"
+        )
+        try:
+            self.run(performance, emails, password, options, outcome)
+        finally:
+            if not options["keep_data"]:
+                self.clean_up(performance, emails)
+
+    def run(self, performance, emails, password, options, outcome):
+        with ThreadPoolExecutor(max_workers=len(emails)) as executor:
+            futures = [
+                executor.submit(
+                    self.simulate_user,
+                    email,
+                    password,
+                    performance,
+                    options,
+                    outcome,
+                )
+                for email in emails
+            ]
+        self.recorder.stop()
+
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                errors.append(error)
+        if errors:
+            raise CommandError(
+                f"{len(errors)} simulated users failed, first with: "
+                f"{errors[0]!r}"
+            )
+
+        if outcome["failed_logins"]:
+            raise CommandError(
+                f"{outcome['failed_logins']} simulated users could not "
+                f"log in."
+            )
+        if not self.recorder.total_requests:
+            raise CommandError("No requests were made.")
+
+        self.stdout.write(
+            f"\n{self.recorder.total_requests} requests in "
+            f"{self.recorder.elapsed:.2f} s "
+            f"({self.recorder.total_requests / self.recorder.elapsed:.1f}"
+            f" req/s)"
+        )
+        self.stdout.write(
+            f"{'endpoint':<14}{'count':>7}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}  statuses"
+        )
+        for endpoint, count, p50, p95, p99, statuses in (
+            self.recorder.summary()
+        ):
+            self.stdout.write(
+                f"{endpoint:<14}{count:>7}{p50:>10.1f}{p95:>10.1f}"
+                f"{p99:>10.1f}  {statuses}"
+            )
+
+        attempts = sum(self.recorder.statuses["reservation"].values())
+        conflict_rate = outcome["conflicts"] / attempts if attempts else 0
+        self.stdout.write(
+            f"\nreservation attempts: {attempts}, "
+            f"conflicts: {outcome['conflicts']} ({conflict_rate:.1%}), "
+            f"errors: {outcome['errors']}"
+        )
+
+        sold, checks = self.check_consistency(
+            performance, outcome["booked"]
+        )
+        self.stdout.write(f"tickets sold: {sold}")
+        failed = False
+        for name, passed in checks:
+            failed |= not passed
+            self.stdout.write(
+                f"  {name}: "
+                + (self.style.SUCCESS("ok") if passed
+                   else self.style.ERROR("FAILED"))
+            )
+        if failed:
+            raise CommandError("Seat consistency checks failed.")
+        if outcome["errors"]:
+            raise CommandError(
+                f"{outcome['errors']} requests failed unexpectedly."
+            )
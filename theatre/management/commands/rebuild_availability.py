@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from theatre.availability import refresh_availability
+from theatre.models import Performance
+
+
+class Command(BaseCommand):
+    help = "Rebuild the availability summary of performances"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "performance_ids",
+            nargs="*",
+            type=int,
+            help="Only rebuild these performances",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        queryset = Performance.objects.order_by("id")
+        if options["performance_ids"]:
+            queryset = queryset.filter(id__in=options["performance_ids"])
+
+        performance_ids = list(queryset.values_list("id", flat=True))
+        batch_size = options["batch_size"]
+        refreshed = 0
+        for start in range(0, len(performance_ids), batch_size):
+            refreshed += refresh_availability(
+                performance_ids[start:start + batch_size]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt availability of {refreshed} performances"
+            )
+        )
@@ -0,0 +1,482 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from theatre.idempotency import REPLAYED_HEADER
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+QUERY_DURATION_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SNAPSHOT_PREFIX = "metrics-"
+# Counters of exited workers, so totals do not drop when they go away
+RETIRED_SNAPSHOT = "metrics-retired.json"
+PROCESS_KEY = "_process"
+
+
+def _label_key(labelnames, labels):
+    return json.dumps([str(labels[name]) for name in labelnames])
+
+
+def _start_time(pid):
+    """Start time of a process in clock ticks since boot, None if unknown"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # The command name in parentheses may contain spaces
+            return int(stat.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _is_running(pid, started):
+    """Whether the process that wrote a snapshot is still alive"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    # A recycled pid belongs to a process started at another time
+    return started is None or _start_time(pid) in (None, started)
+
+
+@contextmanager
+def _directory_lock(directory):
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path, snapshot):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temporary, path)
+
+
+class Registry:
+    """
+    Process-local metric values. When METRICS_DIR is set every process
+    writes its snapshot there, and a scrape merges all of them so
+    several WSGI workers report as one.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+        return metric
+
+    def update(self, name, key, update):
+        with self.lock:
+            values = self.values[name]
+            values[key] = update(values.get(key))
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.values))
+
+    @property
+    def directory(self):
+        return getattr(settings, "METRICS_DIR", None)
+
+    def flush(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        pid = os.getpid()
+        snapshot = self.snapshot()
+        snapshot[PROCESS_KEY] = {"pid": pid, "started": _start_time(pid)}
+        _write_snapshot(
+            os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{pid}.json"),
+            snapshot,
+        )
+        self.last_flush = time.monotonic()
+
+    def start_flushing(self):
+        """
+        Flush from a daemon thread as well, so an idle worker's values
+        are not left unwritten until its next request
+        """
+        if not self.directory:
+            return
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+    def maybe_flush(self):
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+        if self.directory and time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    def collect(self):
+        """Return the values of this process, or of all processes"""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        merged = {name: {} for name in self.metrics}
+        with _directory_lock(self.directory):
+            self.retire_exited_workers()
+            for filename in os.listdir(self.directory):
+                if not filename.endswith(".json"):
+                    continue
+                snapshot = _read_snapshot(
+                    os.path.join(self.directory, filename)
+                )
+                if snapshot is not None:
+                    self.merge(merged, snapshot)
+        return merged
+
+    def merge(self, merged, snapshot, gauges=True):
+        for name, values in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is None or (not gauges and metric.kind == "gauge"):
+                continue
+            values_of_metric = merged.setdefault(name, {})
+            for key, value in values.items():
+                values_of_metric[key] = metric.merge(
+                    values_of_metric.get(key), value
+                )
+
+    def retire_exited_workers(self):
+        """
+        Fold the snapshots of exited workers into the retired one:
+        their counters and histograms still count, their gauges do not
+        """
+        retired_path = os.path.join(self.directory, RETIRED_SNAPSHOT)
+        retired = None
+        for filename in os.listdir(self.directory):
+            name = filename[len(SNAPSHOT_PREFIX):-len(".json")]
+            if not (
+                filename.startswith(SNAPSHOT_PREFIX)
+                and filename.endswith(".json")
+                and name.isdigit()
+            ):
+                continue
+            path = os.path.join(self.directory, filename)
+            snapshot = _read_snapshot(path)
+            if snapshot is None:
+                continue
+            process = snapshot.get(PROCESS_KEY) or {}
+            if _is_running(int(name), process.get("started")):
+                continue
+
+            if retired is None:
+                retired = _read_snapshot(retired_path) or {}
+            self.merge(retired, snapshot, gauges=False)
+            _write_snapshot(retired_path, retired)
+            os.remove(path)
+
+    def render(self):
+        values = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.extend(metric.render(values.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def inc(self, amount=1, **labels):
+        REGISTRY.update(
+            self.name,
+            _label_key(self.labelnames, labels),
+            lambda value: (value or 0) + amount,
+        )
+
+    @staticmethod
+    def merge(current, value):
+        return (current or 0) + value
+
+    def header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def labels_text(self, key, **extra):
+        pairs = list(zip(self.labelnames, json.loads(key)))
+        pairs.extend(extra.items())
+        if not pairs:
+            return ""
+        escaped = (
+            (name, value.replace("\\", "\\\\").replace('"', '\\"'))
+            for name, value in pairs
+        )
+        text = ",".join(f'{name}="{value}"' for name, value in escaped)
+        return "{" + text + "}"
+
+    def render(self, values):
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{self.labels_text(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    Current value, stored with the time it was set. Workers report the
+    same gauge, so merging keeps the latest value instead of a sum.
+    """
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        REGISTRY.update(
+            self.name,
+            _label_key(self.labelnames, labels),
+            lambda _: [value, time.time()],
+        )
+
+    @staticmethod
+    def merge(current, value):
+        if current is None or value[1] >= current[1]:
+            return list(value)
+        return current
+
+    def render(self, values):
+        return super().render(
+            {key: value for key, (value, _) in values.items()}
+        )
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, amount, **labels):
+        def update(value):
+            value = value or [0] * len(self.buckets) + [0, 0]
+            for index, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    value[index] += 1
+            value[-2] += amount
+            value[-1] += 1
+            return value
+
+        REGISTRY.update(
+            self.name, _label_key(self.labelnames, labels), update
+        )
+
+    @staticmethod
+    def merge(current, value):
+        if current is None:
+            return list(value)
+        return [left + right for left, right in zip(current, value)]
+
+    def render(self, values):
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            for bound, count in zip(self.buckets, value):
+                labels = self.labels_text(key, le=str(bound))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self.labels_text(key, le="+Inf")
+            lines.append(f"{self.name}_bucket{labels} {value[-1]}")
+            lines.append(f"{self.name}_sum{self.labels_text(key)} {value[-2]}")
+            lines.append(
+                f"{self.name}_count{self.labels_text(key)} {value[-1]}"
+            )
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route name",
+    ("route", "method"),
+    LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests by route name and status code",
+    ("route", "method", "status"),
+)
+THROTTLED_REQUESTS = Counter(
+    "http_throttled_requests_total",
+    "Requests rejected by throttling",
+    ("route",),
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "Number of SQL statements per request",
+    ("route",),
+    QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of single SQL statements",
+    ("alias",),
+    QUERY_DURATION_BUCKETS,
+)
+RESERVATIONS = Counter(
+    "reservations_total",
+    "Reservation attempts by outcome",
+    ("outcome",),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result",
+    ("cache", "result"),
+)
+DB_CONNECTIONS = Gauge(
+    "db_connections",
+    "Connections to the application database by state",
+    ("state",),
+)
+
+
+def record_reservation(response):
+    """Count a reservation attempt, ignoring idempotent replays"""
+    if response.has_header(REPLAYED_HEADER):
+        return
+    if response.status_code == 201:
+        outcome = "success"
+    elif response.status_code in (400, 409):
+        outcome = "conflict"
+    else:
+        outcome = "error"
+    RESERVATIONS.inc(outcome=outcome)
+
+
+def record_cache(cache_name, hit):
+    CACHE_REQUESTS.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            DB_QUERY_DURATION.observe(
+                time.perf_counter() - started,
+                alias=context["connection"].alias,
+            )
+
+
+class MetricsMiddleware:
+    """Record latency, status and SQL statistics of every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for db_connection in connections.all():
+                stack.enter_context(db_connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        route = match.view_name if match else "unmatched"
+        REQUEST_LATENCY.observe(duration, route=route, method=request.method)
+        REQUESTS.inc(
+            route=route,
+            method=request.method,
+            status=response.status_code,
+        )
+        DB_QUERIES.observe(queries.count, route=route)
+        if response.status_code == 429:
+            THROTTLED_REQUESTS.inc(route=route)
+
+        REGISTRY.maybe_flush()
+        return response
+
+
+_connections_read_at = 0.0
+
+
+def _update_connection_gauge():
+    """Read connection states at most once per METRICS_FLUSH_INTERVAL"""
+    global _connections_read_at
+    interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+    if connection.vendor != "postgresql" or (
+        time.monotonic() - _connections_read_at < interval
+    ):
+        return
+    _connections_read_at = time.monotonic()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT coalesce(state, 'unknown'), count(*) "
+            "FROM pg_stat_activity WHERE datname = current_database() "
+            "GROUP BY 1"
+        )
+        rows = cursor.fetchall()
+    for state in ("active", "idle", "idle in transaction"):
+        DB_CONNECTIONS.set(0, state=state)
+    for state, count in rows:
+        DB_CONNECTIONS.set(count, state=state)
+
+
+def _may_scrape(request):
+    """Staff, or a scraper sending METRICS_TOKEN as a bearer token"""
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, "METRICS_TOKEN", None)
+    return bool(token) and constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
+
+
+def metrics_view(request):
+    """Expose metrics in the Prometheus text format"""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    _update_connection_gauge()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
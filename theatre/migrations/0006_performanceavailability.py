@@ -0,0 +1,89 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0005_play_image"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="performance",
+            name="play",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="performances",
+                to="theatre.play",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="performance",
+            name="theatre_hall",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="performances",
+                to="theatre.theatrehall",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="play",
+            name="actor",
+            field=models.ManyToManyField(
+                blank=True, related_name="actor_plays", to="theatre.actor"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="play",
+            name="genre",
+            field=models.ManyToManyField(
+                blank=True, related_name="genre_plays", to="theatre.genre"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="reservation",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reservation",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PerformanceAvailability",
+            fields=[
+                (
+                    "performance",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="availability",
+                        serialize=False,
+                        to="theatre.performance",
+                    ),
+                ),
+                ("show_time", models.DateTimeField()),
+                ("free_seats", models.IntegerField()),
+                ("max_free_run", models.IntegerField()),
+                ("row_free_runs", models.JSONField(default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "performance availabilities",
+                "indexes": [
+                    models.Index(
+                        fields=["show_time", "free_seats"],
+                        name="availability_free_seats_idx",
+                    ),
+                    models.Index(
+                        fields=["show_time", "max_free_run"],
+                        name="availability_free_run_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
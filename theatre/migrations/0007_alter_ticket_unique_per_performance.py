@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0006_performanceavailability"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="ticket",
+            name="unique_ticket",
+        ),
+        migrations.AddConstraint(
+            model_name="ticket",
+            constraint=models.UniqueConstraint(
+                fields=("performance", "row", "seat"), name="unique_ticket"
+            ),
+        ),
+    ]
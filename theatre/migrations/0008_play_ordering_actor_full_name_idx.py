@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0007_alter_ticket_unique_per_performance"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="play",
+            options={"ordering": ["title", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="actor",
+            index=models.Index(
+                fields=["first_name", "last_name"], name="actor_full_name_idx"
+            ),
+        ),
+    ]
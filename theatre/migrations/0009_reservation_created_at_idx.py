@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0008_play_ordering_actor_full_name_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["created_at"], name="reservation_created_at_idx"
+            ),
+        ),
+    ]
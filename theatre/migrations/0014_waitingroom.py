@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0013_archivedticket"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WaitingRoom",
+            fields=[
+                (
+                    "performance",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="waiting_room",
+                        serialize=False,
+                        to="theatre.performance",
+                    ),
+                ),
+                ("admit_per_minute", models.PositiveIntegerField(default=60)),
+                ("is_active", models.BooleanField(default=True)),
+            ],
+        ),
+    ]
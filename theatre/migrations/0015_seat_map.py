@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:46
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def build_seat_maps(apps, schema_editor):
+    from theatre.seat_map import encode
+
+    PerformanceAvailability = apps.get_model(
+        "theatre", "PerformanceAvailability"
+    )
+    Ticket = apps.get_model("theatre", "Ticket")
+
+    taken = defaultdict(list)
+    for performance_id, row, seat in Ticket.objects.filter(
+        performance__isnull=False
+    ).values_list("performance_id", "row", "seat"):
+        taken[performance_id].append((row, seat))
+
+    availabilities = PerformanceAvailability.objects.values_list(
+        "performance_id",
+        "performance__theatre_hall__rows",
+        "performance__theatre_hall__seats_in_row",
+    )
+    PerformanceAvailability.objects.bulk_update(
+        [
+            PerformanceAvailability(
+                performance_id=performance_id,
+                seat_map=encode(rows, seats_in_row, taken[performance_id]),
+            )
+            for performance_id, rows, seats_in_row in availabilities.iterator()
+        ],
+        ["seat_map"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0014_waitingroom"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="performanceavailability",
+            name="seat_map",
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name="performanceavailability",
+            name="seat_version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(build_seat_maps, migrations.RunPython.noop),
+    ]
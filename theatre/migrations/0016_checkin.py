@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0015_seat_map"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckIn",
+            fields=[
+                (
+                    "ticket_id",
+                    models.BigIntegerField(primary_key=True, serialize=False),
+                ),
+                ("row", models.IntegerField()),
+                ("seat", models.IntegerField()),
+                ("checked_in_at", models.DateTimeField()),
+                (
+                    "performance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="check_ins",
+                        to="theatre.performance",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0016_checkin"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(fields=["show_time"], name="performance_show_time_idx"),
+        ),
+    ]
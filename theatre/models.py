@@ -3,20 +3,51 @@ import uuid
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.dispatch import Signal
 from django.utils.text import slugify
 
 
+# Sent after bulk_create() and update(), which send no per-object
+# signals, with the model as sender
+bulk_changed = Signal()
+
+
+class BulkSignalQuerySet(models.QuerySet):
+    """QuerySet that reports its bulk writes through bulk_changed"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            bulk_changed.send(sender=self.model)
+        return objs
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            bulk_changed.send(sender=self.model)
+        return rows
+
+
 class Actor(models.Model):
     first_name = models.CharField(max_length=63)
     last_name = models.CharField(max_length=63)
 
+    objects = BulkSignalQuerySet.as_manager()
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
     class Meta:
         ordering = ["first_name"]
+        indexes = [
+            models.Index(
+                fields=["first_name", "last_name"],
+                name="actor_full_name_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -25,6 +56,8 @@ class Actor(models.Model):
 class Genre(models.Model):
     name = models.CharField(max_length=63, unique=True)
 
+    objects = BulkSignalQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -54,12 +87,22 @@ class Play(models.Model):
         upload_to=play_image_file_path
     )
 
+    objects = BulkSignalQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["title", "id"]
+
+    def __str__(self):
+        return self.title
+
 
 class TheatreHall(models.Model):
     name = models.CharField(max_length=255)
     rows = models.IntegerField()
     seats_in_row = models.IntegerField()
 
+    objects = BulkSignalQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -75,6 +118,67 @@ class Performance(models.Model):
                                      )
     show_time = models.DateTimeField()
 
+    objects = BulkSignalQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["show_time"],
+                name="performance_show_time_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.play.title} {self.show_time}"
+
+
+class PerformanceAvailability(models.Model):
+    performance = models.OneToOneField(Performance,
+                                       on_delete=models.CASCADE,
+                                       primary_key=True,
+                                       related_name="availability"
+                                       )
+    show_time = models.DateTimeField()
+    free_seats = models.IntegerField()
+    max_free_run = models.IntegerField()
+    row_free_runs = models.JSONField(default=list)
+    # Bitmap of taken seats, row by row, and a counter bumped with every
+    # change of it; see theatre.seat_map
+    seat_map = models.BinaryField(default=bytes)
+    seat_version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "performance availabilities"
+        indexes = [
+            models.Index(
+                fields=["show_time", "free_seats"],
+                name="availability_free_seats_idx"
+            ),
+            models.Index(
+                fields=["show_time", "max_free_run"],
+                name="availability_free_run_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.performance_id}: {self.free_seats} free"
+
+
+class WaitingRoom(models.Model):
+    """Admission control for the on-sale of a popular performance"""
+
+    performance = models.OneToOneField(Performance,
+                                       on_delete=models.CASCADE,
+                                       primary_key=True,
+                                       related_name="waiting_room"
+                                       )
+    admit_per_minute = models.PositiveIntegerField(default=60)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.performance_id}: {self.admit_per_minute}/min"
+
 
 class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -83,6 +187,18 @@ class Reservation(models.Model):
                              related_name="reservation"
                              )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                name="reservation_created_at_idx"
+            ),
+            models.Index(
+                fields=["user", "created_at"],
+                name="reservation_user_created_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.email}, created_at: {self.created_at}"
 
@@ -100,9 +216,11 @@ class Ticket(models.Model):
                                     null=True, related_name="tickets",
                                     )
 
+    objects = BulkSignalQuerySet.as_manager()
+
     class Meta:
         constraints = [models.UniqueConstraint(
-            fields=["row", "seat"],
+            fields=["performance", "row", "seat"],
             name="unique_ticket"
         )
         ]
@@ -110,21 +228,31 @@ class Ticket(models.Model):
         ordering = ["row", "seat"]
 
     def clean(self):
-        if not (1 <= self.row <= self.performance.theatre_hall.rows):
+        from theatre.layouts import performance_layout
+
+        if self.performance_id is None:
+            return
+        # Hall dimensions come from the in-process layout cache
+        hall_id = (
+            self.performance.theatre_hall_id
+            if Ticket.performance.is_cached(self) else None
+        )
+        layout = performance_layout(self.performance_id, hall_id)
+        if not (1 <= self.row <= layout.rows):
             raise ValidationError(
                 {
                     "row": [
                         f"row number must be in available range:"
-                        f" (1, {self.performance.theatre_hall.rows}):"
+                        f" (1, {layout.rows}):"
                     ]
                 }
             )
-        if not (1 <= self.seat <= self.performance.theatre_hall.seats_in_row):
+        if not (1 <= self.seat <= layout.seats_in_row):
             raise ValidationError(
                 {
                     "seat": [
                         f"seat number must be in available range:"
-                        f"(1, {self.performance.theatre_hall.seats_in_row})"
+                        f"(1, {layout.seats_in_row})"
                     ]
                 }
             )
@@ -143,3 +271,110 @@ class Ticket(models.Model):
 
     def __str__(self):
         return f"{self.performance.play.title} row {self.row} seat {self.seat}"
+
+
+class ArchivedTicket(models.Model):
+    """Ticket of a long past performance, moved out of the hot table"""
+
+    id = models.BigIntegerField(primary_key=True)
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    performance = models.ForeignKey(Performance,
+                                    on_delete=models.SET_NULL,
+                                    null=True,
+                                    related_name="archived_tickets",
+                                    )
+    reservation = models.ForeignKey(Reservation,
+                                    on_delete=models.SET_NULL,
+                                    null=True,
+                                    related_name="archived_tickets",
+                                    )
+    show_time = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["row", "seat"]
+        indexes = [
+            models.Index(
+                fields=["show_time"],
+                name="archived_ticket_show_time_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.performance_id} row {self.row} seat {self.seat}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE,
+                             related_name="idempotency_keys"
+                             )
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=["user", "key"],
+            name="unique_idempotency_key"
+        )
+        ]
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                name="idempotency_created_at_idx"
+            ),
+        ]
+
+    @property
+    def is_complete(self):
+        return self.status_code is not None
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+
+class RequestProfile(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.SET_NULL,
+                             null=True,
+                             blank=True,
+                             related_name="request_profiles"
+                             )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    status_code = models.PositiveSmallIntegerField()
+    sampled = models.BooleanField(default=False)
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    sql_time_ms = models.FloatField()
+    queries = models.JSONField(default=list)
+    report = models.TextField()
+    stats = models.BinaryField()
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class CheckIn(models.Model):
+    """Entry of a ticket holder, recorded by the door scanners"""
+
+    # Not a foreign key: archived tickets keep the id of the ticket
+    ticket_id = models.BigIntegerField(primary_key=True)
+    performance = models.ForeignKey(Performance,
+                                    on_delete=models.CASCADE,
+                                    related_name="check_ins",
+                                    )
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    checked_in_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.performance_id} row {self.row} seat {self.seat}"
@@ -0,0 +1,219 @@
+import hashlib
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from theatre.catalog_cache import CATALOG, get_versions
+from theatre.metrics import record_cache
+
+
+_caches = []
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class TwoTierCache:
+    """
+    Process-local LRU in front of the shared Django cache. Keys live
+    under the versions of scopes, which each process rereads every
+    OBJECT_CACHE_VERSION_CHECK_INTERVAL seconds.
+
+    A missing or expiring entry is recomputed by one thread per process
+    and, through a lock in the shared cache, by one process at a time;
+    the others wait for its result or keep serving the old value.
+    Entries are refreshed early with a probability that grows towards
+    their expiry and with the time they took to compute, so popular
+    entries rarely expire at all.
+    """
+
+    def __init__(self, name, scopes=(CATALOG,)):
+        self.name = name
+        self.scopes = scopes
+        self.local = LRUCache(settings.OBJECT_CACHE_LOCAL_SIZE)
+        self.version = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+        self.flights = {}
+        _caches.append(self)
+
+    def namespace(self):
+        now = time.monotonic()
+        interval = settings.OBJECT_CACHE_VERSION_CHECK_INTERVAL
+        if self.checked_at is None or now - self.checked_at >= interval:
+            version = ":".join(get_versions(self.scopes))
+            with self.lock:
+                if version != self.version:
+                    self.local.clear()
+                    self.version = version
+                self.checked_at = now
+        return f"theatre:object:{self.name}:{self.version}"
+
+    def expire_local(self):
+        """Reread the versions on the next lookup"""
+        self.checked_at = None
+
+    def _get(self, key):
+        data = self.local.get(key)
+        record_cache(f"{self.name}_local", data is not None)
+        if data is not None:
+            return pickle.loads(data)
+
+        entry = cache.get(key)
+        record_cache(f"{self.name}_shared", entry is not None)
+        if entry is not None:
+            self.local.set(key, pickle.dumps(entry))
+        return entry
+
+    def _set(self, key, value, delta):
+        timeout = settings.OBJECT_CACHE_TIMEOUT
+        entry = {
+            "value": value,
+            "delta": delta,
+            "expires": time.time() + timeout,
+        }
+        cache.set(key, entry, timeout)
+        self.local.set(key, pickle.dumps(entry))
+
+    @staticmethod
+    def refresh_early(entry):
+        # Probabilistic early expiration (XFetch): -log(u) is rarely large,
+        # and only large enough when close to the expiry
+        gap = -entry["delta"] * settings.OBJECT_CACHE_BETA * math.log(
+            1 - random.random()
+        )
+        return time.time() + gap >= entry["expires"]
+
+    def get_or_set(self, key, compute):
+        digest = hashlib.sha256(str(key).encode()).hexdigest()
+        key = f"{self.namespace()}:{digest}"
+        entry = self._get(key)
+        if entry is not None and not self.refresh_early(entry):
+            return entry["value"]
+        return self._recompute(key, compute, entry)
+
+    def _recompute(self, key, compute, stale):
+        with self.lock:
+            flight = self.flights.setdefault(key, threading.Lock())
+        # With an old value at hand nobody waits for the recomputation
+        if stale is not None:
+            acquired = flight.acquire(blocking=False)
+        else:
+            acquired = flight.acquire(timeout=settings.OBJECT_CACHE_WAIT)
+        if not acquired:
+            if stale is not None:
+                return stale["value"]
+            return compute()
+
+        try:
+            entry = self._get(key)
+            if entry is not None and (
+                stale is None or entry["expires"] > stale["expires"]
+            ):
+                return entry["value"]
+            return self._compute_once(key, compute, stale)
+        finally:
+            flight.release()
+            with self.lock:
+                self.flights.pop(key, None)
+
+    def _compute_once(self, key, compute, stale):
+        lock_key = f"{key}:lock"
+        locked = cache.add(lock_key, 1, settings.OBJECT_CACHE_LOCK_TIMEOUT)
+        if not locked:
+            if stale is not None:
+                return stale["value"]
+            deadline = time.monotonic() + settings.OBJECT_CACHE_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    self.local.set(key, pickle.dumps(entry))
+                    return entry["value"]
+
+        try:
+            started = time.perf_counter()
+            value = compute()
+            self._set(key, value, time.perf_counter() - started)
+            return value
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+
+def expire_local_object_caches():
+    for object_cache in _caches:
+        object_cache.expire_local()
+
+
+class CachedObjectMixin:
+    """
+    Serve retrieve() objects from object_cache. Relations listed in
+    live_prefetches as (field path, lookup) are never cached and are
+    loaded fresh when the response renders them.
+    """
+
+    object_cache = None
+    live_prefetches = ()
+
+    def get_object(self):
+        if self.action != "retrieve" or self.object_cache is None:
+            return super().get_object()
+
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        query = self.request.META.get("QUERY_STRING", "")
+        obj = self.object_cache.get_or_set(
+            f"{lookup}?{query}", self._get_cacheable_object
+        )
+        self.check_object_permissions(self.request, obj)
+
+        live = [
+            prefetch for path, prefetch in self.live_prefetches
+            if self.renders(path)
+        ]
+        if live:
+            prefetch_related_objects([obj], *live)
+        return obj
+
+    def _get_cacheable_object(self):
+        obj = super().get_object()
+        prefetched = getattr(obj, "_prefetched_objects_cache", {})
+        for _, lookup in self.live_prefetches:
+            prefetched.pop(lookup, None)
+        return obj
@@ -0,0 +1,110 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+
+class Pagination(PageNumberPagination):
+    page_size = 10
+    max_page_size = 100
+
+
+def estimate_count(queryset):
+    """
+    Return PostgreSQL's row estimate for a queryset: table statistics
+    when it is unfiltered, the planner's estimate otherwise.
+    None when no estimate is available.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    if queryset.query.where:
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        return plan[0]["Plan"]["Plan Rows"]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts row estimates above a size threshold. Each
+    page corrects the estimate with the rows it actually finds, so
+    stale statistics cannot hide pages or promise missing ones.
+    """
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+
+        self.count_is_estimate = True
+        return estimate
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Pages past a low estimate may still hold rows
+            if self.count_is_estimate and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        # One row more tells whether another page follows
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage("That page contains no results")
+
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            self.count = max(self.count, bottom + self.per_page + 1)
+        else:
+            self.count = bottom + len(rows)
+            self.count_is_estimate = False
+        self.__dict__.pop("num_pages", None)
+        return self._get_page(rows, number, self)
+
+
+class EstimatedCountPagination(Pagination):
+    """
+    Page number pagination that avoids exact counts on big tables
+    and tells the client when the count is approximate
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimate"] = (
+            self.page.paginator.count_is_estimate
+        )
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count_is_estimate"] = {
+            "type": "boolean",
+            "example": False,
+        }
+        return schema
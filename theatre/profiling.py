@@ -0,0 +1,121 @@
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from theatre.models import RequestProfile
+
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "_profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class QueryRecorder:
+    """Execute wrapper that keeps every SQL statement with its duration"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "time_ms": (time.perf_counter() - started) * 1000,
+            })
+
+
+def _staff_user(request):
+    """Return the staff user behind a session or JWT, if any"""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    if authenticated and authenticated[0].is_staff:
+        return authenticated[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request when a staff user asks for it with the
+    X-Profile header or the _profile query parameter, and every
+    PROFILING_SAMPLE_RATE-th request automatically. Results are stored
+    as RequestProfile rows and can be downloaded from the admin.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0)
+        self.counter = itertools.count(1)
+
+    def __call__(self, request):
+        requested = (
+            PROFILE_HEADER in request.headers
+            or PROFILE_QUERY_PARAM in request.GET
+        )
+        sampled = bool(
+            self.sample_rate and next(self.counter) % self.sample_rate == 0
+        )
+        if not requested and not sampled:
+            return self.get_response(request)
+
+        user = _staff_user(request) if requested else None
+        if user is None and not sampled:
+            return self.get_response(request)
+
+        return self.profile(request, user, sampled=not user)
+
+    def profile(self, request, user, sampled):
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        profiler.create_stats()
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats(
+            "cumulative"
+        ).print_stats(50)
+
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            status_code=response.status_code,
+            sampled=sampled,
+            duration_ms=duration_ms,
+            query_count=len(recorder.queries),
+            sql_time_ms=sum(query["time_ms"] for query in recorder.queries),
+            queries=recorder.queries,
+            report=report.getvalue(),
+            stats=marshal.dumps(profiler.stats),
+        )
+        if user is not None:
+            response[PROFILE_ID_HEADER] = str(profile.id)
+        return response
@@ -0,0 +1,257 @@
+import json
+import random
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import NoReverseMatch, resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from theatre.availability import refresh_availability
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+from theatre.urls import router
+
+
+Finding = namedtuple("Finding", ("route", "kind", "relation", "detail"))
+
+# Query strings every list route is checked with, besides none at all.
+# Placeholders are filled with ids of the seeded data.
+TYPICAL_FILTERS = {
+    "performance": (
+        {"days": "7"},
+        {"play": "{play}"},
+        {"genre": "{genre}"},
+        {"days": "30", "free_seats": "2"},
+        {"adjacent_seats": "4"},
+    ),
+    "play": (
+        {"title": "Play 1"},
+        {"genre": "{genre}"},
+        {"actor": "{actor}"},
+    ),
+    "reservation": (
+        {"when": "upcoming"},
+        {"when": "past"},
+    ),
+}
+
+
+def finding_key(finding):
+    return f"{finding.route}: {finding.kind} on {finding.relation}"
+
+
+def seed(performances=3000, tickets=60, users=2000, seed=42):
+    """
+    Populate the catalog, performances spread over a year around now
+    and about `tickets` sold seats per performance, two per reservation
+    """
+    rng = random.Random(seed)
+    halls = TheatreHall.objects.bulk_create(
+        TheatreHall(name=f"Hall {i}", rows=20, seats_in_row=30)
+        for i in range(20)
+    )
+    genres = Genre.objects.bulk_create(
+        Genre(name=f"Plan check {i}") for i in range(20)
+    )
+    actors = Actor.objects.bulk_create(
+        Actor(first_name=f"Actor{i}", last_name="Plan check")
+        for i in range(500)
+    )
+    plays = Play.objects.bulk_create(
+        Play(title=f"Play {i}", description="x" * 200) for i in range(300)
+    )
+    Play.actor.through.objects.bulk_create(
+        Play.actor.through(play=play, actor=actor)
+        for play in plays
+        for actor in rng.sample(actors, 6)
+    )
+    Play.genre.through.objects.bulk_create(
+        Play.genre.through(play=play, genre=genre)
+        for play in plays
+        for genre in rng.sample(genres, 2)
+    )
+
+    now = timezone.now()
+    created = Performance.objects.bulk_create(
+        Performance(
+            play=rng.choice(plays),
+            theatre_hall=rng.choice(halls),
+            show_time=now + timedelta(
+                minutes=rng.randint(-180 * 24 * 60, 180 * 24 * 60)
+            ),
+        )
+        for _ in range(performances)
+    )
+
+    password = make_password(None)
+    people = get_user_model().objects.bulk_create(
+        get_user_model()(email=f"plan-check-{i}@example.com",
+                         password=password)
+        for i in range(users)
+    )
+    user = people[0]
+    seats = [(row, seat) for row in range(1, 21) for seat in range(1, 31)]
+    pairs = []
+    for performance in created:
+        taken = rng.sample(seats, tickets - tickets % 2)
+        for i in range(0, len(taken), 2):
+            # The checked user books often, as regular customers do
+            owner = user if rng.random() < 0.002 else rng.choice(people)
+            pairs.append((performance, owner, taken[i:i + 2]))
+
+    reservations = Reservation.objects.bulk_create(
+        Reservation(user=owner) for _, owner, _ in pairs
+    )
+    Ticket.objects.bulk_create(
+        (
+            Ticket(
+                row=row,
+                seat=seat,
+                performance=performance,
+                reservation=reservation,
+            )
+            for reservation, (performance, _, taken) in zip(
+                reservations, pairs
+            )
+            for row, seat in taken
+        ),
+        batch_size=5000,
+    )
+    performance_ids = [performance.id for performance in created]
+    for start in range(0, len(performance_ids), 500):
+        refresh_availability(performance_ids[start:start + 500])
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    return user, {
+        "play": plays[0].id,
+        "genre": genres[0].id,
+        "actor": actors[0].id,
+    }
+
+
+def routes(user, placeholders):
+    """Yield (name, path, query params) of every list and detail route"""
+    for _, viewset, basename in router.registry:
+        try:
+            path = reverse(f"theatre:{basename}-list")
+        except NoReverseMatch:
+            continue
+        yield f"{basename}-list", path, {}
+        for params in TYPICAL_FILTERS.get(basename, ()):
+            params = {
+                name: value.format(**placeholders)
+                for name, value in params.items()
+            }
+            query = "&".join(
+                f"{name}={value}" for name, value in params.items()
+            )
+            yield f"{basename}-list?{query}", path, params
+
+        queryset = getattr(viewset, "queryset", None)
+        if queryset is None:
+            continue
+        if queryset.model is Reservation:
+            queryset = queryset.filter(user=user)
+        pk = queryset.order_by("pk").values_list("pk", flat=True).last()
+        try:
+            path = reverse(f"theatre:{basename}-detail", args=[pk])
+        except NoReverseMatch:
+            continue
+        yield f"{basename}-detail", path, {}
+
+
+def capture_queries(path, params, user):
+    """SQL of the SELECT statements a GET request runs"""
+    request = APIRequestFactory().get(path, params)
+    force_authenticate(request, user=user)
+    match = resolve(path)
+    # Cached responses would hide the queries
+    with override_settings(
+        CATALOG_CACHE_TIMEOUT=0, ALLOWED_HOSTS=["testserver"]
+    ):
+        with CaptureQueriesContext(connection) as queries:
+            response = match.func(request, *match.args, **match.kwargs)
+            response.render()
+    statements = []
+    for query in queries:
+        sql = query["sql"]
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            if sql not in statements:
+                statements.append(sql)
+    return response.status_code, statements
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    # psycopg decodes json columns, other drivers may return text
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_problems(plan, min_rows=5000, misestimate=10):
+    """
+    Yield (kind, relation, detail) for sequential scans reading at least
+    min_rows rows, sorts spilling to disk, and table scans returning at
+    least min_rows rows with an estimate off by more than a factor of
+    misestimate
+    """
+    nodes = [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", ()))
+        loops = node.get("Actual Loops", 1)
+        relation = node.get("Relation Name")
+
+        if node["Node Type"] == "Seq Scan":
+            read = (
+                node.get("Actual Rows", 0)
+                + node.get("Rows Removed by Filter", 0)
+            ) * loops
+            if read >= min_rows:
+                yield "seq scan", relation, f"{read} rows read"
+        if node.get("Sort Space Type") == "Disk":
+            yield "sort on disk", relation or node["Node Type"], (
+                f"{node.get('Sort Space Used')} kB"
+            )
+        # Estimates are per loop; those of joins and aggregates follow
+        # from the scans below them
+        estimated, actual = node["Plan Rows"], node.get("Actual Rows", 0)
+        larger = max(estimated, actual)
+        if relation and larger >= min_rows and larger > misestimate * max(
+            min(estimated, actual), 1
+        ):
+            yield "row estimate", relation, (
+                f"{estimated} rows estimated, {actual} returned"
+            )
+
+
+def check_routes(user, placeholders, min_rows=5000, misestimate=10):
+    """Yield (route, status code, query count, findings) per route"""
+    for name, path, params in routes(user, placeholders):
+        status_code, statements = capture_queries(path, params, user)
+        findings = []
+        for sql in statements:
+            for kind, relation, detail in plan_problems(
+                explain(sql), min_rows, misestimate
+            ):
+                finding = Finding(name, kind, relation, detail)
+                if finding_key(finding) not in map(finding_key, findings):
+                    findings.append(finding)
+        yield name, status_code, len(statements), findings
@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import BinaryField, F, Func, IntegerField, Value
+from django.db.models.functions import Length
+from django.db.models.lookups import Exact
+
+from theatre.archive import taken_seats
+from theatre.models import Performance, PerformanceAvailability
+
+
+def seat_bit(seats_in_row, row, seat):
+    return (row - 1) * seats_in_row + seat - 1
+
+
+def map_size(rows, seats_in_row):
+    return (rows * seats_in_row + 7) // 8
+
+
+def is_taken(seat_map, seats_in_row, row, seat):
+    bit = seat_bit(seats_in_row, row, seat)
+    return bit // 8 < len(seat_map) and bool(seat_map[bit // 8] >> bit % 8 & 1)
+
+
+def encode(rows, seats_in_row, seats):
+    """Bitmap of the (row, seat) pairs in a hall of the given size"""
+    seat_map = bytearray(map_size(rows, seats_in_row))
+    for row, seat in seats:
+        if 1 <= row <= rows and 1 <= seat <= seats_in_row:
+            bit = seat_bit(seats_in_row, row, seat)
+            seat_map[bit // 8] |= 1 << bit % 8
+    return bytes(seat_map)
+
+
+def decode(rows, seats_in_row, seat_map):
+    """(row, seat) pairs set in a bitmap"""
+    return [
+        (row, seat)
+        for row in range(1, rows + 1)
+        for seat in range(1, seats_in_row + 1)
+        if is_taken(seat_map, seats_in_row, row, seat)
+    ]
+
+
+def claim_seats(performance_id, layout, seats):
+    """
+    Mark seats as taken in the seat map of a performance with a single
+    conditional update, unless any of them is taken already. Returns
+    whether the seats were claimed.
+    """
+    # PostgreSQL numbers bytea bits the same way: byte n // 8, bit n % 8
+    bits = [seat_bit(layout.seats_in_row, row, seat) for row, seat in seats]
+    seat_map = F("seat_map")
+    for bit in bits:
+        seat_map = Func(
+            seat_map,
+            Value(bit),
+            Value(1),
+            function="set_bit",
+            output_field=BinaryField(),
+        )
+    free = [
+        Exact(
+            Func(
+                "seat_map",
+                Value(bit),
+                function="get_bit",
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+        for bit in bits
+    ]
+    return bool(
+        PerformanceAvailability.objects.filter(
+            # Maps of another size are stale and fail the claim
+            Exact(Length("seat_map"), map_size(*layout)),
+            *free,
+            performance_id=performance_id,
+        ).update(seat_map=seat_map, seat_version=F("seat_version") + 1)
+    )
+
+
+def lock_seat_maps(performance_ids):
+    """
+    Lock the seat maps of performances for the current transaction and
+    return their {performance_id: (seat_version, seat_map)}
+    """
+    return {
+        performance_id: (version, bytes(seat_map))
+        for performance_id, version, seat_map in (
+            PerformanceAvailability.objects.select_for_update()
+            .filter(performance_id__in=performance_ids)
+            .order_by("performance_id")
+            .values_list("performance_id", "seat_version", "seat_map")
+        )
+    }
+
+
+def sync_seat_maps(performance_ids):
+    """Rebuild the seat maps of performances from their tickets"""
+    performance_ids = {
+        performance_id
+        for performance_id in performance_ids
+        if performance_id is not None
+    }
+    with transaction.atomic():
+        # Tickets are read after the lock, so claims committed meanwhile
+        # are included
+        if not lock_seat_maps(performance_ids):
+            return
+
+        taken = defaultdict(list)
+        for performance_id, row, seat in taken_seats(performance_ids):
+            taken[performance_id].append((row, seat))
+
+        halls = Performance.objects.filter(id__in=performance_ids).values_list(
+            "id", "theatre_hall__rows", "theatre_hall__seats_in_row"
+        )
+        PerformanceAvailability.objects.bulk_update(
+            [
+                PerformanceAvailability(
+                    performance_id=performance_id,
+                    seat_map=encode(
+                        rows, seats_in_row, taken[performance_id]
+                    ),
+                    seat_version=F("seat_version") + 1,
+                )
+                for performance_id, rows, seats_in_row in halls
+            ],
+            ["seat_map", "seat_version"],
+        )
@@ -1,6 +1,22 @@
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
+from theatre.allocation import TAKEN_MESSAGE, book_seats
+from theatre.archive import is_historical
+from theatre.availability import schedule_refresh
+from theatre.catalog_cache import SEATS, invalidate
+from theatre.check_in import (
+    ADMITTED,
+    DUPLICATE,
+    INVALID,
+    WRONG_PERFORMANCE,
+    ticket_token,
+)
+from theatre.fieldsets import DynamicFieldsModelSerializer
+from theatre.importers import IMPORT_FORMATS
+from theatre.layouts import hall_layout, preload_hall_layouts
+from theatre.seat_map import lock_seat_maps, sync_seat_maps
 from theatre.models import (
     TheatreHall,
     Reservation,
@@ -12,7 +28,7 @@ from theatre.models import (
 )
 
 
-class TheatreHallSerializer(serializers.ModelSerializer):
+class TheatreHallSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = TheatreHall
         fields = (
@@ -23,7 +39,7 @@ class TheatreHallSerializer(serializers.ModelSerializer):
         )
 
 
-class ActorSerializer(serializers.ModelSerializer):
+class ActorSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Actor
         fields = (
@@ -32,7 +48,7 @@ class ActorSerializer(serializers.ModelSerializer):
         )
 
 
-class PlaySerializer(serializers.ModelSerializer):
+class PlaySerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Play
         fields = (
@@ -43,7 +59,7 @@ class PlaySerializer(serializers.ModelSerializer):
         )
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Genre
         fields = (
@@ -112,7 +128,7 @@ class PlayDetailSerializer(PlaySerializer):
         )
 
 
-class PlayImageSerializer(serializers.ModelSerializer):
+class PlayImageSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Play
         fields = (
@@ -121,7 +137,7 @@ class PlayImageSerializer(serializers.ModelSerializer):
         )
 
 
-class PlayListSerializer(serializers.ModelSerializer):
+class PlayListSerializer(DynamicFieldsModelSerializer):
     actor = ActorSerializer(
         many=True,
         read_only=True
@@ -159,7 +175,7 @@ class ActorDetailSerializer(ActorSerializer):
         )
 
 
-class PerformanceSerializer(serializers.ModelSerializer):
+class PerformanceSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Performance
         fields = (
@@ -198,15 +214,105 @@ class PerformanceListSerializer(PerformanceSerializer):
         )
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class ActorCompactSerializer(ActorSerializer):
+    class Meta:
+        model = Actor
+        fields = (
+            "id",
+            "full_name"
+        )
+
+
+class PlayCompactSerializer(PlaySerializer):
+    class Meta:
+        model = Play
+        fields = (
+            "id",
+            "title",
+            "description",
+            "image",
+            "actor",
+            "genre"
+        )
+
+
+class PerformanceCompactSerializer(PerformanceSerializer):
+    tickets_available = serializers.IntegerField(
+        read_only=True
+    )
+
+    class Meta:
+        model = Performance
+        fields = (
+            "id",
+            "show_time",
+            "play",
+            "theatre_hall",
+            "tickets_available"
+        )
+
+
+class PerformanceRelatedField(serializers.PrimaryKeyRelatedField):
+    """Look up performances preloaded by TicketListSerializer"""
+
+    def to_internal_value(self, data):
+        performances = self.context.get("performances")
+        if performances is None:
+            return super().to_internal_value(data)
+
+        try:
+            return performances[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail("does_not_exist", pk_value=data)
+
+
+class TicketListSerializer(serializers.ListSerializer):
+    def get_attribute(self, instance):
+        """Include archived tickets if prefetched or the show is long past"""
+        tickets = super().get_attribute(instance)
+        prefetched = getattr(instance, "_prefetched_objects_cache", {})
+        if "archived_tickets" in prefetched or (
+            isinstance(instance, Performance) and is_historical(instance)
+        ):
+            return [*tickets.all(), *instance.archived_tickets.all()]
+        return tickets
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            performance_ids = set()
+            for item in data:
+                try:
+                    performance_ids.add(int(item["performance"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.context["performances"] = Performance.objects.in_bulk(
+                performance_ids
+            )
+            preload_hall_layouts(
+                performance.theatre_hall_id
+                for performance in self.context["performances"].values()
+            )
+        return super().to_internal_value(data)
+
+
+class TicketSerializer(DynamicFieldsModelSerializer):
+    performance = PerformanceRelatedField(
+        queryset=Performance.objects.all()
+    )
     theatre_hall_name = serializers.CharField(
-        source="performance.theatre_hall.name"
+        source="performance.theatre_hall.name",
+        read_only=True
     )
     user_name = serializers.CharField(
-        source="reservation.user.username"
+        source="reservation.user.email",
+        read_only=True
     )
     show_time = serializers.CharField(
-        source="performance.show_time"
+        source="performance.show_time",
+        read_only=True
+    )
+    token = serializers.SerializerMethodField(
+        help_text="Signed token the door scanners check the ticket in with"
     )
 
     class Meta:
@@ -214,9 +320,15 @@ class TicketSerializer(serializers.ModelSerializer):
         fields = ("id",
                   "row",
                   "seat",
+                  "performance",
                   "theatre_hall_name",
                   "user_name",
-                  "show_time")
+                  "show_time",
+                  "token")
+        list_serializer_class = TicketListSerializer
+
+    def get_token(self, ticket) -> str:
+        return ticket_token(ticket)
 
 
 class TicketSeatsSerializer(TicketSerializer):
@@ -227,6 +339,7 @@ class TicketSeatsSerializer(TicketSerializer):
             "row",
             "seat"
         )
+        list_serializer_class = TicketListSerializer
 
 
 class PerformanceDetailSerializer(PerformanceSerializer):
@@ -255,25 +368,194 @@ class PerformanceDetailSerializer(PerformanceSerializer):
         )
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class SeatAllocationSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=50)
+    allow_split = serializers.BooleanField(default=True)
+
+
+class CheckInSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=serializers.CharField(), allow_empty=False, max_length=500
+    )
+
+
+class CheckInResultSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    status = serializers.ChoiceField(
+        choices=[ADMITTED, DUPLICATE, INVALID, WRONG_PERFORMANCE]
+    )
+    ticket = serializers.IntegerField(allow_null=True)
+    row = serializers.IntegerField(allow_null=True)
+    seat = serializers.IntegerField(allow_null=True)
+
+
+class SeatMapSerializer(serializers.Serializer):
+    seat_version = serializers.IntegerField(
+        help_text="Grows with every change of the taken seats; an "
+        "unchanged version means taken_places is still current",
+    )
+    taken_places = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField())
+    )
+
+
+class QueueStatusSerializer(serializers.Serializer):
+    performance = serializers.IntegerField()
+    admitted = serializers.BooleanField()
+    position = serializers.IntegerField()
+    eta_seconds = serializers.IntegerField()
+    expires_in = serializers.IntegerField()
+    token = serializers.CharField(required=False)
+
+
+class BulkImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(
+        choices=IMPORT_FORMATS,
+        required=False
+    )
+    partial = serializers.BooleanField(default=False)
+
+
+class BulkImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class CatalogImportResultSerializer(BulkImportResultSerializer):
+    updated = serializers.IntegerField()
+    actors_created = serializers.IntegerField()
+    genres_created = serializers.IntegerField()
+
+
+class ReservationSerializer(DynamicFieldsModelSerializer):
     tickets = TicketSerializer(
         many=True,
         read_only=False,
         allow_empty=False
     )
+    optimistic = serializers.BooleanField(
+        default=False,
+        write_only=True,
+        help_text="Claim the seats in the seat maps instead of locking "
+        "the performances; taken seats are reported the same way",
+    )
 
     class Meta:
         model = Reservation
         fields = (
             "id",
             "created_at",
-            "tickets"
+            "tickets",
+            "optimistic",
         )
 
-    @transaction.atomic
+    @staticmethod
+    def _taken_seats(tickets_data):
+        """Return requested (performance, row, seat) that are already sold"""
+        requested = {
+            (ticket["performance"].id, ticket["row"], ticket["seat"])
+            for ticket in tickets_data
+        }
+        taken = Ticket.objects.filter(
+            performance_id__in={key[0] for key in requested},
+            row__in={key[1] for key in requested},
+            seat__in={key[2] for key in requested},
+        ).values_list("performance_id", "row", "seat")
+        return requested & set(taken)
+
+    def validate_tickets(self, tickets_data):
+        errors = []
+        seen = set()
+        for ticket in tickets_data:
+            hall = hall_layout(ticket["performance"].theatre_hall_id)
+            key = (ticket["performance"].id, ticket["row"], ticket["seat"])
+            ticket_errors = {}
+            if not (1 <= ticket["row"] <= hall.rows):
+                ticket_errors["row"] = [
+                    f"row number must be in available range:"
+                    f" (1, {hall.rows}):"
+                ]
+            if not (1 <= ticket["seat"] <= hall.seats_in_row):
+                ticket_errors["seat"] = [
+                    f"seat number must be in available range:"
+                    f"(1, {hall.seats_in_row})"
+                ]
+            if key in seen:
+                ticket_errors["seat"] = ["This seat is requested twice."]
+            seen.add(key)
+            errors.append(ticket_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return tickets_data
+
+    def validate(self, attrs):
+        # Optimistic bookings check the seat maps when claiming instead
+        if not attrs.get("optimistic"):
+            try:
+                self._check_taken(attrs["tickets"])
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError({"tickets": error.detail})
+        return attrs
+
+    def _check_taken(self, tickets_data):
+        taken = self._taken_seats(tickets_data)
+        if taken:
+            raise serializers.ValidationError([
+                {"seat": [TAKEN_MESSAGE]}
+                if (ticket["performance"].id, ticket["row"], ticket["seat"])
+                in taken else {}
+                for ticket in tickets_data
+            ])
+
     def create(self, validated_data):
+        if validated_data.pop("optimistic", False):
+            reservation = book_seats(
+                validated_data.pop("tickets"), **validated_data
+            )
+            self._prefetch_tickets(reservation)
+            return reservation
+        return self._create_locked(validated_data)
+
+    @transaction.atomic
+    def _create_locked(self, validated_data):
         tickets_data = validated_data.pop("tickets")
+        performance_ids = sorted(
+            {ticket["performance"].id for ticket in tickets_data}
+        )
+        # Lock in id order so concurrent batches can't deadlock
+        list(
+            Performance.objects.select_for_update()
+            .filter(id__in=performance_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        lock_seat_maps(performance_ids)
+        try:
+            self._check_taken(tickets_data)
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError({"tickets": error.detail})
+
         reservation = Reservation.objects.create(**validated_data)
-        for ticket_data in tickets_data:
-            Ticket.objects.create(reservation=reservation, **ticket_data)
+        Ticket.objects.bulk_create(
+            Ticket(reservation=reservation, **ticket_data)
+            for ticket_data in tickets_data
+        )
+        sync_seat_maps(performance_ids)
+        schedule_refresh(performance_ids)
+        invalidate(SEATS)
+        self._prefetch_tickets(reservation)
         return reservation
+
+    @staticmethod
+    def _prefetch_tickets(reservation):
+        prefetch_related_objects(
+            [reservation],
+            Prefetch(
+                "tickets",
+                queryset=Ticket.objects.select_related(
+                    "performance__theatre_hall"
+                ),
+            ),
+        )
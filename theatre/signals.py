@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from theatre.availability import schedule_refresh
+from theatre.catalog_cache import CATALOG, SEATS, WAITING_ROOMS, invalidate
+from theatre.layouts import (
+    invalidate_hall,
+    invalidate_layouts,
+    invalidate_performance,
+)
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Ticket,
+    TheatreHall,
+    WaitingRoom,
+    bulk_changed,
+)
+from theatre.object_cache import expire_local_object_caches
+from theatre.seat_map import sync_seat_maps
+from theatre.waiting_room import ROOMS
+
+
+@receiver(post_save, sender=Performance)
+def refresh_performance_availability(sender, instance, **kwargs):
+    schedule_refresh([instance.id])
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def refresh_ticket_availability(sender, instance, **kwargs):
+    sync_seat_maps([instance.performance_id])
+    schedule_refresh([instance.performance_id])
+    invalidate(SEATS)
+
+
+@receiver(bulk_changed, sender=Ticket)
+def invalidate_bulk_ticket_changes(sender, **kwargs):
+    invalidate(SEATS)
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_delete, sender=Actor)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Play)
+@receiver(post_delete, sender=Play)
+@receiver(post_save, sender=TheatreHall)
+@receiver(post_delete, sender=TheatreHall)
+@receiver(post_save, sender=Performance)
+@receiver(post_delete, sender=Performance)
+@receiver(m2m_changed, sender=Play.actor.through)
+@receiver(m2m_changed, sender=Play.genre.through)
+@receiver(bulk_changed, sender=Actor)
+@receiver(bulk_changed, sender=Genre)
+@receiver(bulk_changed, sender=Play)
+@receiver(bulk_changed, sender=TheatreHall)
+@receiver(bulk_changed, sender=Performance)
+def invalidate_catalog(sender, **kwargs):
+    invalidate(CATALOG)
+    expire_local_object_caches()
+    transaction.on_commit(expire_local_object_caches)
+
+
+@receiver(post_save, sender=TheatreHall)
+@receiver(post_delete, sender=TheatreHall)
+def invalidate_hall_layout(sender, instance, **kwargs):
+    invalidate_hall(instance.id)
+    # Seat maps are laid out by the hall dimensions
+    sync_seat_maps(instance.performances.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Performance)
+@receiver(post_delete, sender=Performance)
+def invalidate_performance_hall(sender, instance, created=False, **kwargs):
+    # A new performance can't be cached yet
+    if not created:
+        invalidate_performance(instance.id)
+        sync_seat_maps([instance.id])
+
+
+@receiver(bulk_changed, sender=TheatreHall)
+@receiver(bulk_changed, sender=Performance)
+def invalidate_bulk_layout_changes(sender, **kwargs):
+    # Seat maps of resized halls are rebuilt when a claim finds them stale
+    invalidate_layouts()
+
+
+@receiver(post_save, sender=WaitingRoom)
+@receiver(post_delete, sender=WaitingRoom)
+def invalidate_waiting_rooms(sender, **kwargs):
+    invalidate(WAITING_ROOMS)
+    ROOMS.expire_local()
+    transaction.on_commit(ROOMS.expire_local)
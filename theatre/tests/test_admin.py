@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from theatre.models import (
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+TICKET_CHANGELIST_URL = reverse("admin:theatre_ticket_changelist")
+RESERVATION_CHANGELIST_URL = reverse("admin:theatre_reservation_changelist")
+
+
+class AdminQueryCountTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.com", password="test_password"
+        )
+        self.client.force_login(self.admin)
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=20, seats_in_row=20
+        )
+
+    def book(self, count):
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=self.hall,
+            show_time=timezone.now(),
+        )
+        for seat in range(1, count + 1):
+            user = get_user_model().objects.create_user(
+                email=f"user{performance.id}-{seat}@test.com",
+                password="test_password",
+            )
+            Ticket.objects.create(
+                row=1,
+                seat=seat,
+                performance=performance,
+                reservation=Reservation.objects.create(user=user),
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_ticket_changelist_queries_do_not_grow(self):
+        self.book(1)
+        few = self.count_queries(TICKET_CHANGELIST_URL)
+
+        self.book(10)
+        many = self.count_queries(TICKET_CHANGELIST_URL)
+
+        self.assertEqual(few, many)
+
+    def test_reservation_changelist_queries_do_not_grow(self):
+        self.book(1)
+        few = self.count_queries(RESERVATION_CHANGELIST_URL)
+
+        self.book(10)
+        many = self.count_queries(RESERVATION_CHANGELIST_URL)
+
+        self.assertEqual(few, many)
+
+    def test_reservation_change_page_does_not_load_all_performances(self):
+        self.book(1)
+        reservation = Reservation.objects.first()
+        url = reverse(
+            "admin:theatre_reservation_change", args=[reservation.id]
+        )
+        self.client.get(url)
+        few = self.count_queries(url)
+
+        for row in range(2, 12):
+            Ticket.objects.create(
+                row=row,
+                seat=1,
+                performance=Performance.objects.create(
+                    play=Play.objects.create(title=f"Play {row}"),
+                    theatre_hall=self.hall,
+                    show_time=timezone.now(),
+                ),
+                reservation=reservation,
+            )
+        many = self.count_queries(url)
+
+        self.assertEqual(few, many)
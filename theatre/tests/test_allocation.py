@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.allocation import SeatAllocator
+from theatre.models import Performance, Play, TheatreHall, Ticket
+
+
+def allocate_url(performance_id):
+    return reverse("theatre:performance-allocate", args=[performance_id])
+
+
+class SeatAllocatorTests(TestCase):
+    def test_best_block_is_central(self):
+        allocator = SeatAllocator(5, 10, {})
+
+        self.assertEqual(allocator.allocate(2), [(3, 5), (3, 6)])
+
+    def test_skips_taken_seats(self):
+        allocator = SeatAllocator(3, 6, {2: {3, 4}})
+
+        seats = allocator.allocate(3)
+
+        self.assertEqual(len({row for row, _ in seats}), 1)
+        self.assertNotEqual(seats[0][0], 2)
+
+    def test_claimed_seats_are_not_reused(self):
+        allocator = SeatAllocator(1, 4, {})
+
+        first = allocator.allocate(2)
+        second = allocator.allocate(2)
+
+        self.assertFalse(set(first) & set(second))
+        self.assertIsNone(allocator.allocate(1))
+
+    def test_falls_back_to_split_blocks(self):
+        allocator = SeatAllocator(2, 4, {1: {3}, 2: {2}})
+
+        self.assertIsNone(allocator.allocate(4, allow_split=False))
+        seats = allocator.allocate(4)
+
+        self.assertEqual(len(set(seats)), 4)
+        self.assertFalse({(1, 3), (2, 2)} & set(seats))
+
+
+class AllocateApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=3, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+
+    def test_allocate_reserves_adjacent_seats(self):
+        response = self.client.post(
+            allocate_url(self.performance.id), {"count": 3}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        seats = [(t["row"], t["seat"]) for t in response.data["tickets"]]
+        self.assertEqual(seats, [(2, 2), (2, 3), (2, 4)])
+        self.assertEqual(
+            Ticket.objects.filter(
+                reservation__user=self.user, performance=self.performance
+            ).count(),
+            3,
+        )
+
+    def test_allocate_conflict_when_hall_is_full(self):
+        response = self.client.post(
+            allocate_url(self.performance.id), {"count": 16}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Ticket.objects.exists())
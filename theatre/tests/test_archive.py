@@ -0,0 +1,152 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.archive import archive_cutoff, archive_tickets
+from theatre.availability import refresh_availability
+from theatre.catalog_cache import SEATS, get_versions
+from theatre.layouts import hall_layout
+from theatre.models import (
+    ArchivedTicket,
+    Performance,
+    PerformanceAvailability,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+from theatre.seat_map import decode
+
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+def performance_detail_url(performance_id):
+    return reverse("theatre:performance-detail", args=[performance_id])
+
+
+class TicketArchiveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=5, seats_in_row=5
+        )
+        self.old = self.reserve(days=-400, seats=3)
+        self.upcoming = self.reserve(days=5, seats=2)
+
+    def reserve(self, days, seats):
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=self.hall,
+            show_time=timezone.now() + timedelta(days=days),
+        )
+        reservation = Reservation.objects.create(user=self.user)
+        for seat in range(1, seats + 1):
+            Ticket.objects.create(
+                row=1,
+                seat=seat,
+                performance=performance,
+                reservation=reservation,
+            )
+        return reservation
+
+    def test_moves_only_old_tickets(self):
+        ticket_ids = set(self.old.tickets.values_list("id", flat=True))
+
+        moved = archive_tickets(archive_cutoff(), batch_size=2)
+
+        self.assertEqual(moved, 3)
+        self.assertEqual(
+            set(ArchivedTicket.objects.values_list("id", flat=True)),
+            ticket_ids,
+        )
+        self.assertFalse(self.old.tickets.exists())
+        self.assertEqual(self.upcoming.tickets.count(), 2)
+        self.assertEqual(archive_tickets(archive_cutoff()), 0)
+
+    def test_command(self):
+        call_command("archive_tickets", days=365, stdout=StringIO())
+
+        self.assertEqual(ArchivedTicket.objects.count(), 3)
+
+    def test_recent_performances_are_not_archived(self):
+        with self.assertRaises(CommandError):
+            call_command("archive_tickets", days=1, stdout=StringIO())
+        with self.assertRaises(ValueError):
+            archive_tickets(timezone.now())
+
+        self.assertFalse(ArchivedTicket.objects.exists())
+
+    def test_archived_seats_stay_taken(self):
+        performance = self.old.tickets.first().performance
+        refresh_availability([performance.id])
+        # Left wrong, so the refresh after archiving shows
+        PerformanceAvailability.objects.filter(
+            performance=performance
+        ).update(free_seats=0)
+        version = get_versions([SEATS])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_tickets(archive_cutoff())
+
+        availability = PerformanceAvailability.objects.get(
+            performance=performance
+        )
+        self.assertEqual(
+            decode(*hall_layout(self.hall.id), bytes(availability.seat_map)),
+            [(1, 1), (1, 2), (1, 3)],
+        )
+        self.assertEqual(availability.free_seats, 22)
+        self.assertNotEqual(get_versions([SEATS]), version)
+
+    def test_reservation_history_includes_archive(self):
+        archive_tickets(archive_cutoff())
+
+        response = self.client.get(RESERVATION_URL, {"when": "past"})
+        results = response.data["results"]
+
+        self.assertEqual([item["id"] for item in results], [self.old.id])
+        self.assertEqual(
+            [
+                (ticket["row"], ticket["seat"])
+                for ticket in results[0]["tickets"]
+            ],
+            [(1, 1), (1, 2), (1, 3)],
+        )
+        upcoming = self.client.get(RESERVATION_URL, {"when": "upcoming"})
+        self.assertEqual(
+            [item["id"] for item in upcoming.data["results"]],
+            [self.upcoming.id],
+        )
+
+    def test_performance_seats_include_archive(self):
+        performance = self.old.tickets.first().performance
+        archive_tickets(archive_cutoff())
+        refresh_availability([performance.id])
+
+        detail = self.client.get(performance_detail_url(performance.id))
+        listed = {
+            item["id"]: item
+            for item in self.client.get(PERFORMANCE_URL).data
+        }
+
+        self.assertEqual(len(detail.data["taken_places"]), 3)
+        self.assertEqual(listed[performance.id]["tickets_available"], 22)
+        self.assertEqual(
+            PerformanceAvailability.objects.get(
+                performance=performance
+            ).free_seats,
+            22,
+        )
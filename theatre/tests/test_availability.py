@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.availability import free_runs, refresh_availability
+from theatre.models import (
+    Genre,
+    Performance,
+    PerformanceAvailability,
+    Play,
+    TheatreHall,
+)
+
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+class FreeRunsTests(TestCase):
+    def test_free_runs(self):
+        self.assertEqual(free_runs(5, set()), [(1, 5)])
+        self.assertEqual(free_runs(5, {1, 2, 5}), [(3, 2)])
+        self.assertEqual(free_runs(6, {3}), [(1, 2), (4, 3)])
+        self.assertEqual(free_runs(2, {1, 2}), [])
+
+
+class PerformanceAvailabilityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.genre = Genre.objects.create(name="Drama")
+        self.play = Play.objects.create(title="Hamlet")
+        self.play.genre.add(self.genre)
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=2, seats_in_row=5
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.performance = Performance.objects.create(
+                play=self.play,
+                theatre_hall=self.hall,
+                show_time=timezone.now() + timedelta(days=2),
+            )
+
+    def test_summary_created_with_performance(self):
+        availability = self.performance.availability
+        self.assertEqual(availability.free_seats, 10)
+        self.assertEqual(availability.max_free_run, 5)
+        self.assertEqual(availability.row_free_runs, [5, 5])
+
+    def test_summary_refreshed_on_reservation_commit(self):
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": 3, "performance": self.performance.id},
+                {"row": 2, "seat": 2, "performance": self.performance.id},
+            ]
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                RESERVATION_URL, payload, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        availability = PerformanceAvailability.objects.get(
+            performance=self.performance
+        )
+        self.assertEqual(availability.free_seats, 8)
+        self.assertEqual(availability.max_free_run, 3)
+        self.assertEqual(availability.row_free_runs, [2, 3])
+
+    def test_search_by_genre_days_and_adjacent_seats(self):
+        response = self.client.get(
+            PERFORMANCE_URL,
+            {"genre": self.genre.id, "days": 7, "adjacent_seats": 4},
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data], [self.performance.id]
+        )
+
+        response = self.client.get(PERFORMANCE_URL, {"adjacent_seats": 6})
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(PERFORMANCE_URL, {"days": 1})
+        self.assertEqual(response.data, [])
+
+    def test_malformed_filters_are_rejected(self):
+        for params in (
+            {"free_seats": "abc"},
+            {"adjacent_seats": "-1"},
+            {"days": "10000000"},
+            {"genre": f"{self.genre.id},x"},
+        ):
+            response = self.client.get(PERFORMANCE_URL, params)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, params
+            )
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_rebuild_command(self):
+        PerformanceAvailability.objects.all().delete()
+
+        call_command("rebuild_availability", stdout=open("/dev/null", "w"))
+
+        self.assertEqual(self.performance.availability.free_seats, 10)
+
+    def test_refresh_ignores_unknown_performances(self):
+        self.assertEqual(refresh_availability([self.performance.id + 1]), 0)
@@ -0,0 +1,240 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, IntegrityError, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.check_in import CheckInLog, read_ticket_token, ticket_token
+from theatre.models import (
+    CheckIn,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+def check_in_url(performance_id):
+    return reverse("theatre:performance-check-in", args=[performance_id])
+
+
+class TicketTokenTests(TestCase):
+    def test_token_round_trip(self):
+        ticket = Ticket(id=7, performance_id=3, row=2, seat=11)
+        token = ticket_token(ticket)
+
+        self.assertEqual(read_ticket_token(token), (7, 3, 2, 11))
+        self.assertIsNone(
+            read_ticket_token(token.replace("3.2.11", "3.2.12"))
+        )
+        self.assertIsNone(read_ticket_token("garbage"))
+
+
+@override_settings(CHECK_IN_BATCH_SIZE=1000, CHECK_IN_FLUSH_INTERVAL=3600)
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.scanner = APIClient()
+        self.scanner.force_authenticate(
+            get_user_model().objects.create_superuser(
+                email="admin@test.com", password="test_password"
+            )
+        )
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        play = Play.objects.create(title="Hamlet")
+        self.performance, self.other = [
+            Performance.objects.create(
+                play=play, theatre_hall=hall, show_time=timezone.now()
+            )
+            for _ in range(2)
+        ]
+        self.log = CheckInLog(settings.CHECK_IN_CACHE_SIZE)
+        self.patch_log()
+
+    def patch_log(self):
+        patcher = mock.patch("theatre.views.CHECK_INS", self.log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.log.flush)
+
+    def ticket(self, seat, performance=None):
+        return Ticket.objects.create(
+            row=1,
+            seat=seat,
+            performance=performance or self.performance,
+            reservation=Reservation.objects.create(user=self.user),
+        )
+
+    def scan(self, *tokens):
+        response = self.scanner.post(
+            check_in_url(self.performance.id),
+            {"tokens": list(tokens)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return [result["status"] for result in response.data]
+
+    def test_reservation_tickets_carry_a_token(self):
+        response = self.client.post(
+            RESERVATION_URL,
+            {
+                "tickets": [
+                    {"row": 2, "seat": 3, "performance": self.performance.id}
+                ]
+            },
+            format="json",
+        )
+
+        ticket = response.data["tickets"][0]
+        self.assertEqual(
+            read_ticket_token(ticket["token"]),
+            (ticket["id"], self.performance.id, 2, 3),
+        )
+
+    def test_scans_are_answered_from_memory(self):
+        first = ticket_token(self.ticket(1))
+        second = ticket_token(self.ticket(2))
+        elsewhere = ticket_token(self.ticket(3, self.other))
+        self.scan(first)
+
+        with self.assertNumQueries(0):
+            statuses = self.scan(
+                first,
+                second,
+                second,
+                "1.2.3.4.forged",
+                elsewhere,
+            )
+
+        self.assertEqual(
+            statuses,
+            ["duplicate", "admitted", "duplicate", "invalid",
+             "wrong_performance"],
+        )
+
+    def test_entries_are_written_in_batches(self):
+        tokens = [ticket_token(self.ticket(seat)) for seat in (1, 2, 3)]
+
+        with override_settings(CHECK_IN_BATCH_SIZE=2):
+            self.scan(tokens[0])
+            self.assertFalse(CheckIn.objects.exists())
+            self.scan(*tokens[1:])
+
+        self.assertEqual(CheckIn.objects.count(), 3)
+
+    def test_entries_of_earlier_processes_are_duplicates(self):
+        token = ticket_token(self.ticket(1))
+        self.scan(token)
+        self.log.flush()
+
+        self.log = CheckInLog(settings.CHECK_IN_CACHE_SIZE)
+        self.patch_log()
+
+        self.assertEqual(self.scan(token), ["duplicate"])
+
+    def test_failed_writes_stay_pending(self):
+        ticket = self.ticket(1)
+        self.scan(ticket_token(ticket))
+
+        with mock.patch.object(
+            CheckIn.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                self.log.flush()
+
+        self.assertEqual(self.log.flush(), 1)
+        self.assertTrue(CheckIn.objects.filter(ticket_id=ticket.id).exists())
+
+    def test_failed_writes_do_not_fail_the_scan(self):
+        token = ticket_token(self.ticket(1))
+
+        with override_settings(CHECK_IN_BATCH_SIZE=1), mock.patch.object(
+            CheckIn.objects, "bulk_create", side_effect=OperationalError
+        ), self.assertLogs("theatre.check_in", "ERROR"):
+            self.assertEqual(self.scan(token), ["admitted"])
+
+        self.assertEqual(len(self.log.pending), 1)
+
+    @override_settings(CHECK_IN_FLUSH_RETRIES=2)
+    def test_entries_that_keep_failing_are_dropped(self):
+        bad = self.ticket(1)
+        good = self.ticket(2)
+        self.scan(ticket_token(bad), ticket_token(good))
+        bulk_create = CheckIn.objects.bulk_create
+
+        def fail_for_bad(entries, **kwargs):
+            if any(entry.ticket_id == bad.id for entry in entries):
+                raise IntegrityError
+            return bulk_create(entries, **kwargs)
+
+        with mock.patch.object(
+            CheckIn.objects, "bulk_create", side_effect=fail_for_bad
+        ):
+            for _ in range(2):
+                with self.assertRaises(IntegrityError):
+                    self.log.flush()
+            with self.assertLogs("theatre.check_in", "ERROR"):
+                self.assertEqual(self.log.flush(), 1)
+
+        self.assertEqual(self.log.pending, [])
+        self.assertEqual(
+            list(CheckIn.objects.values_list("ticket_id", flat=True)),
+            [good.id],
+        )
+
+    def test_evicted_performances_keep_pending_entries(self):
+        self.log = CheckInLog(1)
+        self.patch_log()
+        token = ticket_token(self.ticket(1))
+        self.scan(token)
+        self.log.check_in(self.other.id, [])
+
+        self.assertEqual(self.scan(token), ["duplicate"])
+
+    def test_scanning_requires_staff(self):
+        response = self.client.post(
+            check_in_url(self.performance.id),
+            {"tokens": ["x"]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(CHECK_IN_BATCH_SIZE=1000, CHECK_IN_FLUSH_INTERVAL=0.05)
+class CheckInTimerTests(TransactionTestCase):
+    def test_entries_are_written_without_further_scans(self):
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+        log = CheckInLog(settings.CHECK_IN_CACHE_SIZE)
+        token = ticket_token(
+            Ticket(id=1, performance=performance, row=1, seat=1)
+        )
+
+        log.check_in(performance.id, [token])
+        for _ in range(100):
+            if CheckIn.objects.exists():
+                break
+            time.sleep(0.05)
+
+        self.assertTrue(CheckIn.objects.filter(ticket_id=1).exists())
+        self.assertEqual(log.pending, [])
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.models import Actor, Genre, Performance, Play, TheatreHall
+
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+PLAY_URL = reverse("theatre:play-list")
+
+
+class CompactFormatTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.com", password="test_password"
+            )
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=5, seats_in_row=5
+        )
+        self.actor = Actor.objects.create(first_name="Ann", last_name="Lee")
+        self.genre = Genre.objects.create(name="Tragedy")
+        self.plays = []
+        for title in ("Hamlet", "Macbeth"):
+            play = Play.objects.create(title=title)
+            play.actor.add(self.actor)
+            play.genre.add(self.genre)
+            self.plays.append(play)
+
+    def create_performances(self, count):
+        Performance.objects.bulk_create(
+            Performance(
+                play=self.plays[i % 2],
+                theatre_hall=self.hall,
+                show_time=timezone.now(),
+            )
+            for i in range(count)
+        )
+
+    def get_compact(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"format": "compact"})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_performances_reference_deduplicated_tables(self):
+        self.create_performances(4)
+
+        data, _ = self.get_compact(PERFORMANCE_URL)
+
+        self.assertEqual(len(data["results"]), 4)
+        self.assertEqual(
+            set(data["results"][0]),
+            {"id", "show_time", "play", "theatre_hall", "tickets_available"},
+        )
+        self.assertEqual(
+            set(data["plays"]), {str(play.id) for play in self.plays}
+        )
+        self.assertEqual(
+            data["plays"][str(self.plays[0].id)]["actor"], [self.actor.id]
+        )
+        self.assertEqual(
+            data["actors"],
+            {str(self.actor.id): {"id": self.actor.id,
+                                  "full_name": "Ann Lee"}},
+        )
+        self.assertEqual(list(data["genres"]), [str(self.genre.id)])
+        self.assertEqual(data["theatre_halls"][str(self.hall.id)]["rows"], 5)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_performances(2)
+        _, few = self.get_compact(PERFORMANCE_URL)
+
+        self.create_performances(20)
+        _, many = self.get_compact(PERFORMANCE_URL)
+
+        self.assertEqual(few, many)
+
+    def test_paginated_play_list(self):
+        data, _ = self.get_compact(PLAY_URL)
+
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(
+            [play["title"] for play in data["results"]], ["Hamlet", "Macbeth"]
+        )
+        self.assertEqual(list(data["actors"]), [str(self.actor.id)])
+        self.assertNotIn("plays", data)
+
+    def test_default_format_is_unchanged(self):
+        self.create_performances(1)
+
+        response = self.client.get(PERFORMANCE_URL)
+
+        self.assertEqual(response.data[0]["play"]["title"], "Hamlet")
@@ -0,0 +1,162 @@
+import gzip
+
+import brotli
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.compression import choose_encoding
+from theatre.models import (
+    Performance,
+    Play,
+    Reservation,
+    Ticket,
+    TheatreHall,
+)
+
+
+PLAY_URL = reverse("theatre:play-list")
+PERFORMANCE_URL = reverse("theatre:performance-list")
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+class ChooseEncodingTests(TestCase):
+    def test_negotiation(self):
+        for header, expected in (
+            ("", None),
+            ("identity", None),
+            ("gzip", "gzip"),
+            ("gzip, deflate, br", "br"),
+            ("br;q=0.5, gzip", "gzip"),
+            ("br;q=0, gzip;q=0", None),
+            ("*", "br"),
+            ("*, br;q=0", "gzip"),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.com", password="test_password"
+            )
+        )
+        for i in range(20):
+            Play.objects.create(title=f"Play {i}", description="Drama " * 20)
+
+    def get(self, url, encoding, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                url, params, HTTP_ACCEPT_ENCODING=encoding
+            )
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_large_responses_are_compressed(self):
+        plain, _ = self.get(PLAY_URL, "")
+        gzipped, _ = self.get(PLAY_URL, "gzip")
+        brotli_response, _ = self.get(PLAY_URL, "gzip, br")
+
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+        self.assertEqual(gzipped["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(gzipped.content), plain.content)
+        self.assertEqual(brotli_response["Content-Encoding"], "br")
+        self.assertEqual(
+            brotli.decompress(brotli_response.content), plain.content
+        )
+        self.assertEqual(
+            int(brotli_response["Content-Length"]),
+            len(brotli_response.content),
+        )
+
+    def test_small_responses_are_not_compressed(self):
+        response, _ = self.get(PLAY_URL, "gzip", title="Play 1", fields="id")
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertNotIn("Accept-Encoding", response.get("Vary", ""))
+
+    def test_cached_catalog_response(self):
+        first, first_queries = self.get(PLAY_URL, "br")
+        second, second_queries = self.get(PLAY_URL, "br")
+
+        self.assertGreater(first_queries, 0)
+        # Authentication is forced, so a hit runs no SQL at all
+        self.assertEqual(second_queries, 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Content-Encoding"], "br")
+
+    def test_writes_invalidate_cached_responses(self):
+        self.get(PLAY_URL, "")
+        Play.objects.create(title="New play")
+
+        response, queries = self.get(PLAY_URL, "")
+
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.json()["count"], 21)
+
+    def test_tickets_invalidate_cached_performances(self):
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        performance = Performance.objects.create(
+            play=Play.objects.first(),
+            theatre_hall=hall,
+            show_time=timezone.now(),
+        )
+        self.get(PERFORMANCE_URL, "")
+        Ticket.objects.create(
+            row=1,
+            seat=1,
+            performance=performance,
+            reservation=Reservation.objects.create(
+                user=get_user_model().objects.get()
+            ),
+        )
+
+        response, _ = self.get(PERFORMANCE_URL, "")
+
+        self.assertEqual(response.json()[0]["tickets_available"], 24)
+
+    def test_bookings_invalidate_cached_performances(self):
+        performance = Performance.objects.create(
+            play=Play.objects.first(),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+        self.get(PERFORMANCE_URL, "")
+
+        response = self.client.post(
+            RESERVATION_URL,
+            {
+                "tickets": [
+                    {"row": 1, "seat": seat, "performance": performance.id}
+                    for seat in (1, 2)
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response, _ = self.get(PERFORMANCE_URL, "")
+        self.assertEqual(response.json()[0]["tickets_available"], 23)
+
+    def test_bulk_writes_invalidate_cached_responses(self):
+        self.get(PLAY_URL, "")
+        Play.objects.bulk_create([Play(title="New play")])
+        response, _ = self.get(PLAY_URL, "")
+        self.assertEqual(response.json()["count"], 21)
+
+        Play.objects.filter(title="New play").update(title="Renamed")
+        response, _ = self.get(PLAY_URL, "", title="Renamed")
+        self.assertEqual(response.json()["count"], 1)
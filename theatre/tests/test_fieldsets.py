@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.models import Actor, Genre, Performance, Play, TheatreHall
+
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+
+
+def play_detail_url(play_id):
+    return reverse("theatre:play-detail", args=[play_id])
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.com", password="test_password"
+            )
+        )
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        self.play = Play.objects.create(title="Hamlet", description="Drama")
+        self.actor = Actor.objects.create(first_name="Ann", last_name="Lee")
+        self.genre = Genre.objects.create(name="Tragedy")
+        self.play.actor.add(self.actor)
+        self.play.genre.add(self.genre)
+        for _ in range(3):
+            Performance.objects.create(
+                play=self.play, theatre_hall=hall, show_time=timezone.now()
+            )
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, [query["sql"] for query in queries]
+
+    def test_full_response_by_default(self):
+        data, queries = self.get(PERFORMANCE_URL)
+
+        performance = data[0]
+        self.assertEqual(performance["play"]["title"], "Hamlet")
+        self.assertEqual(
+            performance["play"]["actor"][0]["plays_title"], ["Hamlet"]
+        )
+        self.assertIn("tickets_available", performance)
+        # Nested actors, genres and their plays are prefetched
+        self.assertEqual(len(queries), 4)
+
+    def test_fields_prune_serializer_and_query(self):
+        data, queries = self.get(PERFORMANCE_URL, fields="id,show_time")
+
+        self.assertEqual(set(data[0]), {"id", "show_time"})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("JOIN", queries[0])
+        self.assertNotIn("COUNT", queries[0])
+
+    def test_nested_fields(self):
+        data, queries = self.get(PERFORMANCE_URL, fields="id,play.title")
+
+        self.assertEqual(data[0]["play"], {"title": "Hamlet"})
+        self.assertEqual(len(queries), 1)
+        self.assertIn("theatre_play", queries[0])
+
+    def test_unexpanded_nested_objects_are_ids(self):
+        data, queries = self.get(
+            play_detail_url(self.play.id), expand="genre"
+        )
+
+        self.assertEqual(data["actor"], [self.actor.id])
+        self.assertEqual(
+            data["genre"], [{"id": self.genre.id, "name": "Tragedy"}]
+        )
+        # Play, actor ids and genres; the actors' plays are not loaded
+        self.assertEqual(len(queries), 3)
+
+    def test_empty_expand_collapses_everything(self):
+        data, queries = self.get(PERFORMANCE_URL, expand="")
+
+        self.assertEqual(data[0]["play"], self.play.id)
+        self.assertEqual(len(queries), 1)
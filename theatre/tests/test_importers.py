@@ -0,0 +1,330 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.importers import import_catalog, import_performances, read_rows
+from theatre.models import Actor, Genre, Performance, Play, TheatreHall
+
+
+PERFORMANCE_IMPORT_URL = reverse("theatre:performance-bulk-import")
+
+
+class ImportPerformancesTests(TestCase):
+    def setUp(self):
+        self.play = Play.objects.create(title="Hamlet")
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=2, seats_in_row=2
+        )
+
+    def test_import_by_id_and_name(self):
+        rows = read_rows(
+            io.StringIO(
+                "play,theatre_hall,show_time\n"
+                f"{self.play.id},Main,2024-05-01 19:00\n"
+                f"Hamlet,{self.hall.id},2024-05-02T19:00:00+02:00\n"
+            ),
+            "csv",
+        )
+
+        with self.assertNumQueries(5):
+            result = import_performances(rows)
+
+        self.assertEqual(result, {"created": 2, "errors": []})
+        self.assertEqual(
+            Performance.objects.filter(
+                play=self.play, theatre_hall=self.hall
+            ).count(),
+            2,
+        )
+
+    def test_invalid_rows_abort_import(self):
+        rows = [
+            {"play": "Hamlet", "theatre_hall": "Main",
+             "show_time": "2024-05-01"},
+            {"play": "Macbeth", "theatre_hall": "Main",
+             "show_time": "soon"},
+        ]
+
+        result = import_performances(rows)
+
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["errors"][0]["row"], 2)
+        self.assertEqual(
+            set(result["errors"][0]["errors"]), {"play", "show_time"}
+        )
+        self.assertFalse(Performance.objects.exists())
+
+    def test_partial_import_keeps_valid_rows(self):
+        rows = read_rows(
+            io.StringIO(
+                '{"play": "Hamlet", "theatre_hall": "Main",'
+                ' "show_time": "2024-05-01 19:00"}\n'
+                '{"play": "Hamlet", "theatre_hall": "Small",'
+                ' "show_time": "2024-05-01 19:00"}\n'
+            ),
+            "ndjson",
+        )
+
+        result = import_performances(rows, partial=True)
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(result["errors"][0]["row"], 2)
+
+    def test_numeric_title_is_matched(self):
+        nineteen = Play.objects.create(title="1984")
+
+        result = import_performances(
+            [{"play": "1984", "theatre_hall": "Main",
+              "show_time": "2024-05-01 19:00"}]
+        )
+
+        self.assertEqual(result["created"], 1)
+        self.assertTrue(Performance.objects.filter(play=nineteen).exists())
+
+    def test_ambiguous_title_is_rejected(self):
+        Play.objects.create(title="Hamlet")
+
+        result = import_performances(
+            [{"play": "Hamlet", "theatre_hall": "Main",
+              "show_time": "2024-05-01 19:00"}]
+        )
+
+        self.assertEqual(
+            result["errors"][0]["errors"]["play"], "Ambiguous play title."
+        )
+
+
+class ReadRowsTests(TestCase):
+    def test_unreadable_lines_become_invalid_rows(self):
+        rows = list(read_rows(
+            io.BytesIO(
+                b'{"play": "Hamlet"}\n'
+                b'{"play": \n'
+                b"[1, 2]\n"
+                b"\n"
+                b'{"play": "Caf\xe9"}\n'
+                b'{"play": "Macbeth"}\n'
+            ),
+            "ndjson",
+        ))
+
+        self.assertEqual(
+            [getattr(row, "error", row) for row in rows],
+            [
+                {"play": "Hamlet"},
+                "Invalid JSON.",
+                "Expected a JSON object.",
+                "Not valid UTF-8.",
+                {"play": "Macbeth"},
+            ],
+        )
+
+    def test_undecodable_csv_lines_keep_their_place(self):
+        rows = list(read_rows(
+            io.BytesIO(
+                b"\xef\xbb\xbfplay,theatre_hall\n"
+                b"Hamlet,Main\n"
+                b"Caf\xe9,Main\n"
+                b"Macbeth,Main\n"
+            ),
+            "csv",
+        ))
+
+        self.assertEqual(
+            [getattr(row, "error", row) for row in rows],
+            [
+                {"play": "Hamlet", "theatre_hall": "Main"},
+                "Not valid UTF-8.",
+                {"play": "Macbeth", "theatre_hall": "Main"},
+            ],
+        )
+
+
+class ImportPerformancesApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Play.objects.create(title="Hamlet")
+        TheatreHall.objects.create(name="Main", rows=2, seats_in_row=2)
+
+    def login_admin(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="admin@test.com",
+                password="test_password",
+                is_staff=True,
+            )
+        )
+
+    def upload(self):
+        return SimpleUploadedFile(
+            "season.csv",
+            b"play,theatre_hall,show_time\nHamlet,Main,2024-05-01 19:00\n",
+        )
+
+    def test_import_requires_staff(self):
+        user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(user)
+
+        response = self.client.post(
+            PERFORMANCE_IMPORT_URL, {"file": self.upload()}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_file(self):
+        self.login_admin()
+
+        response = self.client.post(
+            PERFORMANCE_IMPORT_URL, {"file": self.upload()}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(Performance.objects.count(), 1)
+
+    def test_malformed_lines_are_reported(self):
+        self.login_admin()
+        content = (
+            b'{"play": "Hamlet", "theatre_hall": "Main",'
+            b' "show_time": "2024-05-01 19:00"}\n'
+            b"not json\n"
+        )
+
+        response = self.client.post(
+            PERFORMANCE_IMPORT_URL,
+            {"file": SimpleUploadedFile("season.ndjson", content)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["errors"],
+            [{"row": 2, "errors": {"line": "Invalid JSON."}}],
+        )
+
+        response = self.client.post(
+            PERFORMANCE_IMPORT_URL,
+            {
+                "file": SimpleUploadedFile("season.ndjson", content),
+                "partial": True,
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Performance.objects.count(), 1)
+
+
+class ImportCatalogTests(TestCase):
+    def test_import_creates_plays_with_relations(self):
+        rows = read_rows(
+            io.StringIO(
+                "title,description,actors,genres\n"
+                "Hamlet,Prince,John Smith; Ann Lee,Drama\n"
+                "Macbeth,,Ann Lee,Drama; Tragedy\n"
+            ),
+            "csv",
+        )
+
+        result = import_catalog(rows)
+
+        self.assertEqual(result["created"], 2)
+        self.assertEqual(result["actors_created"], 2)
+        self.assertEqual(result["genres_created"], 2)
+        macbeth = Play.objects.get(title="Macbeth")
+        self.assertEqual(
+            {genre.name for genre in macbeth.genre.all()},
+            {"Drama", "Tragedy"},
+        )
+        self.assertEqual(
+            [actor.full_name for actor in macbeth.actor.all()], ["Ann Lee"]
+        )
+
+    def test_import_upserts_existing_rows(self):
+        genre = Genre.objects.create(name="Drama")
+        actor = Actor.objects.create(first_name="Ann", last_name="Lee")
+        play = Play.objects.create(title="Hamlet", description="Old")
+        play.genre.add(genre)
+
+        result = import_catalog(
+            [{"title": "Hamlet", "description": "New",
+              "actors": ["Ann Lee"], "genres": ["Drama"]}]
+        )
+
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(result["actors_created"], 0)
+        play.refresh_from_db()
+        self.assertEqual(play.description, "New")
+        self.assertEqual(list(play.actor.all()), [actor])
+        self.assertEqual(Genre.objects.count(), 1)
+
+    def test_blank_description_keeps_the_current_one(self):
+        Play.objects.create(title="Hamlet", description="Prince")
+
+        result = import_catalog(
+            read_rows(
+                io.StringIO("title,description,actors,genres\nHamlet,,,\n"),
+                "csv",
+            )
+        )
+
+        self.assertEqual(result["updated"], 0)
+        self.assertEqual(
+            Play.objects.get(title="Hamlet").description, "Prince"
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        rows = [
+            {"title": f"Play {i}", "actors": [f"Actor {i}"],
+             "genres": [f"Genre {i % 3}"]}
+            for i in range(50)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            import_catalog(rows)
+
+        self.assertLess(len(queries), 15)
+        self.assertEqual(Play.actor.through.objects.count(), 50)
+
+    def test_invalid_row_rolls_back(self):
+        result = import_catalog([{"title": "Hamlet"}, {"title": ""}])
+
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["errors"], [
+            {"row": 2, "errors": {"title": "Required."}}
+        ])
+        self.assertFalse(Play.objects.exists())
+
+    def test_values_longer_than_their_fields_are_reported(self):
+        result = import_catalog(
+            [
+                {"title": "Hamlet", "genres": ["Drama"]},
+                {"title": "x" * 256},
+                {"title": "Macbeth", "genres": ["Drama", "y" * 64]},
+                {"title": "Lear", "actors": [f"Ann {'z' * 64}"]},
+            ],
+            partial=True,
+        )
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(result["errors"], [
+            {"row": 2, "errors": {
+                "title": "Ensure each value has at most 255 characters."
+            }},
+            {"row": 3, "errors": {
+                "genres": "Ensure each value has at most 63 characters."
+            }},
+            {"row": 4, "errors": {
+                "actors": "Ensure each value has at most 63 characters."
+            }},
+        ])
+        self.assertEqual(
+            list(Play.objects.values_list("title", flat=True)), ["Hamlet"]
+        )
@@ -0,0 +1,92 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from theatre.catalog_cache import HALL_LAYOUTS, bump_versions
+from theatre.layouts import hall_layout, performance_layout
+from theatre.models import Performance, Play, TheatreHall, Ticket
+from theatre.object_cache import LRUCache
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        cache.get(1)
+        cache.set(3, "c")
+
+        self.assertEqual(cache.get(1), "a")
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(len(cache), 2)
+
+
+class HallLayoutTests(TestCase):
+    def setUp(self):
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=5, seats_in_row=8
+        )
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=self.hall,
+            show_time=timezone.now(),
+        )
+
+    def ticket(self, row, seat):
+        return Ticket(row=row, seat=seat, performance_id=self.performance.id)
+
+    def test_ticket_validation_without_queries(self):
+        performance_layout(self.performance.id)
+
+        with self.assertNumQueries(0):
+            self.ticket(5, 8).clean()
+            with self.assertRaises(ValidationError):
+                self.ticket(6, 1).clean()
+
+    def test_hall_changes_are_picked_up(self):
+        self.assertEqual(hall_layout(self.hall.id).rows, 5)
+
+        self.hall.rows = 10
+        self.hall.save()
+
+        self.assertEqual(performance_layout(self.performance.id).rows, 10)
+        self.ticket(10, 1).clean()
+
+    def test_moving_a_performance_to_another_hall(self):
+        performance_layout(self.performance.id)
+        self.performance.theatre_hall = TheatreHall.objects.create(
+            name="Small", rows=2, seats_in_row=2
+        )
+        self.performance.save()
+
+        self.assertEqual(
+            tuple(performance_layout(self.performance.id)), (2, 2)
+        )
+
+    def test_bulk_updates_are_picked_up(self):
+        performance_layout(self.performance.id)
+        small = TheatreHall.objects.create(
+            name="Small", rows=2, seats_in_row=2
+        )
+
+        TheatreHall.objects.filter(id=self.hall.id).update(rows=7)
+        self.assertEqual(hall_layout(self.hall.id).rows, 7)
+        Performance.objects.filter(id=self.performance.id).update(
+            theatre_hall=small
+        )
+        self.assertEqual(
+            tuple(performance_layout(self.performance.id)), (2, 2)
+        )
+
+    @override_settings(HALL_LAYOUT_VERSION_CHECK_INTERVAL=0)
+    def test_changes_of_other_processes(self):
+        hall_layout(self.hall.id)
+        # Another process resizes the hall; only the version tells. The
+        # base manager sends no bulk_changed, as if the write was remote
+        TheatreHall._base_manager.filter(id=self.hall.id).update(
+            seats_in_row=3
+        )
+
+        self.assertEqual(hall_layout(self.hall.id).seats_in_row, 8)
+        bump_versions(HALL_LAYOUTS)
+        self.assertEqual(hall_layout(self.hall.id).seats_in_row, 3)
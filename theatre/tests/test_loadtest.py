@@ -0,0 +1,96 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase
+
+from theatre.loadtest import ApiClient, LatencyRecorder, percentile
+from theatre.models import Performance, Play, Ticket
+
+
+class LatencyRecorderTests(TestCase):
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+
+        self.assertEqual(percentile(values, 0.5), 3)
+        self.assertEqual(percentile(values, 0.99), 5)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_summary_per_endpoint(self):
+        recorder = LatencyRecorder()
+        recorder.record("plays", 200, 0.010)
+        recorder.record("plays", 200, 0.030)
+        recorder.record("reservation", 400, 0.020)
+
+        self.assertEqual(recorder.total_requests, 3)
+        self.assertEqual(
+            list(recorder.summary()),
+            [
+                ("plays", 2, 10.0, 30.0, 30.0, {200: 2}),
+                ("reservation", 1, 20.0, 20.0, 20.0, {400: 1}),
+            ],
+        )
+
+    def test_unreachable_server_is_recorded(self):
+        recorder = LatencyRecorder()
+        client = ApiClient("http://127.0.0.1:9", recorder, timeout=1)
+
+        self.assertEqual(client.get("/", "root"), (0, None))
+        self.assertEqual(dict(recorder.statuses["root"]), {0: 1})
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    def call(self, **options):
+        out = StringIO()
+        call_command(
+            "loadtest",
+            base_url=self.live_server_url,
+            users=4,
+            rows=2,
+            seats_in_row=4,
+            hot_rows=1,
+            seed=1,
+            stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_storm_is_checked_and_cleaned_up(self):
+        output = self.call()
+
+        self.assertIn("no seat sold twice: ok", output)
+        self.assertFalse(Performance.objects.exists())
+        self.assertFalse(Play.objects.exists())
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_failing_users_fail_the_command(self):
+        with mock.patch(
+            "theatre.management.commands.loadtest.Command.simulate_user",
+            side_effect=RuntimeError("boom"),
+        ):
+            with self.assertRaisesMessage(CommandError, "4 simulated users"):
+                self.call()
+
+        self.assertFalse(Performance.objects.exists())
+
+    def test_failed_logins_fail_the_command(self):
+        with mock.patch.object(
+            ApiClient, "authenticate", return_value=False
+        ):
+            with self.assertRaisesMessage(CommandError, "4 simulated users"):
+                self.call()
+
+    def test_unexpected_responses_fail_the_command(self):
+        post = ApiClient.post
+
+        def fail_reservations(client, path, endpoint, payload):
+            if endpoint == "reservation":
+                return 500, None
+            return post(client, path, endpoint, payload)
+
+        with mock.patch.object(ApiClient, "post", fail_reservations):
+            with self.assertRaisesMessage(CommandError, "failed unexpectedly"):
+                self.call()
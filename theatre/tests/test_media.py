@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class MediaViewTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = override_settings(
+            MEDIA_ROOT=directory.name, MEDIA_ACCEL_REDIRECT_PREFIX=None
+        )
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        os.makedirs(os.path.join(directory.name, "uploads"))
+        with open(
+            os.path.join(directory.name, "uploads", "poster.jpg"), "wb"
+        ) as media_file:
+            media_file.write(bytes(range(100)))
+        self.url = reverse("media", args=["uploads/poster.jpg"])
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(b"".join(response.streaming_content),
+                         bytes(range(100)))
+
+    def test_range_requests(self):
+        for header, expected, content_range in (
+            ("bytes=10-19", bytes(range(10, 20)), "bytes 10-19/100"),
+            ("bytes=90-", bytes(range(90, 100)), "bytes 90-99/100"),
+            ("bytes=-5", bytes(range(95, 100)), "bytes 95-99/100"),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(
+                    int(response["Content-Length"]), len(expected)
+                )
+                self.assertEqual(
+                    b"".join(response.streaming_content), expected
+                )
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=200-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_accel_redirect(self):
+        with self.settings(MEDIA_ACCEL_REDIRECT_PREFIX="/protected/"):
+            response = self.client.get(self.url)
+
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/protected/uploads/poster.jpg"
+        )
+        self.assertEqual(response.content, b"")
+
+    def test_paths_outside_media_root_are_not_served(self):
+        response = self.client.get("/media/../manage.py")
+
+        self.assertEqual(response.status_code, 404)
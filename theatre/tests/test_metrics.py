@@ -0,0 +1,180 @@
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.metrics import REGISTRY
+from theatre.models import Actor, Performance, Play, TheatreHall
+
+
+ACTOR_URL = reverse("theatre:actor-list")
+METRICS_URL = reverse("metrics")
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+def sample(text, name):
+    """Return the value of the sample line that starts with name"""
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@override_settings(METRICS_TOKEN="scraper-token")
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+        Actor.objects.create(first_name="Ann", last_name="Lee")
+
+    def scrape(self):
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer scraper-token"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_scraping_requires_the_token_or_staff(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        self.assertEqual(
+            self.client.get(
+                METRICS_URL, HTTP_AUTHORIZATION="Bearer wrong"
+            ).status_code,
+            403,
+        )
+
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                email="admin@test.com", password="test_password"
+            )
+        )
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+    def test_requests_are_recorded_per_route(self):
+        count = (
+            "http_request_duration_seconds_count"
+            '{route="theatre:actor-list",method="GET"}'
+        )
+        before = sample(self.scrape(), count)
+
+        self.client.get(ACTOR_URL)
+        self.client.get(ACTOR_URL)
+
+        text = self.scrape()
+        self.assertEqual(sample(text, count), before + 2)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        self.assertIn(
+            'db_queries_per_request_bucket{route="theatre:actor-list",'
+            'le="+Inf"}',
+            text,
+        )
+        self.assertIn('db_connections{state="active"}', text)
+
+    def test_reservation_outcomes(self):
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+        success = 'reservations_total{outcome="success"}'
+        conflict = 'reservations_total{outcome="conflict"}'
+        before = self.scrape()
+        payload = {
+            "tickets": [
+                {"performance": performance.id, "row": 1, "seat": 1}
+            ]
+        }
+
+        self.client.post(RESERVATION_URL, payload, format="json")
+        self.client.post(RESERVATION_URL, payload, format="json")
+
+        text = self.scrape()
+        self.assertEqual(sample(text, success), sample(before, success) + 1)
+        self.assertEqual(
+            sample(text, conflict), sample(before, conflict) + 1
+        )
+
+    def test_snapshots_of_other_workers_are_merged(self):
+        self.client.get(ACTOR_URL)
+        count = (
+            "http_request_duration_seconds_count"
+            '{route="theatre:actor-list",method="GET"}'
+        )
+        local = sample(self.scrape(), count)
+
+        with tempfile.TemporaryDirectory() as directory:
+            other = REGISTRY.snapshot()
+            with open(os.path.join(directory, "metrics-1.json"), "w") as file:
+                json.dump(other, file)
+
+            with self.settings(METRICS_DIR=directory):
+                text = self.scrape()
+                self.assertTrue(
+                    os.path.exists(
+                        os.path.join(directory, f"metrics-{os.getpid()}.json")
+                    )
+                )
+
+        self.assertGreaterEqual(sample(text, count), 2 * local)
+
+    def test_gauges_keep_the_latest_value(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = REGISTRY.snapshot()
+            other["db_connections"] = {
+                json.dumps(["active"]): [1000, time.time() - 60]
+            }
+            path = os.path.join(directory, f"metrics-{os.getppid()}.json")
+            with open(path, "w") as file:
+                json.dump(other, file)
+
+            with self.settings(METRICS_DIR=directory):
+                text = self.scrape()
+
+        self.assertLess(sample(text, 'db_connections{state="active"}'), 1000)
+
+    def test_snapshots_of_exited_workers_are_retired(self):
+        self.client.get(ACTOR_URL)
+        worker = subprocess.Popen(["true"])
+        worker.wait()
+        count = (
+            "http_request_duration_seconds_count"
+            '{route="theatre:actor-list",method="GET"}'
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(METRICS_DIR=directory):
+                before = sample(self.scrape(), count)
+                exited = REGISTRY.snapshot()
+                exited["_process"] = {"pid": worker.pid, "started": None}
+                exited["db_connections"] = {
+                    json.dumps(["active"]): [1000, time.time() + 60]
+                }
+                path = os.path.join(directory, f"metrics-{worker.pid}.json")
+                with open(path, "w") as file:
+                    json.dump(exited, file)
+
+                text = self.scrape()
+                self.assertFalse(os.path.exists(path))
+                self.assertTrue(
+                    os.path.exists(
+                        os.path.join(directory, "metrics-retired.json")
+                    )
+                )
+
+        self.assertGreater(before, 0)
+        self.assertGreaterEqual(sample(text, count), 2 * before)
+        self.assertLess(sample(text, 'db_connections{state="active"}'), 1000)
@@ -0,0 +1,142 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.models import (
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+from theatre.object_cache import TwoTierCache
+
+
+def performance_detail_url(performance_id):
+    return reverse("theatre:performance-detail", args=[performance_id])
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = TwoTierCache("test")
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    self.cache.get_or_set("key", compute)
+                )
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 8)
+
+    def test_shared_tier_backs_the_local_one(self):
+        self.cache.get_or_set("key", lambda: "value")
+        self.cache.local.clear()
+
+        self.assertEqual(
+            self.cache.get_or_set("key", self.fail), "value"
+        )
+
+    def test_refresh_early_near_expiry(self):
+        now = time.time()
+
+        self.assertFalse(
+            TwoTierCache.refresh_early(
+                {"delta": 0.01, "expires": now + 3600}
+            )
+        )
+        self.assertTrue(
+            TwoTierCache.refresh_early({"delta": 0.01, "expires": now})
+        )
+
+    def test_stale_value_is_served_during_a_refresh(self):
+        self.cache.get_or_set("key", lambda: "old")
+        stale = {"value": "old", "delta": 0, "expires": 0}
+        key = next(iter(self.cache.local.data))
+        flight = self.cache.flights.setdefault(key, threading.Lock())
+        flight.acquire()
+        try:
+            value = self.cache._recompute(key, lambda: "new", stale)
+        finally:
+            flight.release()
+
+        self.assertEqual(value, "old")
+
+
+@override_settings(CATALOG_CACHE_TIMEOUT=0)
+class CachedPerformanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.play = Play.objects.create(title="Hamlet")
+        self.performance = Performance.objects.create(
+            play=self.play,
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+        self.url = performance_detail_url(self.performance.id)
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_only_taken_seats_are_queried_on_a_hit(self):
+        _, first = self.get()
+        Ticket.objects.create(
+            row=2,
+            seat=3,
+            performance=self.performance,
+            reservation=Reservation.objects.create(user=self.user),
+        )
+
+        data, second = self.get()
+
+        self.assertGreater(first, 1)
+        self.assertEqual(second, 1)
+        self.assertEqual(
+            [(seat["row"], seat["seat"]) for seat in data["taken_places"]],
+            [(2, 3)],
+        )
+
+    def test_catalog_changes_are_visible(self):
+        self.get()
+        self.play.title = "Macbeth"
+        self.play.save()
+
+        data, _ = self.get()
+
+        self.assertEqual(data["play"]["title"], "Macbeth")
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from theatre.models import Actor, TheatreHall
+from theatre.pagination import EstimatedCountPaginator
+
+
+ACTOR_URL = reverse("theatre:actor-list")
+
+
+def analyze(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {table}")
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        for _ in range(3):
+            TheatreHall.objects.create(name="Hall", rows=1, seats_in_row=1)
+        analyze("theatre_theatrehall")
+
+    def test_exact_count_below_threshold(self):
+        paginator = EstimatedCountPaginator(
+            TheatreHall.objects.order_by("id"), 2
+        )
+
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.count_is_estimate)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_table_estimate_above_threshold(self):
+        paginator = EstimatedCountPaginator(
+            TheatreHall.objects.order_by("id"), 2
+        )
+
+        self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.count_is_estimate)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_planner_estimate_for_filtered_queryset(self):
+        paginator = EstimatedCountPaginator(
+            TheatreHall.objects.filter(name="Hall").order_by("id"), 2
+        )
+
+        self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.count_is_estimate)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_pages_past_a_low_estimate_are_served(self):
+        for _ in range(4):
+            TheatreHall.objects.create(name="Hall", rows=1, seats_in_row=1)
+        paginator = EstimatedCountPaginator(
+            TheatreHall.objects.filter(name="Hall").order_by("id"), 2
+        )
+
+        page = paginator.page(4)
+
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.count, 7)
+        self.assertFalse(paginator.count_is_estimate)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_high_estimate_is_corrected(self):
+        TheatreHall.objects.order_by("id").last().delete()
+        paginator = EstimatedCountPaginator(
+            TheatreHall.objects.filter(name="Hall").order_by("id"), 2
+        )
+
+        self.assertFalse(paginator.page(1).has_next())
+        self.assertEqual(paginator.count, 2)
+        with self.assertRaises(EmptyPage):
+            EstimatedCountPaginator(
+                TheatreHall.objects.filter(name="Hall").order_by("id"), 2
+            ).page(2)
+
+
+class EstimatedCountPaginationApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.com", password="test_password"
+            )
+        )
+        for i in range(12):
+            Actor.objects.create(first_name=f"Actor {i}", last_name="Test")
+        analyze("theatre_actor")
+
+    def test_exact_count_is_reported(self):
+        response = self.client.get(ACTOR_URL)
+
+        self.assertEqual(response.data["count"], 12)
+        self.assertFalse(response.data["count_is_estimate"])
+        self.assertEqual(len(response.data["results"]), 10)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=5)
+    def test_estimated_count_is_flagged(self):
+        response = self.client.get(ACTOR_URL)
+
+        self.assertEqual(response.data["count"], 12)
+        self.assertTrue(response.data["count_is_estimate"])
+        self.assertEqual(len(response.data["results"]), 10)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=5)
+    def test_last_page_reports_the_exact_count(self):
+        response = self.client.get(ACTOR_URL, {"page": 2})
+
+        self.assertEqual(response.data["count"], 12)
+        self.assertFalse(response.data["count_is_estimate"])
+        self.assertEqual(len(response.data["results"]), 2)
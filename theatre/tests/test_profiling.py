@@ -0,0 +1,101 @@
+import marshal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import Actor, RequestProfile
+from theatre.profiling import ProfilingMiddleware
+
+
+ACTOR_URL = reverse("theatre:actor-list")
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            email="admin@test.com", password="test_password", is_staff=True
+        )
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        Actor.objects.create(first_name="Ann", last_name="Lee")
+
+    def get(self, user, **extra):
+        token = AccessToken.for_user(user)
+        return self.client.get(
+            ACTOR_URL, HTTP_AUTHORIZATION=f"Bearer {token}", **extra
+        )
+
+    def test_staff_request_with_header_is_profiled(self):
+        response = self.get(self.staff, HTTP_X_PROFILE="1")
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response["X-Profile-Id"], str(profile.id))
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.status_code, 200)
+        self.assertFalse(profile.sampled)
+        self.assertGreater(profile.query_count, 0)
+        self.assertTrue(
+            any("theatre_actor" in query["sql"] for query in profile.queries)
+        )
+        self.assertIn("function calls", profile.report)
+        self.assertIsInstance(marshal.loads(bytes(profile.stats)), dict)
+
+    def test_query_flag_is_accepted(self):
+        token = AccessToken.for_user(self.staff)
+
+        self.client.get(
+            ACTOR_URL,
+            {"_profile": "1"},
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    def test_non_staff_request_is_not_profiled(self):
+        response = self.get(self.user, HTTP_X_PROFILE="1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_plain_request_is_not_profiled(self):
+        self.get(self.staff)
+
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_sampling_profiles_every_nth_request(self):
+        with self.settings(PROFILING_SAMPLE_RATE=2):
+            middleware = ProfilingMiddleware(
+                lambda request: self.client.handler.get_response(request)
+            )
+        request = self.client.get(ACTOR_URL).wsgi_request
+
+        for _ in range(4):
+            middleware(request)
+
+        self.assertEqual(
+            RequestProfile.objects.filter(sampled=True).count(), 2
+        )
+
+    def test_admin_download(self):
+        self.get(self.staff, HTTP_X_PROFILE="1")
+        profile = RequestProfile.objects.get()
+        admin = get_user_model().objects.create_superuser(
+            email="root@test.com", password="test_password"
+        )
+        self.client.force_login(admin)
+
+        response = self.client.get(
+            reverse(
+                "admin:theatre_requestprofile_download", args=[profile.id]
+            )
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, bytes(profile.stats))
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from theatre.query_plans import plan_problems
+
+
+def node(node_type, rows, estimated=None, **extra):
+    return {
+        "Node Type": node_type,
+        "Plan Rows": rows if estimated is None else estimated,
+        "Actual Rows": rows,
+        "Actual Loops": 1,
+        **extra,
+    }
+
+
+class PlanProblemTests(TestCase):
+    def test_problems_are_found_in_nested_nodes(self):
+        plan = {
+            "Plan": node(
+                "Sort",
+                10,
+                **{
+                    "Sort Space Type": "Disk",
+                    "Sort Space Used": 2048,
+                    "Plans": [
+                        node(
+                            "Seq Scan",
+                            9000,
+                            estimated=50,
+                            **{"Relation Name": "theatre_ticket"},
+                        ),
+                        node(
+                            "Index Scan",
+                            5,
+                            **{"Relation Name": "theatre_performance"},
+                        ),
+                    ],
+                },
+            )
+        }
+
+        self.assertEqual(
+            sorted(kind for kind, _, _ in plan_problems(plan)),
+            ["row estimate", "seq scan", "sort on disk"],
+        )
+
+    def test_small_scans_are_ignored(self):
+        plan = {
+            "Plan": node(
+                "Seq Scan",
+                40,
+                estimated=1,
+                **{"Relation Name": "theatre_genre"},
+            )
+        }
+
+        self.assertEqual(list(plan_problems(plan)), [])
+
+
+class CheckQueryPlansCommandTests(TestCase):
+    def test_every_route_is_checked(self):
+        out = StringIO()
+
+        call_command(
+            "check_query_plans",
+            "--performances", "20",
+            "--tickets", "4",
+            "--users", "10",
+            stdout=out,
+        )
+
+        self.assertIn("reservation-list?when=past", out.getvalue())
+        self.assertIn("performance-detail", out.getvalue())
+        self.assertIn("No query plan regressions.", out.getvalue())
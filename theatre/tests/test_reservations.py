@@ -0,0 +1,335 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.idempotency import purge_expired_keys
+from theatre.models import (
+    IdempotencyKey,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+from theatre.waiting_room import active_rooms
+
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+def detail_url(reservation_id):
+    return reverse("theatre:reservation-detail", args=[reservation_id])
+
+
+class ReservationHistoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=10, seats_in_row=10
+        )
+
+    def reserve(self, days, seats=2, user=None):
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=self.hall,
+            show_time=timezone.now() + timedelta(days=days),
+        )
+        reservation = Reservation.objects.create(user=user or self.user)
+        for seat in range(1, seats + 1):
+            Ticket.objects.create(
+                row=1,
+                seat=seat,
+                performance=performance,
+                reservation=reservation,
+            )
+        return reservation
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_queries_do_not_grow_with_tickets(self):
+        self.reserve(days=1, seats=1)
+        few = self.count_queries(RESERVATION_URL)
+
+        for days in range(2, 6):
+            self.reserve(days=days, seats=4)
+        many = self.count_queries(RESERVATION_URL)
+
+        self.assertEqual(few, many)
+
+    def test_detail_queries_do_not_grow_with_tickets(self):
+        few = self.count_queries(detail_url(self.reserve(days=1, seats=1).id))
+        many = self.count_queries(detail_url(self.reserve(days=1, seats=8).id))
+
+        self.assertEqual(few, many)
+
+    def test_ticket_shows_user_email(self):
+        reservation = self.reserve(days=1, seats=1)
+
+        response = self.client.get(detail_url(reservation.id))
+
+        self.assertEqual(
+            response.data["tickets"][0]["user_name"], self.user.email
+        )
+
+    def test_filter_upcoming_and_past(self):
+        upcoming = self.reserve(days=3)
+        past = self.reserve(days=-3)
+
+        response = self.client.get(RESERVATION_URL, {"when": "upcoming"})
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]], [upcoming.id]
+        )
+
+        response = self.client.get(RESERVATION_URL, {"when": "past"})
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]], [past.id]
+        )
+
+    def test_other_users_reservations_are_hidden(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="test_password"
+        )
+        reservation = self.reserve(days=1, user=other)
+
+        response = self.client.get(detail_url(reservation.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reservations_cannot_be_changed_or_deleted(self):
+        reservation = self.reserve(days=1, seats=1)
+        url = detail_url(reservation.id)
+
+        for response in (
+            self.client.put(url, {"tickets": []}, format="json"),
+            self.client.patch(url, {"tickets": []}, format="json"),
+            self.client.delete(url),
+        ):
+            self.assertEqual(
+                response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+        self.assertEqual(reservation.tickets.count(), 1)
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+class IdempotentReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+
+    def post(self, key, seat=1):
+        payload = {
+            "tickets": [
+                {"row": 1, "seat": seat, "performance": self.performance.id}
+            ]
+        }
+        return self.client.post(
+            RESERVATION_URL,
+            payload,
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self.post("abc")
+        retry = self.post("abc")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_reused_key_with_other_payload_is_rejected(self):
+        self.post("abc", seat=1)
+
+        response = self.post("abc", seat=2)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_request_in_progress_conflicts(self):
+        first = self.post("abc")
+        IdempotencyKey.objects.filter(key="abc").update(status_code=None)
+
+        response = self.post("abc")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_abandoned_request_is_reclaimed(self):
+        self.post("abc")
+        # As if the worker died before booking and storing the response
+        Ticket.objects.all().delete()
+        Reservation.objects.all().delete()
+        IdempotencyKey.objects.filter(key="abc").update(
+            status_code=None,
+            created_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        response = self.post("abc")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_overlong_key_is_rejected(self):
+        response = self.post("k" * 256)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertEqual(
+            self.post("k" * 255).status_code, status.HTTP_201_CREATED
+        )
+
+    def test_failed_request_can_be_retried(self):
+        self.post("first", seat=1)
+
+        failed = self.post("second", seat=1)
+        self.assertEqual(failed.status_code, status.HTTP_400_BAD_REQUEST)
+        retried = self.post("second", seat=2)
+
+        self.assertEqual(retried.status_code, status.HTTP_201_CREATED)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post("abc", seat=1)
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="other@test.com", password="test_password"
+            )
+        )
+
+        response = self.post("abc", seat=2)
+
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    def test_purge_expired_keys(self):
+        self.post("old")
+        self.post("new", seat=2)
+        IdempotencyKey.objects.filter(key="old").update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        self.assertEqual(purge_expired_keys(), 1)
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)),
+            ["new"],
+        )
+
+
+class BatchReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client.force_authenticate(self.user)
+        play = Play.objects.create(title="Hamlet")
+        self.performances = [
+            Performance.objects.create(
+                play=play,
+                theatre_hall=TheatreHall.objects.create(
+                    name=f"Hall {i}", rows=3, seats_in_row=3
+                ),
+                show_time=timezone.now() + timedelta(days=i),
+            )
+            for i in range(3)
+        ]
+        # Warm the process-wide cache of open waiting rooms
+        active_rooms()
+
+    def post(self, seats):
+        payload = {
+            "tickets": [
+                {"performance": performance.id, "row": row, "seat": seat}
+                for performance, row, seat in seats
+            ]
+        }
+        return self.client.post(RESERVATION_URL, payload, format="json")
+
+    def test_reserve_across_performances(self):
+        first, second, _ = self.performances
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([(first, 1, 1), (second, 2, 2)])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            set(Ticket.objects.values_list("performance", "row", "seat")),
+            {(first.id, 1, 1), (second.id, 2, 2)},
+        )
+        second.availability.refresh_from_db()
+        self.assertEqual(second.availability.free_seats, 8)
+
+    def test_validation_queries_do_not_grow_with_tickets(self):
+        with CaptureQueriesContext(connection) as few:
+            self.post([(self.performances[0], 1, 1)])
+
+        with CaptureQueriesContext(connection) as many:
+            self.post([
+                (performance, row, seat)
+                for performance in self.performances
+                for row in (2, 3)
+                for seat in (1, 2, 3)
+            ])
+
+        self.assertEqual(len(few), len(many))
+
+    def test_taken_seat_is_reported_per_ticket(self):
+        first, second, _ = self.performances
+        self.post([(second, 1, 1)])
+
+        response = self.post([(first, 1, 1), (second, 1, 1)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["tickets"][0], {})
+        self.assertIn("seat", response.data["tickets"][1])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_out_of_range_and_duplicate_seats(self):
+        first = self.performances[0]
+
+        response = self.post([(first, 4, 1), (first, 1, 1), (first, 1, 1)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("row", response.data["tickets"][0])
+        self.assertEqual(response.data["tickets"][1], {})
+        self.assertIn("seat", response.data["tickets"][2])
+
+    def test_unknown_performance(self):
+        response = self.client.post(
+            RESERVATION_URL,
+            {"tickets": [{"performance": 999, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("performance", response.data["tickets"][0])
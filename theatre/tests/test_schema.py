@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from theatre_api_service.schema import clear_schema_cache, code_fingerprint
+
+
+SCHEMA_URL = reverse("schema")
+
+
+class CachedSchemaTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "schema.json")
+        cache_path = override_settings(SCHEMA_CACHE_PATH=self.path)
+        cache_path.enable()
+        self.addCleanup(cache_path.disable)
+        clear_schema_cache()
+        self.addCleanup(clear_schema_cache)
+        self.client = APIClient()
+
+    def test_schema_is_stored_and_revalidated_with_etag(self):
+        response = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("/api/theatre/performance/", response.json()["paths"])
+        with open(self.path) as schema_file:
+            self.assertEqual(
+                json.load(schema_file)["fingerprint"], code_fingerprint()
+            )
+
+        revalidated = self.client.get(
+            SCHEMA_URL,
+            {"format": "json"},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+        yaml = self.client.get(SCHEMA_URL)
+        self.assertNotEqual(yaml["ETag"], response["ETag"])
+        self.assertTrue(yaml.content.startswith(b"openapi:"))
+
+    def test_stale_schema_file_is_regenerated(self):
+        with open(self.path, "w") as schema_file:
+            json.dump({"fingerprint": "old", "schema": {"paths": {}}},
+                      schema_file)
+
+        response = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertTrue(response.json()["paths"])
+        with open(self.path) as schema_file:
+            self.assertNotEqual(json.load(schema_file)["fingerprint"], "old")
+
+    def test_matching_schema_file_is_served_without_generating(self):
+        with open(self.path, "w") as schema_file:
+            json.dump(
+                {
+                    "fingerprint": code_fingerprint(),
+                    "schema": {"openapi": "3.0.3", "paths": {"/stored/": {}}},
+                },
+                schema_file,
+            )
+
+        response = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(response.json()["paths"], {"/stored/": {}})
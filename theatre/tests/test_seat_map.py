@@ -0,0 +1,129 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre import allocation
+from theatre.availability import refresh_availability
+from theatre.models import (
+    Performance,
+    PerformanceAvailability,
+    Play,
+    TheatreHall,
+    Ticket,
+)
+from theatre.seat_map import decode, encode
+
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+def seats_url(performance_id):
+    return reverse("theatre:performance-seats", args=[performance_id])
+
+
+class SeatMapEncodingTests(TestCase):
+    def test_round_trip(self):
+        seats = [(1, 1), (2, 7), (3, 3)]
+        seat_map = encode(3, 7, seats)
+
+        self.assertEqual(len(seat_map), 3)
+        self.assertEqual(decode(3, 7, seat_map), seats)
+
+
+class OptimisticReservationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+        refresh_availability([self.performance.id])
+
+    def seat_map(self):
+        response = self.client.get(seats_url(self.performance.id))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def reserve(self, seats, optimistic=True):
+        payload = {
+            "tickets": [
+                {"row": row, "seat": seat, "performance": self.performance.id}
+                for row, seat in seats
+            ],
+            "optimistic": optimistic,
+        }
+        return self.client.post(RESERVATION_URL, payload, format="json")
+
+    def test_claim_moves_the_seat_map_on(self):
+        version = self.seat_map()["seat_version"]
+
+        response = self.reserve([(1, 1), (1, 2)])
+
+        self.assertEqual(response.status_code, 201)
+        seat_map = self.seat_map()
+        self.assertEqual(seat_map["seat_version"], version + 1)
+        self.assertEqual(seat_map["taken_places"], [(1, 1), (1, 2)])
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    def test_other_seats_are_booked_after_the_map_moved_on(self):
+        self.reserve([(1, 1)])
+
+        self.assertEqual(self.reserve([(2, 2)]).status_code, 201)
+
+    def test_taken_seats_are_reported_one_by_one(self):
+        self.reserve([(1, 1)])
+
+        response = self.reserve([(1, 2), (1, 1)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["tickets"],
+            [{}, {"seat": ["This seat is already taken."]}],
+        )
+        self.assertEqual(self.seat_map()["seat_version"], 1)
+
+    def test_other_seats_are_claimed_without_reading_the_map(self):
+        self.reserve([(5, 5)])
+
+        with mock.patch.object(
+            allocation, "_load_seat_maps", wraps=allocation._load_seat_maps
+        ) as loads:
+            response = self.reserve([(3, 3)])
+
+        self.assertEqual(response.status_code, 201)
+        loads.assert_not_called()
+        self.assertEqual(
+            self.seat_map()["taken_places"], [(3, 3), (5, 5)]
+        )
+
+    def test_stale_map_is_rebuilt(self):
+        # Bulk inserts bypass the signals that keep the map in step
+        Ticket.objects.bulk_create(
+            [Ticket(row=2, seat=2, performance=self.performance)]
+        )
+
+        response = self.reserve([(2, 2)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.seat_map()["taken_places"], [(2, 2)])
+
+    def test_locking_bookings_update_the_map(self):
+        self.reserve([(4, 1)], optimistic=False)
+
+        availability = PerformanceAvailability.objects.get(
+            performance=self.performance
+        )
+        self.assertEqual(availability.seat_version, 1)
+        self.assertEqual(self.seat_map()["taken_places"], [(4, 1)])
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall
+from theatre.tracing import parse_traceparent
+
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+TOKEN_URL = reverse("user:token_obtain_pair")
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class TracingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "spans.jsonl")
+        tracing = override_settings(
+            TRACING_ENABLED=True, TRACING_EXPORT_PATH=self.path
+        )
+        tracing.enable()
+        self.addCleanup(tracing.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.com", password="test_password"
+            )
+        )
+        Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+
+    def spans(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as export_file:
+            return [json.loads(line) for line in export_file]
+
+    def test_request_layers_are_traced(self):
+        response = self.client.get(PERFORMANCE_URL)
+
+        spans = self.spans()
+        names = {span["name"] for span in spans}
+        root = spans[0]
+        self.assertEqual(root["name"], "GET theatre:performance-list")
+        self.assertIsNone(root["parent_span_id"])
+        self.assertEqual(root["attributes"]["http.status_code"], 200)
+        for name in (
+            "check_permissions",
+            "get_queryset",
+            "sql",
+            "serialize PerformanceListSerializer",
+            "serialize PerformanceListSerializer.play",
+            "render",
+        ):
+            self.assertIn(name, names)
+        self.assertEqual({span["trace_id"] for span in spans}, {
+            root["trace_id"]
+        })
+        self.assertEqual(
+            parse_traceparent(response["traceparent"]),
+            (root["trace_id"], root["span_id"], True),
+        )
+
+    def test_token_view_is_traced(self):
+        response = APIClient().post(
+            TOKEN_URL,
+            {"email": "test@test.com", "password": "test_password"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        spans = self.spans()
+        self.assertEqual(spans[0]["name"], "POST user:token_obtain_pair")
+        self.assertIn("check_permissions", {span["name"] for span in spans})
+
+    def test_incoming_trace_context_is_continued(self):
+        self.client.get(
+            PERFORMANCE_URL,
+            HTTP_TRACEPARENT=f"00-{TRACE_ID}-{PARENT_ID}-01",
+        )
+
+        root = self.spans()[0]
+        self.assertEqual(root["trace_id"], TRACE_ID)
+        self.assertEqual(root["parent_span_id"], PARENT_ID)
+
+    def test_unsampled_trace_is_not_exported(self):
+        response = self.client.get(
+            PERFORMANCE_URL,
+            HTTP_TRACEPARENT=f"00-{TRACE_ID}-{PARENT_ID}-00",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.spans(), [])
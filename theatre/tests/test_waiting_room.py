@@ -0,0 +1,119 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall, WaitingRoom
+
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+def queue_url(performance_id):
+    return reverse("theatre:performance-queue", args=[performance_id])
+
+
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test_password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Hamlet"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Main", rows=5, seats_in_row=5
+            ),
+            show_time=timezone.now(),
+        )
+        WaitingRoom.objects.create(
+            performance=self.performance, admit_per_minute=1
+        )
+
+    def join(self, user=None):
+        client = self.client
+        if user is not None:
+            client = APIClient()
+            client.force_authenticate(user)
+        response = client.post(queue_url(self.performance.id))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def reserve(self, token=None):
+        headers = {"X-Queue-Token": token} if token else {}
+        return self.client.post(
+            RESERVATION_URL,
+            {
+                "tickets": [
+                    {"row": 1, "seat": 1, "performance": self.performance.id}
+                ]
+            },
+            format="json",
+            headers=headers,
+        )
+
+    def test_clients_are_admitted_in_turn(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="test_password"
+        )
+        first = self.join()
+        second = self.join(other)
+
+        self.assertTrue(first["admitted"])
+        self.assertFalse(second["admitted"])
+        self.assertEqual(second["position"], 1)
+        self.assertEqual(second["eta_seconds"], 60)
+        # Joining again keeps the place in the queue
+        self.assertEqual(self.join()["token"], first["token"])
+
+    def test_polling_reads_only_the_token(self):
+        token = self.join()["token"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                queue_url(self.performance.id),
+                headers={"X-Queue-Token": token},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["admitted"])
+
+    def test_booking_requires_an_admitted_token(self):
+        self.join(
+            get_user_model().objects.create_user(
+                email="other@test.com", password="test_password"
+            )
+        )
+        token = self.join()["token"]
+
+        self.assertEqual(self.reserve().status_code, 403)
+        waiting = self.reserve(token)
+        self.assertEqual(waiting.status_code, 429)
+        self.assertEqual(waiting["Retry-After"], "60")
+
+        later = time.time() + 61
+        with mock.patch("theatre.waiting_room.time.time", lambda: later):
+            self.assertEqual(self.reserve(token).status_code, 201)
+
+    def test_tokens_of_other_users_are_rejected(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="test_password"
+        )
+        token = self.join(other)["token"]
+
+        self.assertEqual(self.reserve(token).status_code, 403)
+
+    def test_performances_without_a_room_are_not_gated(self):
+        WaitingRoom.objects.all().delete()
+
+        self.assertEqual(self.reserve().status_code, 201)
+        response = self.client.post(queue_url(self.performance.id))
+        self.assertEqual(response.status_code, 404)
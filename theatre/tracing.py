@@ -0,0 +1,302 @@
+import functools
+import json
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer
+
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_RE = re.compile(
+    r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$"
+)
+
+_current = ContextVar("theatre_trace", default=None)
+
+
+class Trace:
+    def __init__(self, trace_id, max_spans):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.start = time.time_ns()
+        self.end = None
+        trace.spans.append(self)
+
+    def finish(self):
+        self.end = time.time_ns()
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start,
+            "end_time_unix_nano": self.end,
+            "duration_ms": (self.end - self.start) / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def parse_traceparent(value):
+    """Return (trace_id, parent_id, sampled) of a W3C traceparent header"""
+    match = TRACEPARENT_RE.match((value or "").strip().lower())
+    if not match:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or set(trace_id) == {"0"} or set(parent_id) == {"0"}:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def format_traceparent(trace_id, span_id):
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def is_tracing():
+    return _current.get() is not None
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a child span of the current one; a no-op outside a trace"""
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+
+    trace, parent = current
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped += 1
+        yield None
+        return
+
+    child = Span(trace, name, parent.span_id, attributes)
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as error:
+        child.status = "error"
+        child.attributes["error.type"] = type(error).__name__
+        raise
+    finally:
+        _current.reset(token)
+        child.finish()
+
+
+def traced(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+
+    wrapper.traced = True
+    return wrapper
+
+
+def _trace_fields(serializer, path):
+    for field_name, field in serializer.fields.items():
+        if not isinstance(
+            field, (BaseSerializer, RelatedField, ManyRelatedField)
+        ):
+            continue
+        field_path = f"{path}.{field_name}"
+        field.to_representation = traced(
+            f"serialize {field_path}", field.to_representation
+        )
+        nested = getattr(field, "child", field)
+        if hasattr(nested, "fields"):
+            _trace_fields(nested, field_path)
+
+
+def trace_serializer(serializer):
+    """Wrap the serializer and its nested fields in spans"""
+    if getattr(serializer.to_representation, "traced", False):
+        return serializer
+    root = getattr(serializer, "child", serializer)
+    name = type(root).__name__
+    serializer.to_representation = traced(
+        f"serialize {name}", serializer.to_representation
+    )
+    _trace_fields(root, name)
+    return serializer
+
+
+def _traced_get_serializer(get_serializer):
+    @functools.wraps(get_serializer)
+    def wrapper(self, *args, **kwargs):
+        serializer = get_serializer(self, *args, **kwargs)
+        if is_tracing():
+            trace_serializer(serializer)
+        return serializer
+
+    wrapper.traced = True
+    return wrapper
+
+
+class TracedRenderer:
+    """Proxy that records the time spent in renderer.render()"""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def __getattr__(self, name):
+        return getattr(self.renderer, name)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span("render", renderer=type(self.renderer).__name__):
+            return self.renderer.render(
+                data, accepted_media_type, renderer_context
+            )
+
+
+class TracedViewMixin:
+    """
+    Open spans for authentication, permissions, get_queryset, nested
+    serializer fields and rendering of a DRF view
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Views usually override get_queryset without calling super(),
+        # and plain ViewSets have neither method
+        get_queryset = getattr(cls, "get_queryset", None)
+        if get_queryset and not getattr(get_queryset, "traced", False):
+            cls.get_queryset = traced("get_queryset", get_queryset)
+        get_serializer = getattr(cls, "get_serializer", None)
+        if get_serializer and not getattr(get_serializer, "traced", False):
+            cls.get_serializer = _traced_get_serializer(get_serializer)
+
+    def perform_authentication(self, request):
+        with span("authenticate"):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with span("check_permissions"):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with span("check_object_permissions"):
+            super().check_object_permissions(request, obj)
+
+    def perform_content_negotiation(self, request, force=False):
+        renderer, media_type = super().perform_content_negotiation(
+            request, force
+        )
+        if is_tracing():
+            renderer = TracedRenderer(renderer)
+        return renderer, media_type
+
+
+def _trace_sql(execute, sql, params, many, context):
+    with span(
+        "sql",
+        **{
+            "db.system": context["connection"].vendor,
+            "db.alias": context["connection"].alias,
+            "db.statement": sql[:2000],
+        },
+    ):
+        return execute(sql, params, many, context)
+
+
+class SpanExporter:
+    """Write finished spans as JSON lines to a file, or stdout for "-" """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(
+            json.dumps(span.to_dict(), default=str) + "\n" for span in spans
+        )
+        with self.lock:
+            if self.path == "-":
+                sys.stdout.write(lines)
+                sys.stdout.flush()
+                return
+            with open(self.path, "a") as export_file:
+                export_file.write(lines)
+
+
+class TracingMiddleware:
+    """
+    Trace a request when TRACING_ENABLED is set. An incoming W3C
+    traceparent header continues the caller's trace, and the response
+    carries the traceparent of the request span.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "TRACING_ENABLED", False)
+        self.max_spans = getattr(settings, "TRACING_MAX_SPANS", 1000)
+        self.exporter = SpanExporter(
+            getattr(settings, "TRACING_EXPORT_PATH", "-")
+        )
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        parent = parse_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        if parent is None:
+            trace_id, parent_id = secrets.token_hex(16), None
+        else:
+            trace_id, parent_id, sampled = parent
+            if not sampled:
+                return self.get_response(request)
+
+        trace = Trace(trace_id, self.max_spans)
+        root = Span(
+            trace,
+            f"{request.method} {request.path}",
+            parent_id,
+            {"http.method": request.method, "http.target": request.path},
+        )
+        token = _current.set((trace, root))
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_trace_sql))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            root.finish()
+
+        match = getattr(request, "resolver_match", None)
+        if match:
+            root.name = f"{request.method} {match.view_name}"
+            root.attributes["http.route"] = match.route
+        root.attributes["http.status_code"] = response.status_code
+        if response.status_code >= 500:
+            root.status = "error"
+        if trace.dropped:
+            root.attributes["spans.dropped"] = trace.dropped
+
+        self.exporter.export(trace.spans)
+        response[TRACEPARENT_HEADER] = format_traceparent(
+            trace_id, root.span_id
+        )
+        return response
@@ -1,20 +1,63 @@
-from django.db.models import F, Count
+from datetime import timedelta
+
+from django.db.models import F, Count, Exists, OuterRef, Prefetch
+from django.http import Http404
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAdminUser
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import (
+    JWTStatelessUserAuthentication,
+)
 
+from theatre.allocation import allocate_seats
+from theatre.archive import archived_ticket_count
+from theatre.catalog_cache import CATALOG, SEATS, CatalogCacheMixin
+from theatre.check_in import CHECK_INS
+from theatre.compact import (
+    COMPACT_FORMAT_PARAMETER,
+    CompactListMixin,
+    performance_tables,
+    play_tables,
+)
+from theatre.fieldsets import SparseFieldsViewMixin, field_selection_schema
+from theatre.idempotency import IDEMPOTENCY_HEADER, idempotent
+from theatre.importers import (
+    guess_format,
+    import_catalog,
+    import_performances,
+    read_rows,
+)
+from theatre.layouts import performance_layout
+from theatre.metrics import record_reservation
+from theatre.object_cache import CachedObjectMixin, TwoTierCache
 from theatre.models import (
+    ArchivedTicket,
     TheatreHall,
     Reservation,
     Actor,
     Genre,
     Play,
     Performance,
+    PerformanceAvailability,
+    Ticket,
 )
+from theatre.pagination import EstimatedCountPagination
 from theatre.permissions import IsAdminOrIfAuthenticatedReadOnly
+from theatre.seat_map import decode
+from theatre.tracing import TracedViewMixin
+from theatre.waiting_room import (
+    QUEUE_TOKEN_HEADER,
+    QueueRateThrottle,
+    admission_rate,
+    check_admission,
+    join,
+    queue_status,
+    read_token,
+)
 
 from theatre.serializers import (
     TheatreHallSerializer,
@@ -30,20 +73,45 @@ from theatre.serializers import (
     PlayListSerializer,
     PlayDetailSerializer,
     PlayImageSerializer,
+    SeatAllocationSerializer,
+    BulkImportSerializer,
+    BulkImportResultSerializer,
+    CheckInSerializer,
+    CheckInResultSerializer,
+    CatalogImportResultSerializer,
+    PerformanceCompactSerializer,
+    PlayCompactSerializer,
+    QueueStatusSerializer,
+    SeatMapSerializer,
 )
 
 
-class Pagination(PageNumberPagination):
-    page_size = 10
-    max_page_size = 100
-
-
-class ActorViewSet(viewsets.ModelViewSet):
+@field_selection_schema
+class ActorViewSet(
+    CatalogCacheMixin,
+    SparseFieldsViewMixin,
+    TracedViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Actor.objects.all()
     serializer_class = ActorSerializer
-    pagination_class = Pagination
+    pagination_class = EstimatedCountPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
+    def get_queryset(self):
+        queryset = self.queryset
+        if self.action in ("list", "retrieve"):
+            queryset = self.prefetch_rendered(
+                queryset,
+                (
+                    ("plays_title", "actor_plays"),
+                    ("actor_plays", "actor_plays"),
+                    ("actor_plays.actor", "actor_plays__actor"),
+                    ("actor_plays.genre", "actor_plays__genre"),
+                ),
+            )
+        return queryset
+
     def get_serializer_class(self):
         if self.action == "list":
             return ActorListSerializer
@@ -52,7 +120,7 @@ class ActorViewSet(viewsets.ModelViewSet):
         return self.serializer_class
 
 
-class GenreViewSet(viewsets.ViewSet):
+class GenreViewSet(TracedViewMixin, viewsets.ViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
@@ -70,10 +138,20 @@ class GenreViewSet(viewsets.ViewSet):
         return Response(serializer.errors, status=400)
 
 
-class PlayViewSet(viewsets.ModelViewSet):
+@field_selection_schema
+class PlayViewSet(
+    CatalogCacheMixin,
+    CachedObjectMixin,
+    CompactListMixin,
+    SparseFieldsViewMixin,
+    TracedViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Play.objects.all()
     serializer_class = PlaySerializer
-    pagination_class = Pagination
+    pagination_class = EstimatedCountPagination
+    object_cache = TwoTierCache("play")
+    lookup_tables = staticmethod(play_tables)
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     @staticmethod
@@ -101,11 +179,21 @@ class PlayViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(genre__id__in=genres_ids)
 
         if self.action in ("retrieve", "list"):
-            queryset = queryset.prefetch_related("actor", "genre")
+            queryset = self.prefetch_rendered(
+                queryset,
+                (
+                    ("actor", "actor"),
+                    ("genre", "genre"),
+                    ("actor.plays_title", "actor__actor_plays"),
+                ),
+            )
 
         return queryset.distinct()
 
     def get_serializer_class(self):
+        if self.is_compact():
+            return PlayCompactSerializer
+
         if self.action == "list":
             return PlayListSerializer
 
@@ -115,6 +203,9 @@ class PlayViewSet(viewsets.ModelViewSet):
         if self.action == "upload_image":
             return PlayImageSerializer
 
+        if self.action == "bulk_import":
+            return BulkImportSerializer
+
         return self.serializer_class
 
     @action(
@@ -134,6 +225,30 @@ class PlayViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(responses={201: CatalogImportResultSerializer})
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_import(self, request):
+        """Import plays with their actors and genres from a file"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["file"]
+        fmt = serializer.validated_data.get("format") or guess_format(
+            upload.name
+        )
+
+        result = import_catalog(
+            read_rows(upload.file, fmt),
+            partial=serializer.validated_data["partial"],
+        )
+        if result["errors"] and not serializer.validated_data["partial"]:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -141,21 +256,43 @@ class PlayViewSet(viewsets.ModelViewSet):
                 description="Filter by title",
                 type=str,
             ),
+            COMPACT_FORMAT_PARAMETER,
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
 
-class TheatreHallViewSet(viewsets.ModelViewSet):
+@field_selection_schema
+class TheatreHallViewSet(
+    CatalogCacheMixin,
+    CachedObjectMixin,
+    SparseFieldsViewMixin,
+    TracedViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = TheatreHall.objects.all()
     serializer_class = TheatreHallSerializer
+    object_cache = TwoTierCache("theatre_hall")
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
 
-class PerformanceViewSet(viewsets.ModelViewSet):
+@field_selection_schema
+class PerformanceViewSet(
+    CatalogCacheMixin,
+    CachedObjectMixin,
+    CompactListMixin,
+    SparseFieldsViewMixin,
+    TracedViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Performance.objects.all()
     serializer_class = PerformanceSerializer
+    cache_scopes = (CATALOG, SEATS)
+    object_cache = TwoTierCache("performance")
+    lookup_tables = staticmethod(performance_tables)
+    # Taken seats change with every booking
+    live_prefetches = (("taken_places", "tickets"),)
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     def get_queryset(self):
@@ -169,46 +306,416 @@ class PerformanceViewSet(viewsets.ModelViewSet):
             ]
             queryset = queryset.filter(play__id__in=play_ids)
 
+        queryset = self._filter_availability(queryset)
+
         if self.action in ("retrieve", "list"):
-            queryset = queryset.select_related("play", "theatre_hall").annotate(
+            queryset = self._select_rendered(queryset)
+
+        return queryset
+
+    def _select_rendered(self, queryset):
+        """Join, prefetch and annotate only what the response renders"""
+        if self.expands("play") or self.renders("play_image"):
+            queryset = queryset.select_related("play")
+        if self.renders("theatre_hall_name"):
+            queryset = queryset.select_related("theatre_hall")
+        if self.renders("tickets_available"):
+            queryset = queryset.annotate(
                 tickets_available=(
                     F("theatre_hall__rows") * F("theatre_hall__seats_in_row")
-                    - Count("tickets")
+                    - Count("tickets", distinct=True)
+                    - archived_ticket_count()
                 )
             )
+        return self.prefetch_rendered(
+            queryset,
+            (
+                ("play.actor", "play__actor"),
+                ("play.genre", "play__genre"),
+                ("play.actor.plays_title", "play__actor__actor_plays"),
+                ("taken_places", "tickets"),
+            ),
+        )
+
+    @staticmethod
+    def _count_param(name, value, maximum=2 ** 31 - 1):
+        """Whole number of a query parameter, 400 when out of range"""
+        try:
+            number = int(value)
+        except ValueError:
+            number = -1
+        if not 0 <= number <= maximum:
+            raise ValidationError(
+                {name: [f"A whole number from 0 to {maximum} is required."]}
+            )
+        return number
+
+    def _filter_availability(self, queryset):
+        """Filter by the precomputed availability summary"""
+        params = self.request.query_params
+        genre = params.get("genre")
+        days = params.get("days")
+        free_seats = params.get("free_seats")
+        adjacent_seats = params.get("adjacent_seats")
+
+        if genre:
+            genre_ids = [
+                self._count_param("genre", genre_id)
+                for genre_id in genre.split(",")
+            ]
+            queryset = queryset.filter(play__genre__id__in=genre_ids)
+
+        if days:
+            now = timezone.now()
+            # Keeps the upper bound within the datetime range
+            days = self._count_param("days", days, maximum=36500)
+            queryset = queryset.filter(
+                availability__show_time__gte=now,
+                availability__show_time__lt=now + timedelta(days=days),
+            )
+
+        if free_seats:
+            queryset = queryset.filter(
+                availability__free_seats__gte=self._count_param(
+                    "free_seats", free_seats
+                )
+            )
+
+        if adjacent_seats:
+            queryset = queryset.filter(
+                availability__max_free_run__gte=self._count_param(
+                    "adjacent_seats", adjacent_seats
+                )
+            )
+
+        if genre:
+            queryset = queryset.distinct()
 
         return queryset
 
     def get_serializer_class(self):
+        if self.is_compact():
+            return PerformanceCompactSerializer
+
         if self.action == "list":
-            return self.serializer_class
+            return PerformanceListSerializer
 
         if self.action == "retrieve":
-            return self.serializer_class
+            return PerformanceDetailSerializer
+
+        if self.action == "allocate":
+            return SeatAllocationSerializer
+
+        if self.action == "bulk_import":
+            return BulkImportSerializer
+
+        return self.serializer_class
+
+    @extend_schema(responses={201: BulkImportResultSerializer})
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_import(self, request):
+        """Import a season schedule from a CSV or NDJSON file"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["file"]
+        fmt = serializer.validated_data.get("format") or guess_format(
+            upload.name
+        )
+
+        result = import_performances(
+            read_rows(upload.file, fmt),
+            partial=serializer.validated_data["partial"],
+        )
+        if result["errors"] and not result["created"]:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.action == "allocate":
+            record_reservation(response)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    @extend_schema(responses={201: ReservationSerializer})
+    @action(
+        methods=["POST"],
+        detail=True,
+        permission_classes=[IsAuthenticated],
+    )
+    def allocate(self, request, pk=None):
+        """Reserve the best available adjacent seats for a group"""
+        performance = self.get_object()
+        check_admission(request, [performance.id])
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        reservation = allocate_seats(
+            performance.id, request.user, **serializer.validated_data
+        )
+        if reservation is None:
+            return Response(
+                {"detail": "Not enough free seats for this request."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            ReservationSerializer(reservation).data,
+            status=status.HTTP_201_CREATED,
+        )
 
-        return self
+    @extend_schema(
+        request=CheckInSerializer,
+        responses={200: CheckInResultSerializer(many=True)},
+    )
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="check-in",
+        permission_classes=[IsAdminUser],
+    )
+    def check_in(self, request, pk=None):
+        """
+        Check in a batch of scanned ticket tokens. Tokens are verified by
+        their signature and duplicates caught in memory, so scans don't
+        wait for the database.
+        """
+        try:
+            performance_id = int(pk)
+        except ValueError:
+            raise Http404
+        serializer = CheckInSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = CHECK_INS.check_in(
+            performance_id, serializer.validated_data["tokens"]
+        )
+        return Response([
+            {
+                "token": token,
+                "status": outcome,
+                "ticket": claims[0] if claims else None,
+                "row": claims[2] if claims else None,
+                "seat": claims[3] if claims else None,
+            }
+            for token, outcome, claims in results
+        ])
+
+    @extend_schema(responses={200: SeatMapSerializer})
+    @action(methods=["GET"], detail=True)
+    def seats(self, request, pk=None):
+        """
+        Taken seats and the version of the seat map, which tells polling
+        clients whether they changed, read from a single row
+        """
+        try:
+            performance_id = int(pk)
+        except ValueError:
+            raise Http404
+        availability = PerformanceAvailability.objects.filter(
+            performance_id=performance_id
+        ).values_list("seat_version", "seat_map").first()
+        if availability is None:
+            raise Http404
+        version, seat_map = availability
+        return Response({
+            "seat_version": version,
+            "taken_places": decode(
+                *performance_layout(performance_id), bytes(seat_map)
+            ),
+        })
+
+    @extend_schema(
+        request=None,
+        responses={200: QueueStatusSerializer},
+        parameters=[
+            OpenApiParameter(
+                name=QUEUE_TOKEN_HEADER,
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="Token returned when joining the queue",
+            ),
+        ],
+    )
+    @action(
+        methods=["GET", "POST"],
+        detail=True,
+        permission_classes=[IsAuthenticated],
+        authentication_classes=[JWTStatelessUserAuthentication],
+        throttle_classes=[QueueRateThrottle],
+    )
+    def queue(self, request, pk=None):
+        """
+        Join the waiting room of a performance (POST) or poll the
+        position of a queue token (GET)
+        """
+        try:
+            performance_id = int(pk)
+        except ValueError:
+            raise Http404
+        rate = admission_rate(performance_id)
+        if rate is None:
+            raise Http404("This performance has no waiting room.")
+
+        token = None
+        if request.method == "POST":
+            token = join(performance_id, request.user.id, rate)
+        claims = read_token(
+            token or request.headers.get(QUEUE_TOKEN_HEADER, "")
+        )
+        if (
+            claims is None
+            or claims["performance"] != performance_id
+            or claims["user"] != request.user.id
+        ):
+            raise Http404("Not in the queue of this performance.")
+
+        data = queue_status(claims)
+        if token:
+            data["token"] = token
+        headers = {}
+        if not data["admitted"]:
+            headers["Retry-After"] = str(min(data["eta_seconds"], 60))
+        return Response(data, headers=headers)
 
     @extend_schema(
         parameters=[
             OpenApiParameter(name="play", type=int, description="Filter by play id"),
+            OpenApiParameter(
+                name="genre", type=int, description="Filter by genre id"
+            ),
+            OpenApiParameter(
+                name="days",
+                type=int,
+                description="Only performances within the next N days",
+            ),
+            OpenApiParameter(
+                name="free_seats",
+                type=int,
+                description="Minimum number of free seats",
+            ),
+            OpenApiParameter(
+                name="adjacent_seats",
+                type=int,
+                description="Minimum number of adjacent free seats in a row",
+            ),
+            COMPACT_FORMAT_PARAMETER,
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+@field_selection_schema
+class ReservationViewSet(
+    SparseFieldsViewMixin,
+    TracedViewMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
-    pagination_class = Pagination
-    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    pagination_class = EstimatedCountPagination
+    permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        if self.action == "list":
-            return Reservation.objects.select_related("user").filter(
-                user=self.request.user
+        queryset = self.queryset.filter(user=self.request.user)
+
+        when = self.request.query_params.get("when")
+        if when in ("upcoming", "past"):
+            lookup = "gte" if when == "upcoming" else "lt"
+            # The user filter keeps the subqueries to the user's own
+            # tickets when the OR below makes Postgres hash them whole
+            condition = Exists(
+                Ticket.objects.filter(
+                    reservation=OuterRef("pk"),
+                    reservation__user=self.request.user,
+                    **{f"performance__show_time__{lookup}": timezone.now()}
+                )
+            )
+            if when == "past":
+                condition |= Exists(
+                    ArchivedTicket.objects.filter(
+                        reservation=OuterRef("pk"),
+                        reservation__user=self.request.user,
+                    )
+                )
+            queryset = queryset.filter(condition)
+
+        if self.action in ("list", "retrieve") and self.renders("tickets"):
+            sources = [("tickets", Ticket)]
+            # Upcoming reservations have no archived tickets to look for
+            if when != "upcoming":
+                sources.append(("archived_tickets", ArchivedTicket))
+            for lookup, model in sources:
+                tickets = model.objects.all()
+                if self.renders("tickets.show_time"):
+                    tickets = tickets.select_related("performance")
+                if self.renders("tickets.theatre_hall_name"):
+                    tickets = tickets.select_related(
+                        "performance__theatre_hall"
+                    )
+                queryset = queryset.prefetch_related(
+                    Prefetch(lookup, queryset=tickets)
+                )
+            if self.renders("tickets.user_name"):
+                queryset = queryset.select_related("user")
+
+        return queryset.order_by("-created_at")
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="when",
+                type=str,
+                enum=["upcoming", "past"],
+                description="Only reservations with upcoming or past "
+                "performances",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.action == "create":
+            record_reservation(response)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name=IDEMPOTENCY_HEADER,
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="Retries with the same key replay the first "
+                "response instead of booking again",
+            ),
+        ]
+    )
+    def create(self, request, *args, **kwargs):
+        def book():
+            check_admission(request, self._requested_performances())
+            return super(ReservationViewSet, self).create(
+                request, *args, **kwargs
             )
-        return self.queryset
+
+        return idempotent(request, book)
+
+    def _requested_performances(self):
+        tickets = self.request.data.get("tickets")
+        performance_ids = []
+        for ticket in tickets if isinstance(tickets, list) else []:
+            try:
+                performance_ids.append(int(ticket["performance"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return performance_ids
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -0,0 +1,173 @@
+import math
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from rest_framework.exceptions import PermissionDenied, Throttled
+from rest_framework.throttling import UserRateThrottle
+
+from theatre.catalog_cache import WAITING_ROOMS
+from theatre.models import WaitingRoom
+from theatre.object_cache import TwoTierCache
+
+
+QUEUE_TOKEN_HEADER = "X-Queue-Token"
+TOKEN_SALT = "theatre.waiting_room"
+
+ROOMS = TwoTierCache("waiting_room", scopes=(WAITING_ROOMS,))
+
+
+class QueueRateThrottle(UserRateThrottle):
+    """Bounds how often a client may poll its queue position"""
+
+    scope = "queue"
+
+
+def active_rooms():
+    """Admissions per minute of every active waiting room"""
+    # Rooms are open for a handful of on-sales at a time, so one entry
+    # holds them all and checking a booking never costs a query per
+    # performance
+    return ROOMS.get_or_set(
+        "active",
+        lambda: dict(
+            WaitingRoom.objects.filter(is_active=True).values_list(
+                "performance_id", "admit_per_minute"
+            )
+        ),
+    )
+
+
+def admission_rate(performance_id):
+    """Admissions per minute of an active waiting room, or None"""
+    return active_rooms().get(performance_id)
+
+
+@contextmanager
+def _room_lock(performance_id):
+    """Serialize slot assignment through the shared cache"""
+    key = f"theatre:queue:{performance_id}:lock"
+    deadline = time.monotonic() + 1
+    locked = cache.add(key, 1, 5)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.005)
+        locked = cache.add(key, 1, 5)
+    try:
+        # Past the deadline two clients may share a slot, which only
+        # admits one of them a little early
+        yield
+    finally:
+        if locked:
+            cache.delete(key)
+
+
+def _next_slot(performance_id, interval):
+    key = f"theatre:queue:{performance_id}:last"
+    with _room_lock(performance_id):
+        now = time.time()
+        last = cache.get(key)
+        admit_at = now if last is None else max(now, last + interval)
+        cache.set(
+            key,
+            admit_at,
+            math.ceil(admit_at - now) + settings.WAITING_ROOM_ADMISSION_WINDOW,
+        )
+    return admit_at
+
+
+def join(performance_id, user_id, admit_per_minute):
+    """
+    Queue token of a user for a performance. Clients are admitted one
+    per 60 / admit_per_minute seconds in the order they joined; joining
+    again returns the token the user already holds.
+    """
+    user_key = f"theatre:queue:{performance_id}:user:{user_id}"
+    token = cache.get(user_key)
+    if token is not None:
+        return token
+
+    interval = 60 / admit_per_minute
+    admit_at = _next_slot(performance_id, interval)
+    token = signing.dumps(
+        {
+            "performance": performance_id,
+            "user": user_id,
+            "admit_at": admit_at,
+            "interval": interval,
+        },
+        salt=TOKEN_SALT,
+    )
+    cache.set(
+        user_key,
+        token,
+        math.ceil(admit_at - time.time())
+        + settings.WAITING_ROOM_ADMISSION_WINDOW,
+    )
+    return token
+
+
+def read_token(token):
+    """Claims of a queue token, or None when it was not issued by us"""
+    try:
+        return signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+
+
+def queue_status(claims):
+    """Position and ETA, computed from the token alone"""
+    wait = max(0.0, claims["admit_at"] - time.time())
+    return {
+        "performance": claims["performance"],
+        "admitted": wait == 0,
+        "position": math.ceil(wait / claims["interval"]),
+        "eta_seconds": math.ceil(wait),
+        "expires_in": math.ceil(
+            claims["admit_at"]
+            + settings.WAITING_ROOM_ADMISSION_WINDOW
+            - time.time()
+        ),
+    }
+
+
+def check_admission(request, performance_ids):
+    """
+    Let a booking through only with an admitted queue token for every
+    performance behind an active waiting room
+    """
+    rooms = active_rooms()
+    gated = [
+        performance_id
+        for performance_id in sorted(set(performance_ids))
+        if performance_id in rooms
+    ]
+    if not gated:
+        return
+
+    tokens = {}
+    for token in request.headers.get(QUEUE_TOKEN_HEADER, "").split(","):
+        claims = read_token(token.strip())
+        if claims is not None and claims["user"] == request.user.id:
+            tokens[claims["performance"]] = claims
+
+    for performance_id in gated:
+        claims = tokens.get(performance_id)
+        if claims is None:
+            raise PermissionDenied(
+                f"Performance {performance_id} is sold through a waiting "
+                f"room. Join its queue and send the token in "
+                f"{QUEUE_TOKEN_HEADER}."
+            )
+        status = queue_status(claims)
+        if not status["admitted"]:
+            raise Throttled(
+                wait=status["eta_seconds"],
+                detail=f"Queue position {status['position']}, not "
+                f"admitted yet.",
+            )
+        if status["expires_in"] <= 0:
+            raise PermissionDenied(
+                "The queue token has expired, join the queue again."
+            )
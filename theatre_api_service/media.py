@@ -0,0 +1,121 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+UNSATISFIABLE = object()
+
+
+class FileRange:
+    """
+    File object that stops after length bytes. It keeps fileno() so
+    gunicorn can still sendfile() the range from the current offset.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of a single byte range, None to send the whole
+    file, or UNSATISFIABLE
+    """
+    match = RANGE_RE.match((header or "").replace(" ", ""))
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return UNSATISFIABLE
+    return start, end
+
+
+def serve_media(request, path):
+    """Serve an uploaded file with Range support or hand it to nginx"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type = (
+        mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    )
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = (
+            f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(path)}"
+        )
+        return response
+
+    stat = os.stat(full_path)
+    if not was_modified_since(
+        request.headers.get("If-Modified-Since"), stat.st_mtime
+    ):
+        return HttpResponseNotModified()
+    last_modified = http_date(stat.st_mtime)
+
+    byte_range = None
+    if request.headers.get("If-Range", last_modified) == last_modified:
+        byte_range = parse_range(request.headers.get("Range"), stat.st_size)
+
+    if byte_range is UNSATISFIABLE:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+    elif byte_range is None:
+        response = FileResponse(
+            open(full_path, "rb"), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        file = open(full_path, "rb")
+        file.seek(start)
+        response = FileResponse(
+            FileRange(file, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+    response["Last-Modified"] = last_modified
+    response["Accept-Ranges"] = "bytes"
+    return response
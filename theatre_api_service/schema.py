@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import drf_spectacular
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+from theatre.compression import compress_all
+
+
+_lock = threading.Lock()
+_cache = {}
+
+SKIPPED_DIRECTORIES = {"tests", "migrations", "__pycache__"}
+
+
+def code_fingerprint():
+    """Hash of everything the generated schema depends on"""
+    digest = hashlib.sha256()
+    digest.update(
+        f"{drf_spectacular.__version__} {rest_framework.VERSION}".encode()
+    )
+    digest.update(repr(settings.SPECTACULAR_SETTINGS).encode())
+
+    base = Path(settings.BASE_DIR)
+    roots = {
+        Path(app_config.path)
+        for app_config in apps.get_app_configs()
+        if Path(app_config.path).is_relative_to(base)
+    }
+    roots.add(base / settings.ROOT_URLCONF.split(".")[0])
+    for root in sorted(roots):
+        for path in sorted(root.rglob("*.py")):
+            if SKIPPED_DIRECTORIES & set(path.relative_to(root).parts):
+                continue
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def generate_schema():
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def _read(path, fingerprint):
+    try:
+        with open(path) as schema_file:
+            stored = json.load(schema_file)
+    except (OSError, ValueError):
+        return None
+    if stored.get("fingerprint") != fingerprint:
+        return None
+    return stored["schema"]
+
+
+def _write(path, fingerprint, schema):
+    temporary = Path(f"{path}.tmp")
+    try:
+        temporary.write_text(
+            json.dumps({"fingerprint": fingerprint, "schema": schema})
+        )
+        temporary.replace(path)
+    except OSError:
+        # A read-only image still serves the schema from memory
+        return False
+    return True
+
+
+def build_schema():
+    """Generate the schema and store it in SCHEMA_CACHE_PATH"""
+    fingerprint = code_fingerprint()
+    schema = generate_schema()
+    _write(settings.SCHEMA_CACHE_PATH, fingerprint, schema)
+    with _lock:
+        _cache.clear()
+        _cache.update(
+            fingerprint=fingerprint, schema=schema, rendered={}, compressed={}
+        )
+    return fingerprint
+
+
+def get_schema():
+    """
+    Return the cached schema, loading it from disk when the stored
+    fingerprint matches the code and generating it otherwise
+    """
+    with _lock:
+        if not _cache:
+            fingerprint = code_fingerprint()
+            path = settings.SCHEMA_CACHE_PATH
+            schema = _read(path, fingerprint)
+            if schema is None:
+                schema = generate_schema()
+                _write(path, fingerprint, schema)
+            _cache.update(
+                fingerprint=fingerprint,
+                schema=schema,
+                rendered={},
+                compressed={},
+            )
+        return _cache
+
+
+def clear_schema_cache():
+    with _lock:
+        _cache.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """
+    Serve the precomputed public schema with an ETag. Requests for a
+    specific version or language still generate the schema.
+    """
+
+    def _get_schema_response(self, request):
+        version = (
+            self.api_version
+            or request.version
+            or self._get_version_parameter(request)
+        )
+        if not self.serve_public or version or request.GET.get("lang"):
+            return super()._get_schema_response(request)
+
+        cached = get_schema()
+        renderer = request.accepted_renderer
+        etag = f'"{cached["fingerprint"][:32]}-{renderer.format}"'
+        # Compressed responses carry the weak form of the same ETag
+        if etag in {
+            tag.removeprefix("W/")
+            for tag in parse_etags(request.headers.get("If-None-Match", ""))
+        }:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        content = cached["rendered"].get(renderer.format)
+        if content is None:
+            content = renderer.render(cached["schema"], renderer.media_type)
+            cached["rendered"][renderer.format] = content
+            cached["compressed"][renderer.format] = compress_all(content)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        response = HttpResponse(content, content_type=content_type)
+        response.precompressed = cached["compressed"].get(renderer.format)
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        response["Content-Disposition"] = (
+            f'inline; filename="{self._get_filename(request, version)}"'
+        )
+        return response
@@ -23,9 +23,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get("SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "") == "1"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host
+    for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",")
+    if host
+]
 
 
 # Application definition
@@ -44,11 +48,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "theatre.metrics.MetricsMiddleware",
+    "theatre.tracing.TracingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "theatre.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "theatre.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -123,6 +132,78 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = os.environ.get("STATIC_ROOT", str(BASE_DIR / "staticfiles"))
+
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", str(BASE_DIR / "media"))
+# Internal nginx location for media files. When set, Django only checks
+# the path and nginx sends the file with X-Accel-Redirect.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("MEDIA_ACCEL_REDIRECT_PREFIX")
+
+# collectstatic writes hashed, gzip and brotli compressed copies which
+# WhiteNoise serves with far-future cache headers
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+WHITENOISE_MANIFEST_STRICT = False
+
+# Every worker process has to share the cache so that catalog changes
+# reach all of them, e.g. DatabaseCache after createcachetable
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# Rendered catalog responses and their compressed bodies are cached for
+# this many seconds, 0 disables the cache
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", 300))
+
+# Hall layouts kept in every process, and how often a process checks
+# whether another one changed a hall
+HALL_LAYOUT_CACHE_SIZE = 10000
+HALL_LAYOUT_VERSION_CHECK_INTERVAL = 5
+
+# Performances, plays and halls looked up by id are cached for this
+# many seconds, in process and in the shared cache. Processes reread
+# the catalog version every OBJECT_CACHE_VERSION_CHECK_INTERVAL seconds.
+OBJECT_CACHE_TIMEOUT = 300
+OBJECT_CACHE_LOCAL_SIZE = 1000
+OBJECT_CACHE_VERSION_CHECK_INTERVAL = 1
+# Larger values refresh entries earlier before they expire
+OBJECT_CACHE_BETA = 1.0
+# How long a request waits for another one computing the same entry
+OBJECT_CACHE_WAIT = 2
+OBJECT_CACHE_LOCK_TIMEOUT = 10
+
+# Attempts of an optimistic booking whose seat maps turn out to be stale
+SEAT_CLAIM_RETRIES = 5
+
+# Door check-ins are written once this many are pending, or by a timer
+# CHECK_IN_FLUSH_INTERVAL seconds after the first of them
+CHECK_IN_BATCH_SIZE = 200
+CHECK_IN_FLUSH_INTERVAL = 2
+# Failed writes of a batch after which its check-ins are written one by
+# one, dropping those that cannot be written
+CHECK_IN_FLUSH_RETRIES = 3
+# Performances whose scanned tickets a process keeps in memory
+CHECK_IN_CACHE_SIZE = 100
+
+# Seconds an admitted waiting room token stays valid for booking
+WAITING_ROOM_ADMISSION_WINDOW = 600
+
+# Responses from this size on are compressed with brotli or gzip
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -141,9 +222,56 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
-    "DEFAULT_THROTTLE_RATES": {"anon": "100/day", "user": "1000/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "100/day",
+        "user": "1000/day",
+        "queue": "120/min",
+    },
 }
 
+# Above this many rows, paginators may report PostgreSQL's estimate
+# instead of running an exact COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Stored responses of Idempotency-Key requests are replayed for this long
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# How long a duplicate waits for the original request before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = 5
+# Unfinished requests older than this are taken to have died with their
+# worker, and their key may be claimed again
+IDEMPOTENCY_LEASE_SECONDS = 60
+
+# Tickets of performances older than this are moved to the archive by
+# the archive_tickets command
+TICKET_ARCHIVE_AFTER = timedelta(
+    days=int(os.environ.get("TICKET_ARCHIVE_AFTER_DAYS", 90))
+)
+
+# Profile every Nth request automatically, 0 disables sampling.
+# Staff can always profile a request with the X-Profile header.
+PROFILING_SAMPLE_RATE = int(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+
+# Shared directory where every worker process writes its metrics so that
+# /metrics reports all of them; unset keeps metrics process-local.
+# Clear it when the service restarts.
+METRICS_DIR = os.environ.get("METRICS_DIR")
+# Seconds between two snapshots of the same worker
+METRICS_FLUSH_INTERVAL = 5
+# Bearer token of the Prometheus scraper; without it only staff may
+# read /metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Request tracing, exported as JSON lines to a file or stdout ("-")
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "") == "1"
+TRACING_EXPORT_PATH = os.environ.get("TRACING_EXPORT_PATH", "-")
+# Spans beyond this limit are dropped and counted on the request span
+TRACING_MAX_SPANS = 1000
+
+# Prebuilt OpenAPI schema, see the build_schema command
+SCHEMA_CACHE_PATH = os.environ.get(
+    "SCHEMA_CACHE_PATH", str(BASE_DIR / "openapi-schema.json")
+)
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Theatre API",
     "DESCRIPTION": "API for remote theater reservations and seat selection online.",
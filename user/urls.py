@@ -1,18 +1,19 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView
-)
 
-from user.views import CreateUserView, ManageUserView
+from user.views import (
+    CreateUserView,
+    ManageUserView,
+    ObtainTokenPairView,
+    RefreshTokenView,
+    VerifyTokenView,
+)
 
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="register"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
-    path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
+    path("token/", ObtainTokenPairView.as_view(), name="token_obtain_pair"),
+    path("token/refresh/", RefreshTokenView.as_view(), name="token_refresh"),
+    path("token/verify/", VerifyTokenView.as_view(), name="token_verify"),
     path("me/", ManageUserView.as_view(), name="manage"),
 
 ]
@@ -4,11 +4,17 @@ from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.settings import api_settings
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView,
+    TokenRefreshView,
+    TokenVerifyView,
+)
 
+from theatre.tracing import TracedViewMixin
 from user.serializers import UserSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(TracedViewMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
@@ -17,7 +23,19 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ObtainTokenPairView(TracedViewMixin, TokenObtainPairView):
+    pass
+
+
+class RefreshTokenView(TracedViewMixin, TokenRefreshView):
+    pass
+
+
+class VerifyTokenView(TracedViewMixin, TokenVerifyView):
+    pass
+
+
+class ManageUserView(TracedViewMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)